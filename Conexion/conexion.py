@@ -1,9 +1,14 @@
 ﻿# conexion/conexion.py
 import mysql.connector
 from flask import g
+from Conexion.instrumentacion import CursorMedido
+
+# Observadores (p. ej. PerfiladorConsultas) de las conexiones creadas por get_db()
+OBSERVADORES = []
 
 class MySQLConnection:
-    def __init__(self):
+    def __init__(self, observadores=None):
+        self.observadores = list(observadores or [])
         self.host = '127.0.0.1'
         self.user = 'root'
         self.password = ''
@@ -26,8 +31,14 @@ class MySQLConnection:
             print(f"Error: {e}")
             return False
     
-    def execute_query(self, query, params=None):
+    def _cursor(self):
         cursor = self.connection.cursor(dictionary=True)
+        if self.observadores:
+            return CursorMedido(cursor, self.observadores)
+        return cursor
+    
+    def execute_query(self, query, params=None):
+        cursor = self._cursor()
         try:
             cursor.execute(query, params or ())
             self.connection.commit()
@@ -36,7 +47,7 @@ class MySQLConnection:
             cursor.close()
     
     def fetch_all(self, query, params=None):
-        cursor = self.connection.cursor(dictionary=True)
+        cursor = self._cursor()
         try:
             cursor.execute(query, params or ())
             return cursor.fetchall()
@@ -44,7 +55,7 @@ class MySQLConnection:
             cursor.close()
     
     def fetch_one(self, query, params=None):
-        cursor = self.connection.cursor(dictionary=True)
+        cursor = self._cursor()
         try:
             cursor.execute(query, params or ())
             return cursor.fetchone()
@@ -57,7 +68,7 @@ class MySQLConnection:
 
 def get_db():
     if 'db' not in g:
-        g.db = MySQLConnection()
+        g.db = MySQLConnection(observadores=OBSERVADORES)
         g.db.connect()
     return g.db
 
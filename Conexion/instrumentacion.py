@@ -0,0 +1,68 @@
+﻿# Conexion/instrumentacion.py
+# Cursor que informa cada consulta y filas leídas a sus observadores
+
+import time
+
+
+class CursorMedido:
+    """Envoltura de un cursor de mysql.connector.
+
+    Llama a consulta(sql, params, segundos) de cada observador tras cada
+    execute y a filas(n) con las filas leídas por fetch*.
+    """
+
+    def __init__(self, cursor, observadores):
+        self._cursor = cursor
+        self._observadores = observadores
+
+    def _consulta(self, sql, params, segundos):
+        for observador in self._observadores:
+            observador.consulta(sql, params, segundos)
+
+    def _filas(self, cantidad):
+        for observador in self._observadores:
+            observador.filas(cantidad)
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    def execute(self, operation, params=(), *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            self._consulta(operation, params, time.perf_counter() - inicio)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            self._consulta(operation, None, time.perf_counter() - inicio)
+
+    def fetchone(self):
+        fila = self._cursor.fetchone()
+        if fila is not None:
+            self._filas(1)
+        return fila
+
+    def fetchmany(self, *args, **kwargs):
+        filas = self._cursor.fetchmany(*args, **kwargs)
+        self._filas(len(filas))
+        return filas
+
+    def fetchall(self):
+        filas = self._cursor.fetchall()
+        self._filas(len(filas))
+        return filas
+
+    def __iter__(self):
+        for fila in self._cursor:
+            self._filas(1)
+            yield fila
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self._cursor.close()
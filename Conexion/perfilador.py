@@ -0,0 +1,161 @@
+﻿# Conexion/perfilador.py
+# Huellas de consultas SQL y log de consultas lentas con EXPLAIN
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import threading
+import time
+from datetime import datetime
+
+RE_CADENA = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+RE_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+RE_MARCADOR = re.compile(r"%(?:\(\w+\))?s")
+RE_LISTA = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+# Sentencias que MySQL acepta con EXPLAIN
+EXPLICABLES = ('SELECT', 'UPDATE', 'DELETE', 'INSERT', 'REPLACE')
+
+
+def huella(sql):
+    """SQL normalizado: literales y parámetros como ?, espacios colapsados"""
+    texto = RE_CADENA.sub('?', str(sql))
+    texto = RE_MARCADOR.sub('?', texto)
+    texto = RE_NUMERO.sub('?', texto)
+    texto = RE_LISTA.sub('(?+)', texto)
+    return ' '.join(texto.split())
+
+
+class PerfiladorConsultas:
+    """Observador de CursorMedido que agrupa las consultas por huella.
+
+    Las consultas que tardan `umbral` segundos o más se escriben en un log
+    rotativo (una línea JSON por consulta, sin los parámetros) junto con su
+    EXPLAIN. El EXPLAIN se ejecuta en un hilo aparte con una conexión
+    propia (`conectar`), como mucho una vez por huella cada
+    `intervalo_explain` segundos.
+    """
+
+    def __init__(self, umbral=0.2, archivo_log=None, conectar=None,
+                 max_bytes=5 * 1024 * 1024, respaldos=5, intervalo_explain=300):
+        self.umbral = umbral
+        self.conectar = conectar
+        self.intervalo_explain = intervalo_explain
+        # Colección: Diccionario huella -> estadísticas acumuladas
+        self._huellas = {}
+        # Colección: Diccionario huella -> último EXPLAIN (monotonic)
+        self._ultimo_explain = {}
+        self._candado = threading.Lock()
+        self._cola = queue.Queue(maxsize=100)
+        self._hilo = None
+        self._pid = None
+
+        self.logger = logging.getLogger('turnos.consultas_lentas')
+        self.logger.propagate = False
+        if archivo_log and not self.logger.handlers:
+            directorio = os.path.dirname(archivo_log)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            manejador = logging.handlers.RotatingFileHandler(
+                archivo_log, maxBytes=max_bytes, backupCount=respaldos, encoding='utf-8'
+            )
+            self.logger.addHandler(manejador)
+            self.logger.setLevel(logging.INFO)
+
+    # ----- Observador de CursorMedido -----
+
+    def consulta(self, sql, params, segundos):
+        clave = huella(sql)
+        lenta = segundos >= self.umbral
+        with self._candado:
+            datos = self._huellas.get(clave)
+            if datos is None:
+                datos = self._huellas[clave] = {
+                    'llamadas': 0, 'tiempo_total': 0.0, 'tiempo_max': 0.0, 'lentas': 0
+                }
+            datos['llamadas'] += 1
+            datos['tiempo_total'] += segundos
+            datos['tiempo_max'] = max(datos['tiempo_max'], segundos)
+            if lenta:
+                datos['lentas'] += 1
+        if lenta:
+            self._registrar_lenta(clave, sql, params, segundos)
+
+    def filas(self, cantidad):
+        pass
+
+    # ----- Consultas lentas -----
+
+    def _registrar_lenta(self, clave, sql, params, segundos):
+        ahora = time.monotonic()
+        explicar = False
+        if self.conectar and str(sql).lstrip().split(None, 1)[0].upper() in EXPLICABLES:
+            with self._candado:
+                ultimo = self._ultimo_explain.get(clave)
+                if ultimo is None or ahora - ultimo >= self.intervalo_explain:
+                    self._ultimo_explain[clave] = ahora
+                    explicar = True
+
+        entrada = {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'huella': clave,
+            'ms': round(segundos * 1000, 2),
+        }
+        if not explicar:
+            self.logger.info(json.dumps(entrada, ensure_ascii=False))
+            return
+
+        self._asegurar_hilo()
+        try:
+            self._cola.put_nowait((entrada, sql, params))
+        except queue.Full:
+            self.logger.info(json.dumps(entrada, ensure_ascii=False))
+
+    def _asegurar_hilo(self):
+        with self._candado:
+            if self._hilo is None or not self._hilo.is_alive() or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._hilo = threading.Thread(target=self._procesar_explains, daemon=True)
+                self._hilo.start()
+
+    def _procesar_explains(self):
+        conexion = None
+        while True:
+            entrada, sql, params = self._cola.get()
+            try:
+                if conexion is None or not conexion.is_connected():
+                    conexion = self.conectar()
+                cursor = conexion.cursor(dictionary=True)
+                cursor.execute('EXPLAIN ' + sql, params or ())
+                entrada['explain'] = cursor.fetchall()
+                cursor.close()
+                conexion.rollback()
+            except Exception as e:
+                entrada['explain_error'] = str(e)
+                conexion = None
+            self.logger.info(json.dumps(entrada, ensure_ascii=False, default=str))
+
+    # ----- Reporte -----
+
+    def top(self, limite=20, orden='tiempo_total'):
+        """Huellas con más tiempo acumulado (o el campo indicado en `orden`)"""
+        with self._candado:
+            filas = [
+                {
+                    'huella': clave,
+                    'llamadas': datos['llamadas'],
+                    'tiempo_total_ms': round(datos['tiempo_total'] * 1000, 2),
+                    'tiempo_medio_ms': round(datos['tiempo_total'] * 1000 / datos['llamadas'], 3),
+                    'tiempo_max_ms': round(datos['tiempo_max'] * 1000, 2),
+                    'lentas': datos['lentas'],
+                    'tiempo_total': datos['tiempo_total'],
+                }
+                for clave, datos in self._huellas.items()
+            ]
+        filas.sort(key=lambda f: f.get(orden, 0), reverse=True)
+        for fila in filas:
+            del fila['tiempo_total']
+        return filas[:limite]
@@ -0,0 +1,210 @@
+﻿# Conexion/pool.py
+# Pool de conexiones MySQL reutilizables para la aplicación web
+
+import os
+import threading
+import time
+
+import mysql.connector
+
+from Conexion.instrumentacion import CursorMedido
+
+
+class PoolAgotado(Exception):
+    """Se lanza cuando no hay conexiones libres dentro del tiempo de espera"""
+    pass
+
+
+class ConexionPrestada:
+    """Envoltura de una conexión del pool.
+
+    Se comporta como la conexión original de mysql.connector, pero close()
+    la devuelve al pool en lugar de cerrar el socket.
+    """
+
+    def __init__(self, pool, conexion):
+        self._pool = pool
+        self._conexion = conexion
+        self._devuelta = False
+
+    def __getattr__(self, nombre):
+        return getattr(self._conexion, nombre)
+
+    def cursor(self, *args, **kwargs):
+        """Cursor de la conexión, medido si el pool tiene observadores"""
+        cursor = self._conexion.cursor(*args, **kwargs)
+        if self._pool.observadores:
+            return CursorMedido(cursor, self._pool.observadores)
+        return cursor
+
+    def close(self):
+        """Devuelve la conexión al pool (se puede llamar varias veces)"""
+        if not self._devuelta:
+            self._devuelta = True
+            self._pool.devolver(self._conexion)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class PoolConexiones:
+    """Pool de conexiones MySQL con desborde, verificación y reciclaje"""
+
+    def __init__(self, config, tamano=5, max_desborde=10, timeout=30,
+                 reciclar=3600, verificar=True, observadores=()):
+        self.config = dict(config)
+        # Reciben consulta()/filas() de cada cursor (ver CursorMedido)
+        self.observadores = list(observadores)
+        self.tamano = tamano
+        self.max_desborde = max_desborde
+        self.timeout = timeout
+        self.reciclar = reciclar
+        self.verificar = verificar
+
+        self._condicion = threading.Condition()
+        self._reiniciar()
+
+    def _reiniciar(self):
+        """Vacía el estado interno (también tras un fork del proceso)"""
+        self._pid = os.getpid()
+        # Colección: Lista de tuplas (conexion, creada_en) libres
+        self._libres = []
+        # Colección: Diccionario id(conexion) -> creada_en de las prestadas
+        self._prestadas = {}
+        self._abriendo = 0
+        self._contadores = {
+            'creadas': 0,
+            'cerradas': 0,
+            'descartadas': 0,
+            'prestamos': 0,
+            'esperas': 0,
+            'agotado': 0,
+        }
+
+    def _cerrar(self, conexion):
+        try:
+            conexion.close()
+        except Exception:
+            pass
+        with self._condicion:
+            self._contadores['cerradas'] += 1
+
+    def _es_valida(self, conexion, creada_en):
+        """Comprueba antigüedad y salud de una conexión libre"""
+        if self.reciclar and time.monotonic() - creada_en > self.reciclar:
+            return False
+        if self.verificar:
+            try:
+                return conexion.is_connected()
+            except Exception:
+                return False
+        return True
+
+    def _reservar(self):
+        """Toma una conexión libre o un cupo para abrir una nueva.
+
+        Retorna (conexion, creada_en); conexion es None si hay que abrirla.
+        El ping y la conexión TCP se hacen fuera del candado.
+        """
+        limite = time.monotonic() + self.timeout
+        with self._condicion:
+            if self._pid != os.getpid():
+                self._reiniciar()
+
+            while True:
+                if self._libres:
+                    conexion, creada_en = self._libres.pop()
+                    self._prestadas[id(conexion)] = creada_en
+                    return conexion, creada_en
+
+                if len(self._prestadas) + self._abriendo < self.tamano + self.max_desborde:
+                    self._abriendo += 1
+                    return None, None
+
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    self._contadores['agotado'] += 1
+                    raise PoolAgotado(
+                        f"No hay conexiones libres tras {self.timeout} segundos"
+                    )
+                self._contadores['esperas'] += 1
+                self._condicion.wait(restante)
+
+    def obtener(self):
+        """Presta una conexión del pool (o crea una nueva si hay cupo)"""
+        while True:
+            conexion, creada_en = self._reservar()
+
+            if conexion is not None:
+                if self._es_valida(conexion, creada_en):
+                    break
+                # Conexión vieja o caída: se descarta y se intenta de nuevo
+                with self._condicion:
+                    self._prestadas.pop(id(conexion), None)
+                    self._contadores['descartadas'] += 1
+                    self._condicion.notify()
+                self._cerrar(conexion)
+                continue
+
+            try:
+                conexion = mysql.connector.connect(**self.config)
+            except Exception:
+                with self._condicion:
+                    self._abriendo -= 1
+                    self._condicion.notify()
+                raise
+            creada_en = time.monotonic()
+            with self._condicion:
+                self._abriendo -= 1
+                self._contadores['creadas'] += 1
+                self._prestadas[id(conexion)] = creada_en
+            break
+
+        with self._condicion:
+            self._contadores['prestamos'] += 1
+        return ConexionPrestada(self, conexion)
+
+    def devolver(self, conexion):
+        """Recibe una conexión prestada y la deja lista para reutilizar"""
+        try:
+            # Descartar transacciones que la ruta no confirmó
+            if conexion.in_transaction:
+                conexion.rollback()
+            reutilizable = True
+        except Exception:
+            reutilizable = False
+
+        with self._condicion:
+            creada_en = self._prestadas.pop(id(conexion), None)
+            # Las conexiones de desborde (o ajenas, p. ej. de antes de un
+            # fork) se cierran al devolverse
+            if creada_en is not None and reutilizable and len(self._libres) < self.tamano:
+                self._libres.append((conexion, creada_en))
+                conexion = None
+            self._condicion.notify()
+
+        if conexion is not None:
+            self._cerrar(conexion)
+
+    def cerrar_todas(self):
+        """Cierra las conexiones libres del pool"""
+        with self._condicion:
+            while self._libres:
+                conexion, _ = self._libres.pop()
+                self._cerrar(conexion)
+
+    def estadisticas(self):
+        """Retorna el estado actual del pool"""
+        with self._condicion:
+            en_uso = len(self._prestadas)
+            return {
+                'tamano': self.tamano,
+                'max_desborde': self.max_desborde,
+                'en_uso': en_uso,
+                'libres': len(self._libres),
+                'desborde': max(0, en_uso - self.tamano),
+                **self._contadores,
+            }
@@ -0,0 +1,103 @@
+# Conexion/sqlite.py
+# Conexión SQLite persistente y ajustada para el inventario de la consola
+
+import sqlite3
+from contextlib import contextmanager
+
+
+class ConexionSQLite:
+    """Una sola conexión SQLite abierta durante toda la sesión.
+
+    Se abre al primer uso con modo WAL, synchronous=NORMAL (sin fsync en
+    cada commit, solo en los checkpoints), caché de páginas y mmap más
+    grandes, busy_timeout y caché de sentencias preparadas. Fuera de una
+    transacción cada sentencia se confirma sola; transaccion() agrupa varias
+    en un único commit.
+    """
+
+    def __init__(self, ruta='citas.db', busy_timeout=5000, cache_kb=20000,
+                 mmap_bytes=256 * 1024 * 1024, synchronous='NORMAL', sentencias=256):
+        self.ruta = ruta
+        self.busy_timeout = busy_timeout
+        self.cache_kb = cache_kb
+        self.mmap_bytes = mmap_bytes
+        self.synchronous = synchronous
+        self.sentencias = sentencias
+        self._conexion = None
+        self._profundidad = 0
+
+    @property
+    def conexion(self):
+        if self._conexion is None:
+            # isolation_level=None: las transacciones se abren explícitamente
+            conexion = sqlite3.connect(
+                self.ruta,
+                timeout=self.busy_timeout / 1000,
+                isolation_level=None,
+                cached_statements=self.sentencias,
+            )
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute(f"PRAGMA synchronous={self.synchronous}")
+            conexion.execute(f"PRAGMA cache_size=-{int(self.cache_kb)}")
+            conexion.execute(f"PRAGMA mmap_size={int(self.mmap_bytes)}")
+            conexion.execute(f"PRAGMA busy_timeout={int(self.busy_timeout)}")
+            conexion.execute("PRAGMA temp_store=MEMORY")
+            self._conexion = conexion
+        return self._conexion
+
+    def execute(self, sql, params=()):
+        return self.conexion.execute(sql, params)
+
+    def executemany(self, sql, filas):
+        return self.conexion.executemany(sql, filas)
+
+    @property
+    def en_transaccion(self):
+        return self._profundidad > 0
+
+    @contextmanager
+    def transaccion(self):
+        """Agrupa sentencias en una transacción y retorna un cursor.
+
+        Las transacciones anidadas se funden con la exterior: solo la más
+        externa hace COMMIT (o ROLLBACK si hubo una excepción).
+        """
+        conexion = self.conexion
+        if self._profundidad == 0:
+            # IMMEDIATE toma el bloqueo de escritura al inicio y evita
+            # errores "database is locked" al pasar de lectura a escritura
+            conexion.execute("BEGIN IMMEDIATE")
+        self._profundidad += 1
+        cursor = conexion.cursor()
+        try:
+            yield cursor
+        except BaseException:
+            self._profundidad -= 1
+            if self._profundidad == 0:
+                conexion.execute("ROLLBACK")
+            raise
+        else:
+            self._profundidad -= 1
+            if self._profundidad == 0:
+                conexion.execute("COMMIT")
+        finally:
+            cursor.close()
+
+    def cerrar(self):
+        """Cierra la conexión (la próxima operación abre otra)"""
+        if self._conexion is not None:
+            try:
+                # Deja el WAL incorporado a la base de datos al salir
+                self._conexion.execute("PRAGMA optimize")
+                self._conexion.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except sqlite3.Error:
+                pass
+            self._conexion.close()
+            self._conexion = None
+            self._profundidad = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.cerrar()
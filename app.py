@@ -1,12 +1,83 @@
-﻿from flask import Flask, request, redirect, url_for, flash, render_template_string
+﻿from flask import Flask, request, redirect, url_for, flash, render_template_string, g, has_app_context, jsonify, stream_with_context, send_from_directory
+from werkzeug.security import safe_join
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
+from Conexion.pool import PoolAgotado, PoolConexiones
+from Conexion.perfilador import PerfiladorConsultas
+from Conexion import conexion as conexion_productos
+from services.cache import CacheTTL
+from services.metricas import RegistroMetricas
+from services.catalogo import CatalogoServicios
+from services.contadores import ContadoresTablero
+from services.disponibilidad import AgendaServicios, a_minutos, a_hora
+from services.hashing import HasheadorContrasenas, HasheadorOcupado
+from services.compresion import CompresorRespuestas, EXTENSIONES, comprimir_bytes, leer_precomprimidos, variantes_precomprimidas
+from migraciones import migrar, version_actual, ULTIMA_VERSION
+from decorators import api_login_required
+from datetime import date, datetime, timedelta, timezone
+import hashlib
+import json
+import mimetypes
 import mysql.connector
-from datetime import datetime
+import os
+import re
+import time
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'clave-secreta-patronato-2024'
 
+# Pool de conexiones MySQL (configurable por variables de entorno)
+app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 5))
+app.config['DB_POOL_MAX_OVERFLOW'] = int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10))
+app.config['DB_POOL_TIMEOUT'] = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+app.config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', 3600))
+app.config['DB_POOL_PRE_PING'] = os.environ.get('DB_POOL_PRE_PING', '1') == '1'
+
+# Métricas: peticiones más lentas que este umbral se registran con su SQL (vacío = no)
+app.config['METRICS_SLOW_REQUEST_MS'] = os.environ.get('METRICS_SLOW_REQUEST_MS')
+
+# Log de consultas lentas con EXPLAIN (SLOW_QUERY_EXPLAIN=0 lo desactiva)
+app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 200))
+app.config['SLOW_QUERY_LOG'] = os.environ.get('SLOW_QUERY_LOG', os.path.join('logs', 'consultas_lentas.log'))
+app.config['SLOW_QUERY_EXPLAIN'] = os.environ.get('SLOW_QUERY_EXPLAIN', '1') == '1'
+
+# Comprobar al arrancar que el esquema está migrado (0 = no comprobar)
+app.config['DB_VERIFICAR_ESQUEMA'] = os.environ.get('DB_VERIFICAR_ESQUEMA', '1') == '1'
+
+# Catálogo de servicios en memoria
+app.config['SERVICIOS_CACHE_TTL'] = int(os.environ.get('SERVICIOS_CACHE_TTL', 600))
+
+# Paginación de "Mis Turnos"
+app.config['TURNOS_POR_PAGINA'] = int(os.environ.get('TURNOS_POR_PAGINA', 20))
+app.config['TURNOS_POR_PAGINA_MAX'] = int(os.environ.get('TURNOS_POR_PAGINA_MAX', 100))
+
+# Horario de atención y caché de disponibilidad por servicio/día
+app.config['AGENDA_APERTURA'] = os.environ.get('AGENDA_APERTURA', '08:00')
+app.config['AGENDA_CIERRE'] = os.environ.get('AGENDA_CIERRE', '17:00')
+app.config['AGENDA_TTL'] = int(os.environ.get('AGENDA_TTL', 60))
+
+# Contadores del tablero de inicio
+app.config['CONTADORES_INTERVALO'] = int(os.environ.get('CONTADORES_INTERVALO', 60))
+
+# Caché de usuarios para Flask-Login
+app.config['USER_CACHE_SIZE'] = int(os.environ.get('USER_CACHE_SIZE', 1000))
+app.config['USER_CACHE_TTL'] = int(os.environ.get('USER_CACHE_TTL', 300))
+
+# Hash de contraseñas: método de Werkzeug ('scrypt:32768:8:1', 'pbkdf2:sha256:600000', ...)
+# y pool acotado donde se calcula. Los hashes con otro método se actualizan al iniciar sesión.
+# WORKERS + QUEUE debe ser menor que los hilos de cada worker de gunicorn (--threads 8 en
+# render.yaml): así los inicios de sesión nunca ocupan todos los hilos y el exceso recibe 503
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+app.config['PASSWORD_HASH_QUEUE'] = int(os.environ.get('PASSWORD_HASH_QUEUE', 2))
+app.config['PASSWORD_HASH_TIMEOUT'] = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+app.config['PASSWORD_HASH_PROCESOS'] = os.environ.get('PASSWORD_HASH_PROCESOS', '0') == '1'
+
+# Compresión gzip/brotli de respuestas (brotli solo si el paquete está instalado)
+app.config['COMPRESION_ACTIVA'] = os.environ.get('COMPRESION_ACTIVA', '1') == '1'
+app.config['COMPRESION_MINIMO'] = int(os.environ.get('COMPRESION_MINIMO', 500))
+app.config['COMPRESION_NIVEL_GZIP'] = int(os.environ.get('COMPRESION_NIVEL_GZIP', 6))
+app.config['COMPRESION_NIVEL_BROTLI'] = int(os.environ.get('COMPRESION_NIVEL_BROTLI', 5))
+
 # ============================================
 # CONFIGURACIÓN FLASK-LOGIN
 # ============================================
@@ -15,89 +86,174 @@ login_manager.init_app(app)
 login_manager.login_view = 'login'
 
 # ============================================
-# CONEXIÓN A MYSQL
+# CONEXIÓN A MYSQL (POOL)
+# ============================================
+DB_CONFIG = {
+    'host': os.environ.get('DB_HOST', '127.0.0.1'),
+    'user': os.environ.get('DB_USER', 'root'),
+    'password': os.environ.get('DB_PASSWORD', ''),
+    'database': os.environ.get('DB_NAME', 'turnos_db'),
+    'port': int(os.environ.get('DB_PORT', 3306))
+}
+
+# ============================================
+# MÉTRICAS POR PETICIÓN
 # ============================================
+metricas = RegistroMetricas(
+    umbral_lento=(float(app.config['METRICS_SLOW_REQUEST_MS']) / 1000
+                  if app.config['METRICS_SLOW_REQUEST_MS'] else None),
+    logger=app.logger
+)
+
+@app.before_request
+def iniciar_medicion():
+    metricas.iniciar_peticion()
+
+@app.after_request
+def registrar_medicion(response):
+    # Registrado antes que los demás after_request, así se ejecuta al final
+    metricas.respuesta(response.status_code)
+    return response
+
+@app.teardown_request
+def finalizar_medicion(exc=None):
+    # teardown_request corre aunque la vista lance una excepción (se cuenta como 500)
+    ruta = request.url_rule.rule if request.url_rule else 'desconocida'
+    metricas.finalizar_peticion(ruta, request.method, exc)
+
+# Huellas de todas las consultas; las lentas van al log con su EXPLAIN
+perfilador = PerfiladorConsultas(
+    umbral=app.config['SLOW_QUERY_MS'] / 1000,
+    archivo_log=app.config['SLOW_QUERY_LOG'],
+    conectar=(lambda: mysql.connector.connect(**DB_CONFIG)) if app.config['SLOW_QUERY_EXPLAIN'] else None
+)
+conexion_productos.OBSERVADORES.append(perfilador)
+
+db_pool = PoolConexiones(
+    DB_CONFIG,
+    tamano=app.config['DB_POOL_SIZE'],
+    max_desborde=app.config['DB_POOL_MAX_OVERFLOW'],
+    timeout=app.config['DB_POOL_TIMEOUT'],
+    reciclar=app.config['DB_POOL_RECYCLE'],
+    verificar=app.config['DB_POOL_PRE_PING'],
+    observadores=[metricas, perfilador]
+)
+
 def get_db():
-    return mysql.connector.connect(
-        host='127.0.0.1',
-        user='root',
-        password='',
-        database='turnos_db',
-        port=3306
-    )
+    """Presta una conexión del pool; conn.close() la devuelve"""
+    conn = db_pool.obtener()
+    metricas.conexion()
+    if has_app_context():
+        g.setdefault('conexiones_db', []).append(conn)
+    return conn
+
+@app.teardown_appcontext
+def devolver_conexiones(exc=None):
+    # Devuelve al pool las conexiones que una ruta no cerró (p. ej. por una excepción)
+    for conn in g.pop('conexiones_db', []):
+        conn.close()
+
+# ============================================
+# COMPRESIÓN DE RESPUESTAS
+# ============================================
+compresor = CompresorRespuestas(
+    nivel_gzip=app.config['COMPRESION_NIVEL_GZIP'],
+    nivel_brotli=app.config['COMPRESION_NIVEL_BROTLI'],
+    minimo=app.config['COMPRESION_MINIMO']
+)
+
+@app.after_request
+def comprimir_respuesta(response):
+    # Registrado antes que validacion_condicional: comprime después de calcular el ETag
+    if app.config['COMPRESION_ACTIVA']:
+        return compresor.procesar(request, response)
+    return response
+
+@app.endpoint('static')
+def servir_estatico(filename):
+    """Archivos de static/, usando la variante .br/.gz del build si existe"""
+    ruta = safe_join(app.static_folder, filename)
+    variantes = variantes_precomprimidas(ruta) if ruta and os.path.isfile(ruta) else []
+    codificacion = (compresor.elegir(request.accept_encodings, variantes)
+                    if app.config['COMPRESION_ACTIVA'] and variantes else None)
+    if codificacion:
+        response = send_from_directory(
+            app.static_folder, filename + EXTENSIONES[codificacion],
+            mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        )
+        response.headers['Content-Encoding'] = codificacion
+    else:
+        response = app.send_static_file(filename)
+    if variantes:
+        response.vary.add('Accept-Encoding')
+    return response
+
+# ============================================
+# CATÁLOGO DE SERVICIOS
+# ============================================
+def cargar_servicios():
+    conn = get_db()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT id, nombre, descripcion, duracion FROM servicios ORDER BY nombre")
+    servicios = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    return servicios
+
+# Se invalida con catalogo_servicios.invalidar() al modificar servicios
+catalogo_servicios = CatalogoServicios(cargar_servicios, ttl=app.config['SERVICIOS_CACHE_TTL'])
 
 # ============================================
-# CREAR TABLAS (EJECUTAR AL INICIO)
+# CONTADORES DEL TABLERO
+# ============================================
+def cargar_contadores():
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute("SELECT estado, servicio_id, COUNT(*) FROM turnos GROUP BY estado, servicio_id")
+    turnos = cursor.fetchall()
+    cursor.execute("SELECT COUNT(*) FROM usuarios")
+    usuarios = cursor.fetchone()[0]
+    cursor.execute("SELECT COUNT(*) FROM servicios")
+    servicios = cursor.fetchone()[0]
+    cursor.close()
+    conn.close()
+    return {'usuarios': usuarios, 'servicios': servicios, 'turnos': turnos}
+
+# Se actualizan al crear/cancelar turnos y registrar usuarios
+contadores = ContadoresTablero(cargar_contadores, intervalo=app.config['CONTADORES_INTERVALO'])
+
+# ============================================
+# ESQUEMA DE LA BASE DE DATOS (MIGRACIONES)
 # ============================================
 def init_db():
+    """Aplica las migraciones pendientes de migraciones.py"""
+    conn = get_db()
+    try:
+        aplicadas = migrar(conn)
+    finally:
+        conn.close()
+    catalogo_servicios.invalidar()
+    if aplicadas:
+        print(f"✅ Migraciones aplicadas: {', '.join(map(str, aplicadas))}")
+    else:
+        print(f"✅ Esquema al día (versión {ULTIMA_VERSION})")
+    return aplicadas
+
+def verificar_esquema():
+    # Solo una consulta de versión; los workers no ejecutan DDL al arrancar
     try:
         conn = get_db()
         cursor = conn.cursor()
-        
-        # Tabla de usuarios
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS usuarios (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                nombre VARCHAR(100) NOT NULL,
-                email VARCHAR(100) UNIQUE NOT NULL,
-                password VARCHAR(255) NOT NULL,
-                fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Tabla de servicios médicos
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS servicios (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                nombre VARCHAR(50) NOT NULL,
-                descripcion TEXT,
-                duracion INT DEFAULT 30
-            )
-        ''')
-        
-        # Tabla de turnos
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS turnos (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                usuario_id INT NOT NULL,
-                nombre_completo VARCHAR(100) NOT NULL,
-                cedula VARCHAR(20) NOT NULL,
-                telefono VARCHAR(20) NOT NULL,
-                servicio_id INT NOT NULL,
-                servicio_nombre VARCHAR(50) NOT NULL,
-                fecha DATE NOT NULL,
-                hora TIME NOT NULL,
-                motivo TEXT,
-                estado VARCHAR(20) DEFAULT 'Programado',
-                fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (usuario_id) REFERENCES usuarios(id) ON DELETE CASCADE,
-                FOREIGN KEY (servicio_id) REFERENCES servicios(id) ON DELETE CASCADE
-            )
-        ''')
-        
-        # Insertar servicios por defecto si no existen
-        cursor.execute("SELECT COUNT(*) FROM servicios")
-        if cursor.fetchone()[0] == 0:
-            servicios = [
-                ('Medicina General', 'Atención médica general para todas las edades', 30),
-                ('Pediatría', 'Atención especializada para niños y adolescentes', 30),
-                ('Ginecología', 'Salud de la mujer y control prenatal', 30),
-                ('Odontología', 'Cuidado dental y prevención', 30),
-                ('Cardiología', 'Atención cardíaca especializada', 45),
-                ('Trabajo Social', 'Asesoría familiar y gestión social', 30),
-                ('Psicología', 'Apoyo emocional y salud mental', 45),
-                ('Nutrición', 'Consejería nutricional', 30)
-            ]
-            cursor.executemany("INSERT INTO servicios (nombre, descripcion, duracion) VALUES (%s, %s, %s)", servicios)
-        
-        conn.commit()
+        version = version_actual(cursor)
         cursor.close()
         conn.close()
-        print("✅ Base de datos inicializada correctamente")
+        if version < ULTIMA_VERSION:
+            print(f"⚠️ Esquema en versión {version} (última {ULTIMA_VERSION}). Ejecute: python migraciones.py")
     except Exception as e:
         print(f"⚠️ Error en base de datos: {e}")
 
-init_db()
+if app.config['DB_VERIFICAR_ESQUEMA']:
+    verificar_esquema()
 
 # ============================================
 # MODELO USUARIO
@@ -121,8 +277,29 @@ class Usuario:
     def get_id(self):
         return str(self.id)
 
+# Caché de usuarios por id (se invalida al modificar la tabla usuarios)
+cache_usuarios = CacheTTL(
+    max_items=app.config['USER_CACHE_SIZE'],
+    ttl=app.config['USER_CACHE_TTL']
+)
+
+hasheador = HasheadorContrasenas(
+    metodo=app.config['PASSWORD_HASH_METHOD'],
+    trabajadores=app.config['PASSWORD_HASH_WORKERS'],
+    max_pendientes=app.config['PASSWORD_HASH_QUEUE'],
+    timeout=app.config['PASSWORD_HASH_TIMEOUT'],
+    procesos=app.config['PASSWORD_HASH_PROCESOS']
+)
+
+def invalidar_usuario(user_id):
+    """Debe llamarse siempre que cambie una fila de usuarios"""
+    cache_usuarios.invalidar(str(user_id))
+
 @login_manager.user_loader
 def load_user(user_id):
+    usuario = cache_usuarios.obtener(str(user_id))
+    if usuario:
+        return usuario
     try:
         conn = get_db()
         cursor = conn.cursor(dictionary=True)
@@ -131,327 +308,112 @@ def load_user(user_id):
         cursor.close()
         conn.close()
         if user:
-            return Usuario(user['id'], user['nombre'], user['email'], user['password'])
-    except:
-        pass
+            usuario = Usuario(user['id'], user['nombre'], user['email'], user['password'])
+            cache_usuarios.guardar(str(user_id), usuario)
+            return usuario
+    except (PoolAgotado, mysql.connector.Error):
+        # La sesión se trata como anónima, pero el fallo queda en el log
+        app.logger.exception("No se pudo cargar el usuario %s", user_id)
     return None
 
 # ============================================
-# CSS GLOBAL
+# CSS GLOBAL (ARCHIVO ESTÁTICO CON HUELLA)
 # ============================================
-CSS = '''
-<style>
-    * {
-        margin: 0;
-        padding: 0;
-        box-sizing: border-box;
-    }
-    
-    body {
-        font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        min-height: 100vh;
-    }
-    
-    .nav-bar {
-        background: white;
-        box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-        padding: 15px 30px;
-        display: flex;
-        justify-content: space-between;
-        align-items: center;
-        flex-wrap: wrap;
-    }
-    
-    .nav-bar .brand {
-        font-size: 20px;
-        font-weight: bold;
-        color: #667eea;
-    }
-    
-    .nav-bar .brand i {
-        margin-right: 10px;
-    }
-    
-    .nav-bar a {
-        color: #667eea;
-        text-decoration: none;
-        margin-left: 20px;
-        transition: 0.3s;
-    }
-    
-    .nav-bar a:hover {
-        color: #764ba2;
-        text-decoration: underline;
-    }
-    
-    .container {
-        background: white;
-        border-radius: 20px;
-        box-shadow: 0 20px 40px rgba(0,0,0,0.1);
-        padding: 40px;
-        width: 100%;
-        max-width: 600px;
-        margin: 40px auto;
-        animation: fadeIn 0.5s ease-in;
-    }
-    
-    .container-large {
-        max-width: 1200px;
-    }
-    
-    @keyframes fadeIn {
-        from { opacity: 0; transform: translateY(-20px); }
-        to { opacity: 1; transform: translateY(0); }
-    }
-    
-    h2 {
-        text-align: center;
-        color: #333;
-        margin-bottom: 30px;
-    }
-    
-    .form-group {
-        margin-bottom: 20px;
-    }
-    
-    label {
-        display: block;
-        margin-bottom: 8px;
-        color: #555;
-        font-weight: 500;
-    }
-    
-    input, select, textarea {
-        width: 100%;
-        padding: 12px 15px;
-        border: 2px solid #e0e0e0;
-        border-radius: 10px;
-        font-size: 16px;
-        transition: all 0.3s;
-        outline: none;
-        font-family: inherit;
-    }
-    
-    input:focus, select:focus, textarea:focus {
-        border-color: #667eea;
-        box-shadow: 0 0 0 3px rgba(102, 126, 234, 0.1);
-    }
-    
-    button {
-        width: 100%;
-        padding: 12px;
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        border: none;
-        border-radius: 10px;
-        font-size: 16px;
-        font-weight: bold;
-        cursor: pointer;
-        transition: transform 0.3s, box-shadow 0.3s;
-    }
-    
-    button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 5px 15px rgba(102, 126, 234, 0.4);
-    }
-    
-    .btn-secondary {
-        background: #6c757d;
-        margin-top: 10px;
-    }
-    
-    .btn-secondary:hover {
-        background: #5a6268;
-        box-shadow: 0 5px 15px rgba(108, 117, 125, 0.4);
-    }
-    
-    .link {
-        text-align: center;
-        margin-top: 20px;
-        padding-top: 20px;
-        border-top: 1px solid #e0e0e0;
-    }
-    
-    .link a {
-        color: #667eea;
-        text-decoration: none;
-    }
-    
-    .link a:hover {
-        text-decoration: underline;
-    }
-    
-    .message {
-        padding: 12px;
-        border-radius: 10px;
-        margin-bottom: 20px;
-        text-align: center;
-    }
-    
-    .message.success { background: #d4edda; color: #155724; border: 1px solid #c3e6cb; }
-    .message.error { background: #f8d7da; color: #721c24; border: 1px solid #f5c6cb; }
-    .message.info { background: #d1ecf1; color: #0c5460; border: 1px solid #bee5eb; }
-    
-    table {
-        width: 100%;
-        border-collapse: collapse;
-        margin-top: 20px;
-    }
-    
-    th, td {
-        padding: 12px;
-        text-align: left;
-        border-bottom: 1px solid #e0e0e0;
-    }
-    
-    th {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        font-weight: 600;
-    }
-    
-    tr:hover {
-        background: #f8f9fa;
-    }
-    
-    .badge {
-        padding: 5px 12px;
-        border-radius: 20px;
-        font-size: 12px;
-        font-weight: bold;
-        display: inline-block;
-    }
-    
-    .badge-programado { background: #ffc107; color: #333; }
-    .badge-confirmado { background: #28a745; color: white; }
-    .badge-cancelado { background: #dc3545; color: white; }
-    .badge-completado { background: #6c757d; color: white; }
-    
-    .btn-sm {
-        padding: 5px 12px;
-        font-size: 12px;
-        width: auto;
-        margin: 0 5px;
-        display: inline-block;
-    }
-    
-    .btn-edit { background: #ffc107; color: #333; }
-    .btn-delete { background: #dc3545; color: white; }
-    .btn-view { background: #17a2b8; color: white; }
-    
-    .card-grid {
-        display: grid;
-        grid-template-columns: repeat(auto-fit, minmax(280px, 1fr));
-        gap: 20px;
-        margin-top: 20px;
-    }
-    
-    .service-card {
-        background: linear-gradient(135deg, #f8f9fa 0%, #e9ecef 100%);
-        padding: 25px;
-        border-radius: 15px;
-        text-align: center;
-        cursor: pointer;
-        transition: all 0.3s;
-        text-decoration: none;
-        color: inherit;
-        display: block;
-    }
-    
-    .service-card:hover {
-        transform: translateY(-5px);
-        box-shadow: 0 10px 25px rgba(0,0,0,0.15);
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        color: white;
-    }
-    
-    .service-card h3 { margin-bottom: 10px; font-size: 1.3rem; }
-    .service-card p { font-size: 14px; opacity: 0.8; }
-    
-    .stats-grid {
-        display: grid;
-        grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-        gap: 20px;
-        margin-bottom: 30px;
-    }
-    
-    .stat-card {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        padding: 20px;
-        border-radius: 15px;
-        text-align: center;
-    }
-    
-    .stat-card h3 { font-size: 2rem; margin-bottom: 5px; }
-    .stat-card p { margin: 0; opacity: 0.9; }
-    
-    .row {
-        display: flex;
-        gap: 20px;
-        flex-wrap: wrap;
-    }
-    
-    .col {
-        flex: 1;
-        min-width: 200px;
-    }
-    
-    .footer {
-        text-align: center;
-        padding: 20px;
-        color: white;
-        margin-top: 40px;
-    }
-    
-    @media (max-width: 768px) {
-        .container { margin: 20px; padding: 20px; }
-        .nav-bar { flex-direction: column; gap: 10px; }
-        .nav-bar div { display: flex; flex-wrap: wrap; justify-content: center; }
-        .nav-bar a { margin: 5px 10px; }
-        th, td { font-size: 12px; padding: 8px; }
-        .stats-grid { grid-template-columns: 1fr; }
-    }
-</style>
-'''
+CSS_PATH = os.path.join(app.root_path, 'static', 'css', 'turnos.css')
+
+with open(CSS_PATH, 'rb') as f:
+    CSS_BYTES = f.read()
+
+CSS_HUELLA = hashlib.md5(CSS_BYTES).hexdigest()[:12]
+CSS_URL = f'/css/turnos.{CSS_HUELLA}.css'
+CSS_MODIFICADO = datetime.fromtimestamp(int(os.path.getmtime(CSS_PATH)), timezone.utc)
+# Variantes comprimidas: las del build (comprimir_estaticos.py) o, si faltan, se generan una vez aquí
+CSS_COMPRIMIDO = leer_precomprimidos(CSS_PATH)
+if 'gzip' not in CSS_COMPRIMIDO:
+    CSS_COMPRIMIDO['gzip'] = comprimir_bytes(CSS_BYTES, 'gzip', 9)
+
+@app.route('/css/turnos.<huella>.css')
+def css_turnos(huella):
+    if huella != CSS_HUELLA:
+        return redirect(CSS_URL)
+    codificacion = (compresor.elegir(request.accept_encodings, CSS_COMPRIMIDO)
+                    if app.config['COMPRESION_ACTIVA'] else None)
+    if codificacion:
+        response = app.response_class(CSS_COMPRIMIDO[codificacion], mimetype='text/css')
+        response.headers['Content-Encoding'] = codificacion
+    else:
+        response = app.response_class(CSS_BYTES, mimetype='text/css')
+    response.vary.add('Accept-Encoding')
+    # La URL cambia con el contenido, así que se puede cachear "para siempre"
+    response.cache_control.public = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    response.set_etag(f'{CSS_HUELLA}-{codificacion}' if codificacion else CSS_HUELLA)
+    response.last_modified = CSS_MODIFICADO
+    return response.make_conditional(request)
 
 # ============================================
 # FUNCIÓN PARA RENDERIZAR HTML
 # ============================================
+NAV_AUTENTICADO = '''
+                <a href="/agendar"><i class="fas fa-calendar-plus"></i> Agendar</a>
+                <a href="/mis-turnos"><i class="fas fa-calendar-check"></i> Mis Turnos</a>
+                <a href="/perfil"><i class="fas fa-user"></i> Mi Perfil</a>
+                <a href="/logout"><i class="fas fa-sign-out-alt"></i> Salir</a>'''
+
+NAV_ANONIMO = '''
+                <a href="/login"><i class="fas fa-sign-in-alt"></i> Login</a>
+                <a href="/registro"><i class="fas fa-user-plus"></i> Registro</a>'''
+
+def compilar_shell(nav):
+    """Arma una vez la plantilla de página; solo quedan {title} y {content}"""
+    return app.jinja_env.get_template('shell.html').render(
+        title='{title}', content='{content}', nav=nav, css_url=CSS_URL
+    )
+
+SHELL_AUTENTICADO = compilar_shell(NAV_AUTENTICADO)
+SHELL_ANONIMO = compilar_shell(NAV_ANONIMO)
+
 def render_page(title, content, current_user=None):
-    user_section = ''
+    inicio = time.perf_counter()
     if current_user and current_user.is_authenticated:
-        user_section = f'<span style="color:#667eea;">Hola, {current_user.nombre}</span>'
-    
-    return f'''
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>{title} - Patronato de Catacocha</title>
-        {CSS}
-        <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css">
-    </head>
-    <body>
-        <div class="nav-bar">
-            <span class="brand"><i class="fas fa-hospital"></i> Patronato de Catacocha</span>
-            <div>
-                <a href="/"><i class="fas fa-home"></i> Inicio</a>
-                {f'<a href="/agendar"><i class="fas fa-calendar-plus"></i> Agendar</a>' if current_user and current_user.is_authenticated else ''}
-                {f'<a href="/mis-turnos"><i class="fas fa-calendar-check"></i> Mis Turnos</a>' if current_user and current_user.is_authenticated else ''}
-                {f'<a href="/perfil"><i class="fas fa-user"></i> Mi Perfil</a>' if current_user and current_user.is_authenticated else ''}
-                {f'<a href="/logout"><i class="fas fa-sign-out-alt"></i> Salir</a>' if current_user and current_user.is_authenticated else ''}
-                {f'<a href="/login"><i class="fas fa-sign-in-alt"></i> Login</a>' if not (current_user and current_user.is_authenticated) else ''}
-                {f'<a href="/registro"><i class="fas fa-user-plus"></i> Registro</a>' if not (current_user and current_user.is_authenticated) else ''}
-            </div>
-        </div>
-        {content}
-        <div class="footer">
-            <p>&copy; 2024 Patronato de Catacocha - Sistema de Gestión de Turnos</p>
-        </div>
-    </body>
-    </html>
-    '''
+        shell = SHELL_AUTENTICADO
+    else:
+        shell = SHELL_ANONIMO
+    pagina = shell.format(title=title, content=content)
+    metricas.render(time.perf_counter() - inicio)
+    return pagina
+
+def stream_pagina(plantilla, current_user=None, buffer=32, **contexto):
+    """Respuesta que envía una plantilla (que extiende shell.html) por partes.
+
+    El primer fragmento sale antes de terminar de recorrer las filas y la
+    página completa nunca se arma en memoria. Se usa en las páginas con tablas.
+    """
+    nav = NAV_AUTENTICADO if current_user and current_user.is_authenticated else NAV_ANONIMO
+    flujo = app.jinja_env.get_template(plantilla).stream(nav=nav, css_url=CSS_URL, **contexto)
+    flujo.enable_buffering(buffer)
+    return app.response_class(stream_with_context(flujo), mimetype='text/html')
+
+# Primera vez que se sirvió cada ETag, usada como Last-Modified de la página
+paginas_vistas = CacheTTL(max_items=10000, ttl=86400)
+
+@app.after_request
+def validacion_condicional(response):
+    # Las páginas HTML llevan ETag/Last-Modified para revalidar con un 304
+    if (request.method == 'GET' and response.status_code == 200
+            and response.mimetype == 'text/html' and not response.is_streamed):
+        response.add_etag()
+        etag, _ = response.get_etag()
+        modificado = paginas_vistas.obtener(etag)
+        if modificado is None:
+            modificado = datetime.now(timezone.utc).replace(microsecond=0)
+            paginas_vistas.guardar(etag, modificado)
+        response.last_modified = modificado
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+    return response
 
 # ============================================
 # RUTAS PRINCIPALES
@@ -459,19 +421,16 @@ def render_page(title, content, current_user=None):
 
 @app.route('/')
 def index():
-    # Obtener estadísticas
+    # Obtener estadísticas (desde los contadores en memoria)
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM turnos WHERE estado = 'Programado'")
-        turnos_programados = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM usuarios")
-        total_usuarios = cursor.fetchone()[0]
-        cursor.close()
-        conn.close()
+        resumen = contadores.resumen()
+        turnos_programados = resumen['por_estado'].get('Programado', 0)
+        total_usuarios = resumen['usuarios']
+        total_servicios = resumen['servicios']
     except:
         turnos_programados = 0
         total_usuarios = 0
+        total_servicios = 0
     
     content = f'''
     <div class="container container-large">
@@ -480,7 +439,7 @@ def index():
         <div class="stats-grid">
             <div class="stat-card"><h3>{total_usuarios}</h3><p>Usuarios Registrados</p></div>
             <div class="stat-card"><h3>{turnos_programados}</h3><p>Turnos Programados</p></div>
-            <div class="stat-card"><h3>8</h3><p>Especialidades</p></div>
+            <div class="stat-card"><h3>{total_servicios}</h3><p>Especialidades</p></div>
         </div>
         
         <div class="card-grid">
@@ -520,12 +479,19 @@ def registro():
             content = f'<div class="container"><div class="message error">❌ Las contraseñas no coinciden</div><div class="link"><a href="/registro">Volver</a></div></div>'
             return render_page('Error', content)
         
-        password_hash = generate_password_hash(password)
+        try:
+            password_hash = hasheador.generar(password)
+        except HasheadorOcupado:
+            content = '<div class="container"><div class="message error">❌ El sistema está ocupado, intenta de nuevo en unos segundos</div><div class="link"><a href="/registro">Volver</a></div></div>'
+            return render_page('Servicio Ocupado', content), 503
+        
         try:
             conn = get_db()
             cursor = conn.cursor()
             cursor.execute("INSERT INTO usuarios (nombre, email, password) VALUES (%s, %s, %s)", (nombre, email, password_hash))
             conn.commit()
+            invalidar_usuario(cursor.lastrowid)
+            contadores.usuario_registrado()
             cursor.close()
             conn.close()
             content = f'<div class="container"><div class="message success">✅ ¡Registro exitoso! Ahora puedes iniciar sesión.</div><div class="link"><a href="/login">Iniciar Sesión</a></div></div>'
@@ -549,6 +515,21 @@ def registro():
     '''
     return render_page('Registro', content)
 
+def actualizar_hash(user, hash_nuevo):
+    """Reemplaza un hash con parámetros antiguos (solo si nadie lo cambió antes)"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute("UPDATE usuarios SET password = %s WHERE id = %s AND password = %s",
+                       (hash_nuevo, user['id'], user['password']))
+        conn.commit()
+        cursor.close()
+        conn.close()
+        user['password'] = hash_nuevo
+        invalidar_usuario(user['id'])
+    except Exception as e:
+        app.logger.warning(f"No se pudo actualizar el hash del usuario {user['id']}: {e}")
+
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
@@ -561,12 +542,21 @@ def login():
             user = cursor.fetchone()
             cursor.close()
             conn.close()
-            if user and check_password_hash(user['password'], password):
+            valida = False
+            if user:
+                valida, hash_nuevo = hasheador.verificar(user['password'], password)
+            if valida:
+                if hash_nuevo:
+                    actualizar_hash(user, hash_nuevo)
                 usuario = Usuario(user['id'], user['nombre'], user['email'], user['password'])
+                cache_usuarios.guardar(str(usuario.id), usuario)
                 login_user(usuario)
                 return redirect(url_for('index'))
             content = '<div class="container"><div class="message error">❌ Credenciales incorrectas</div><div class="link"><a href="/login">Volver</a></div></div>'
             return render_page('Error', content)
+        except HasheadorOcupado:
+            content = '<div class="container"><div class="message error">❌ El sistema está ocupado, intenta de nuevo en unos segundos</div><div class="link"><a href="/login">Volver</a></div></div>'
+            return render_page('Servicio Ocupado', content), 503
         except Exception as e:
             content = f'<div class="container"><div class="message error">❌ Error: {e}</div><div class="link"><a href="/login">Volver</a></div></div>'
             return render_page('Error', content)
@@ -587,6 +577,7 @@ def login():
 @app.route('/logout')
 @login_required
 def logout():
+    invalidar_usuario(current_user.id)
     logout_user()
     content = '<div class="container"><div class="message success">✅ Sesión cerrada correctamente</div><div class="link"><a href="/">Volver al inicio</a></div></div>'
     return render_page('Sesión Cerrada', content)
@@ -606,50 +597,147 @@ def perfil():
     return render_page('Mi Perfil', content, current_user)
 
 # ============================================
-# AGENDAR TURNO
+# DISPONIBILIDAD DE HORARIOS
 # ============================================
 
-@app.route('/agendar', methods=['GET', 'POST'])
+# Días ya consultados por servicio (solo para mostrar disponibilidad;
+# el POST de /agendar comprueba el choque en la base de datos)
+agenda = AgendaServicios(ttl=app.config['AGENDA_TTL'])
+
+def horario_atencion():
+    return a_minutos(app.config['AGENDA_APERTURA']), a_minutos(app.config['AGENDA_CIERRE'])
+
+def cargar_dia_agenda(cursor, servicio, fecha):
+    """Lee los turnos no cancelados del servicio en esa fecha y los pone en la agenda"""
+    cursor.execute('''
+        SELECT id, hora FROM turnos
+        WHERE servicio_id = %s AND fecha = %s AND estado <> 'Cancelado'
+    ''', (servicio['id'], fecha))
+    ocupados = [(turno_id, a_minutos(hora)) for turno_id, hora in cursor.fetchall()]
+    return agenda.reemplazar_dia(servicio['id'], fecha, servicio['duracion'], ocupados)
+
+def horas_libres(servicio, fecha):
+    """Horas de inicio libres ('HH:MM') del servicio en una fecha"""
+    dia = agenda.dia(servicio['id'], fecha)
+    if dia is None:
+        conn = get_db()
+        cursor = conn.cursor()
+        dia = cargar_dia_agenda(cursor, servicio, fecha)
+        cursor.close()
+        conn.close()
+    apertura, cierre = horario_atencion()
+    return [a_hora(inicio) for inicio in dia.libres(apertura, cierre)]
+
+@app.route('/agendar/disponibilidad')
 @login_required
-def agendar_turno():
+def disponibilidad():
+    servicio = catalogo_servicios.obtener(request.args.get('servicio_id'))
+    fecha = request.args.get('fecha', '')
     try:
-        conn = get_db()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM servicios ORDER BY nombre")
-        servicios = cursor.fetchall()
+        date.fromisoformat(fecha)
+    except ValueError:
+        servicio = None
+    if not servicio:
+        return jsonify({'error': 'Servicio o fecha inválidos'}), 400
+    return jsonify({
+        'servicio_id': servicio['id'],
+        'fecha': fecha,
+        'duracion': servicio['duracion'],
+        'libres': horas_libres(servicio, fecha)
+    })
+
+# ============================================
+# AGENDAR TURNO
+# ============================================
+
+class HorarioOcupado(Exception):
+    """El horario pedido ya tiene un turno para ese servicio y día"""
+
+    def __init__(self, servicio, fecha, hora, libres):
+        super().__init__(f'El horario {hora} ya está ocupado para {servicio["nombre"]} el {fecha}')
+        self.servicio = servicio
+        self.fecha = fecha
+        self.hora = hora
+        self.libres = libres
+
+# Campos del paciente que la tabla turnos exige (NOT NULL)
+CAMPOS_OBLIGATORIOS_TURNO = (('nombre_completo', 'El nombre completo'), ('cedula', 'La cédula'),
+                             ('telefono', 'El teléfono'))
+
+def reservar_turno(usuario_id, datos):
+    """Agenda un turno con los campos de `datos` (formulario o JSON).
+
+    Lanza ValueError si los datos no son válidos y HorarioOcupado si el
+    horario ya está tomado. Retorna el id del turno creado.
+    """
+    paciente = {}
+    for campo, nombre in CAMPOS_OBLIGATORIOS_TURNO:
+        valor = datos.get(campo)
+        valor = str(valor).strip() if valor is not None else ''
+        if not valor:
+            raise ValueError(f'{nombre} es obligatorio')
+        paciente[campo] = valor
+    servicio = catalogo_servicios.obtener(datos.get('servicio_id'))
+    if not servicio:
+        raise ValueError('Servicio no válido')
+    fecha = date.fromisoformat(datos.get('fecha') or '').isoformat()
+    hora = datos.get('hora')
+    inicio = a_minutos(hora)
+    
+    valores = (
+        usuario_id,
+        paciente['nombre_completo'],
+        paciente['cedula'],
+        paciente['telefono'],
+        servicio['id'],
+        servicio['nombre'],
+        fecha,
+        hora,
+        datos.get('motivo')
+    )
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    # Bloquea el servicio para que dos reservas simultáneas (de
+    # cualquier worker) no ocupen el mismo horario
+    cursor.execute("SELECT id FROM servicios WHERE id = %s FOR UPDATE", (servicio['id'],))
+    cursor.fetchall()
+    # Solo los turnos que empiezan a menos de una duración del pedido
+    # pueden chocar: rango sobre idx_turnos_servicio_fecha
+    duracion = servicio['duracion']
+    cursor.execute('''
+        SELECT COUNT(*) FROM turnos
+        WHERE servicio_id = %s AND fecha = %s AND hora > %s AND hora < %s
+          AND estado <> 'Cancelado'
+    ''', (servicio['id'], fecha, timedelta(minutes=inicio - duracion),
+          timedelta(minutes=inicio + duracion)))
+    if cursor.fetchone()[0]:
+        # Se relee el día para ofrecer los horarios libres actuales
+        dia = cargar_dia_agenda(cursor, servicio, fecha)
+        conn.rollback()
         cursor.close()
         conn.close()
-    except:
-        servicios = []
+        libres = [a_hora(m) for m in dia.libres(*horario_atencion())]
+        raise HorarioOcupado(servicio, fecha, hora, libres)
     
+    cursor.execute('''
+        INSERT INTO turnos (usuario_id, nombre_completo, cedula, telefono, servicio_id, servicio_nombre, fecha, hora, motivo)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ''', valores)
+    conn.commit()
+    turno_id = cursor.lastrowid
+    agenda.ocupar(servicio['id'], fecha, inicio, turno_id)
+    cursor.close()
+    conn.close()
+    contadores.turno_creado(servicio['id'])
+    return turno_id
+
+@app.route('/agendar', methods=['GET', 'POST'])
+@login_required
+def agendar_turno():
     if request.method == 'POST':
         try:
-            servicio_id = request.form.get('servicio_id')
-            conn = get_db()
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT nombre FROM servicios WHERE id = %s", (servicio_id,))
-            servicio = cursor.fetchone()
-            servicio_nombre = servicio['nombre'] if servicio else 'Medicina General'
-            
-            datos = (
-                current_user.id,
-                request.form.get('nombre_completo'),
-                request.form.get('cedula'),
-                request.form.get('telefono'),
-                servicio_id,
-                servicio_nombre,
-                request.form.get('fecha'),
-                request.form.get('hora'),
-                request.form.get('motivo')
-            )
-            
-            cursor.execute('''
-                INSERT INTO turnos (usuario_id, nombre_completo, cedula, telefono, servicio_id, servicio_nombre, fecha, hora, motivo)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ''', datos)
-            conn.commit()
-            cursor.close()
-            conn.close()
+            reservar_turno(current_user.id, request.form)
             
             content = f'''
             <div class="container">
@@ -658,10 +746,19 @@ def agendar_turno():
             </div>
             '''
             return render_page('Turno Agendado', content, current_user)
+        except HorarioOcupado as e:
+            libres = ', '.join(e.libres) or 'ninguno'
+            content = f'<div class="container"><div class="message error">❌ {e}. Horarios libres: {libres}</div><div class="link"><a href="/agendar">Volver</a></div></div>'
+            return render_page('Horario Ocupado', content, current_user)
         except Exception as e:
             content = f'<div class="container"><div class="message error">❌ Error: {e}</div><div class="link"><a href="/agendar">Volver</a></div></div>'
             return render_page('Error', content, current_user)
     
+    try:
+        servicios = catalogo_servicios.listar()
+    except:
+        servicios = []
+    
     servicios_html = ''
     for s in servicios:
         servicios_html += f'<option value="{s["id"]}">{s["nombre"]}</option>'
@@ -678,13 +775,34 @@ def agendar_turno():
             <div class="form-group"><label><i class="fas fa-stethoscope"></i> Servicio médico</label><select name="servicio_id" required><option value="">Selecciona un servicio</option>{servicios_html}</select></div>
             <div class="row">
                 <div class="col"><div class="form-group"><label><i class="fas fa-calendar"></i> Fecha</label><input type="date" name="fecha" required></div></div>
-                <div class="col"><div class="form-group"><label><i class="fas fa-clock"></i> Hora</label><input type="time" name="hora" required></div></div>
+                <div class="col"><div class="form-group"><label><i class="fas fa-clock"></i> Hora</label><input type="time" name="hora" list="horas-libres" required><datalist id="horas-libres"></datalist></div></div>
             </div>
             <div class="form-group"><label><i class="fas fa-comment"></i> Motivo de consulta</label><textarea name="motivo" rows="3" placeholder="Describe el motivo de tu consulta"></textarea></div>
             <button type="submit"><i class="fas fa-save"></i> Agendar Turno</button>
             <a href="/"><button type="button" class="btn-secondary"><i class="fas fa-times"></i> Cancelar</button></a>
         </form>
     </div>
+    <script>
+        // Sugiere las horas libres del servicio y fecha elegidos
+        function cargarHorasLibres() {{
+            var servicio = document.querySelector('[name=servicio_id]').value;
+            var fecha = document.querySelector('[name=fecha]').value;
+            var lista = document.getElementById('horas-libres');
+            lista.innerHTML = '';
+            if (!servicio || !fecha) return;
+            fetch('/agendar/disponibilidad?servicio_id=' + servicio + '&fecha=' + fecha)
+                .then(function (r) {{ return r.ok ? r.json() : {{libres: []}}; }})
+                .then(function (datos) {{
+                    datos.libres.forEach(function (hora) {{
+                        var opcion = document.createElement('option');
+                        opcion.value = hora;
+                        lista.appendChild(opcion);
+                    }});
+                }});
+        }}
+        document.querySelector('[name=servicio_id]').addEventListener('change', cargarHorasLibres);
+        document.querySelector('[name=fecha]').addEventListener('change', cargarHorasLibres);
+    </script>
     '''
     return render_page('Agendar Turno', content, current_user)
 
@@ -692,62 +810,293 @@ def agendar_turno():
 # MIS TURNOS
 # ============================================
 
+ESTADOS_TURNO = ('Programado', 'Confirmado', 'Cancelado', 'Completado')
+
+CLASES_ESTADO = {'Programado': 'badge-programado', 'Confirmado': 'badge-confirmado', 'Cancelado': 'badge-cancelado'}
+
+# Columnas que la API puede devolver (?campos=)
+CAMPOS_TURNO = ('id', 'nombre_completo', 'cedula', 'telefono', 'servicio_id', 'servicio_nombre',
+                'fecha', 'hora', 'motivo', 'estado', 'fecha_creacion')
+
+CURSOR_RE = re.compile(r'^(\d{4}-\d{2}-\d{2})_(\d{1,3}:\d{2}:\d{2})_(\d+)$')
+
+def codificar_cursor(turno):
+    """Posición (fecha, hora, id) del último turno de una página"""
+    return f"{turno['fecha']}_{turno['hora']}_{turno['id']}"
+
+def decodificar_cursor(valor):
+    """Retorna (fecha, hora, id) o None si el cursor no es válido"""
+    coincidencia = CURSOR_RE.match(valor or '')
+    if not coincidencia:
+        return None
+    fecha, hora, turno_id = coincidencia.groups()
+    try:
+        date.fromisoformat(fecha)
+    except ValueError:
+        return None
+    return fecha, hora, int(turno_id)
+
+def buscar_turnos_usuario(cursor, usuario_id, limite, despues=None, estado=None, campos=None):
+    """Página de turnos de un usuario, más recientes primero.
+
+    Paginación por clave (fecha, hora, id): cada página continúa después
+    del cursor de la anterior usando el índice idx_turnos_usuario_fecha
+    (o idx_turnos_usuario_estado_fecha si se filtra por estado).
+    `campos` limita las columnas leídas (ya validadas contra CAMPOS_TURNO).
+    Retorna (turnos, siguiente_cursor).
+    """
+    if campos:
+        columnas = ', '.join(['id', 'fecha', 'hora'] + [c for c in campos if c not in ('id', 'fecha', 'hora')])
+    else:
+        columnas = '*'
+    sql = f"SELECT {columnas} FROM turnos WHERE usuario_id = %s"
+    params = [usuario_id]
+    if estado:
+        sql += " AND estado = %s"
+        params.append(estado)
+    if despues:
+        fecha, hora, turno_id = despues
+        sql += " AND (fecha < %s OR (fecha = %s AND (hora < %s OR (hora = %s AND id < %s))))"
+        params += [fecha, fecha, hora, hora, turno_id]
+    sql += " ORDER BY fecha DESC, hora DESC, id DESC LIMIT %s"
+    params.append(limite + 1)
+    
+    cursor.execute(sql, params)
+    turnos = cursor.fetchall()
+    siguiente = None
+    if len(turnos) > limite:
+        turnos = turnos[:limite]
+        siguiente = codificar_cursor(turnos[-1])
+    return turnos, siguiente
+
+def leer_por_pagina():
+    """Tamaño de página pedido en ?por_pagina, acotado por la configuración"""
+    try:
+        por_pagina = int(request.args.get('por_pagina', app.config['TURNOS_POR_PAGINA']))
+    except ValueError:
+        por_pagina = app.config['TURNOS_POR_PAGINA']
+    return max(1, min(por_pagina, app.config['TURNOS_POR_PAGINA_MAX']))
+
 @app.route('/mis-turnos')
 @login_required
 def mis_turnos():
+    estado = request.args.get('estado')
+    if estado not in ESTADOS_TURNO:
+        estado = None
+    por_pagina = leer_por_pagina()
+    despues = decodificar_cursor(request.args.get('cursor'))
+    
     try:
         conn = get_db()
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM turnos WHERE usuario_id = %s ORDER BY fecha DESC, hora DESC", (current_user.id,))
-        turnos = cursor.fetchall()
+        turnos, siguiente = buscar_turnos_usuario(cursor, current_user.id, por_pagina, despues, estado)
         cursor.close()
         conn.close()
         
-        if not turnos:
-            turnos_html = '<p style="text-align: center; padding: 40px;">No tienes turnos agendados. <a href="/agendar">Agendar turno</a></p>'
-        else:
-            turnos_html = '''
-            <table>
-                <thead><tr><th>Fecha</th><th>Hora</th><th>Servicio</th><th>Estado</th><th>Acciones</th></tr></thead>
-                <tbody>
-            '''
-            for t in turnos:
-                estado_class = {'Programado': 'badge-programado', 'Confirmado': 'badge-confirmado', 'Cancelado': 'badge-cancelado'}.get(t['estado'], 'badge-programado')
-                turnos_html += f'''
-                    <tr>
-                        <td>{t['fecha']}</td><td>{t['hora']}</td><td>{t['servicio_nombre']}</td>
-                        <td><span class="badge {estado_class}">{t['estado']}</span></td>
-                        <td><a href="/cancelar-turno/{t['id']}" onclick="return confirm('¿Cancelar este turno?')"><button class="btn-sm btn-delete"><i class="fas fa-trash"></i> Cancelar</button></a></td>
-                    </tr>
-                '''
-            turnos_html += '</tbody></table>'
-        
-        content = f'''
-        <div class="container container-large">
-            <h2><i class="fas fa-calendar-check"></i> Mis Turnos</h2>
-            {turnos_html}
-            <div class="link"><a href="/agendar"><i class="fas fa-plus-circle"></i> Agendar nuevo turno</a></div>
-        </div>
-        '''
-        return render_page('Mis Turnos', content, current_user)
+        return stream_pagina(
+            'mis_turnos.html', current_user,
+            turnos=turnos,
+            siguiente=siguiente,
+            despues=despues,
+            estado=estado,
+            por_pagina=por_pagina,
+            filtros=[('Todos', None)] + [(e, e) for e in ESTADOS_TURNO],
+            clases_estado=CLASES_ESTADO
+        )
     except Exception as e:
         content = f'<div class="container"><div class="message error">❌ Error: {e}</div><div class="link"><a href="/">Volver</a></div></div>'
         return render_page('Error', content, current_user)
 
+def cancelar_turno_usuario(turno_id, usuario_id):
+    """Cancela un turno del usuario. Retorna False si el turno no es suyo"""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute("SELECT estado, servicio_id, fecha FROM turnos WHERE id = %s AND usuario_id = %s", (turno_id, usuario_id))
+    turno = cursor.fetchone()
+    if turno and turno[0] != 'Cancelado':
+        cursor.execute("UPDATE turnos SET estado = 'Cancelado' WHERE id = %s AND usuario_id = %s", (turno_id, usuario_id))
+        conn.commit()
+        contadores.turno_cambio_estado(turno[1], turno[0], 'Cancelado')
+        agenda.liberar(turno[1], str(turno[2]), turno_id)
+    cursor.close()
+    conn.close()
+    return turno is not None
+
 @app.route('/cancelar-turno/<int:id>')
 @login_required
 def cancelar_turno(id):
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("UPDATE turnos SET estado = 'Cancelado' WHERE id = %s AND usuario_id = %s", (id, current_user.id))
-        conn.commit()
-        cursor.close()
-        conn.close()
+        cancelar_turno_usuario(id, current_user.id)
         return redirect(url_for('mis_turnos'))
     except:
         return redirect(url_for('mis_turnos'))
 
+# ============================================
+# API JSON DE TURNOS
+# ============================================
+
+def valor_json(valor):
+    """Convierte los tipos de MySQL (DATE, TIME, DATETIME) a texto"""
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    if isinstance(valor, timedelta):
+        segundos = int(valor.total_seconds())
+        return f'{segundos // 3600:02d}:{segundos % 3600 // 60:02d}:{segundos % 60:02d}'
+    return str(valor)
+
+def respuesta_json(datos, estado=200):
+    """JSON compacto con ETag; los GET repetidos sin cambios reciben un 304"""
+    cuerpo = json.dumps(datos, default=valor_json, ensure_ascii=False, separators=(',', ':'))
+    response = app.response_class(cuerpo, status=estado, mimetype='application/json')
+    if request.method == 'GET' and estado == 200:
+        response.set_etag(hashlib.md5(cuerpo.encode('utf-8')).hexdigest())
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+    return response
+
+def error_json(mensaje, estado, **extra):
+    return respuesta_json({'error': mensaje, **extra}, estado)
+
+def leer_campos():
+    """Columnas pedidas en ?campos=a,b,c (None = todas)"""
+    valor = request.args.get('campos')
+    if not valor:
+        return None
+    campos = [c.strip() for c in valor.split(',') if c.strip()]
+    invalidos = [c for c in campos if c not in CAMPOS_TURNO]
+    if invalidos:
+        raise ValueError(f'Campos no válidos: {", ".join(invalidos)}')
+    return campos
+
+def proyectar(turno, campos):
+    if campos is None:
+        return turno
+    return {c: turno[c] for c in campos}
+
+@app.route('/api/turnos')
+@api_login_required
+def api_listar_turnos():
+    estado = request.args.get('estado')
+    if estado and estado not in ESTADOS_TURNO:
+        return error_json('Estado no válido', 400)
+    despues = None
+    if request.args.get('cursor'):
+        despues = decodificar_cursor(request.args.get('cursor'))
+        if despues is None:
+            return error_json('Cursor no válido', 400)
+    try:
+        campos = leer_campos()
+    except ValueError as e:
+        return error_json(str(e), 400)
+    
+    conn = get_db()
+    cursor = conn.cursor(dictionary=True)
+    turnos, siguiente = buscar_turnos_usuario(cursor, current_user.id, leer_por_pagina(), despues, estado, campos)
+    cursor.close()
+    conn.close()
+    return respuesta_json({
+        'turnos': [proyectar(t, campos) for t in turnos],
+        'siguiente': siguiente
+    })
+
+@app.route('/api/turnos/<int:id>')
+@api_login_required
+def api_obtener_turno(id):
+    try:
+        campos = leer_campos()
+    except ValueError as e:
+        return error_json(str(e), 400)
+    
+    conn = get_db()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(f"SELECT {', '.join(campos or CAMPOS_TURNO)} FROM turnos WHERE id = %s AND usuario_id = %s",
+                   (id, current_user.id))
+    turno = cursor.fetchone()
+    cursor.close()
+    conn.close()
+    if not turno:
+        return error_json('Turno no encontrado', 404)
+    return respuesta_json(turno)
+
+@app.route('/api/turnos', methods=['POST'])
+@api_login_required
+def api_crear_turno():
+    datos = request.get_json(silent=True) if request.is_json else request.form
+    if not hasattr(datos, 'get'):
+        return error_json('Se esperaba un objeto JSON', 400)
+    try:
+        turno_id = reservar_turno(current_user.id, datos)
+    except HorarioOcupado as e:
+        return error_json(str(e), 409, libres=e.libres)
+    except (ValueError, TypeError) as e:
+        return error_json(str(e), 400)
+    return respuesta_json({'id': turno_id}, 201)
+
+@app.route('/api/turnos/<int:id>/cancelar', methods=['POST'])
+@api_login_required
+def api_cancelar_turno(id):
+    if not cancelar_turno_usuario(id, current_user.id):
+        return error_json('Turno no encontrado', 404)
+    return respuesta_json({'id': id, 'estado': 'Cancelado'})
+
+# ============================================
+# ESTADO DEL POOL Y CACHÉS
+# ============================================
+
+@app.route('/metrics')
+def exportar_metricas():
+    pool = db_pool.estadisticas()
+    usuarios = cache_usuarios.estadisticas()
+    hashes = hasheador.estadisticas()
+    compresion = compresor.estadisticas()
+    indicadores = {
+        'db_pool_in_use': (pool['en_uso'], 'Conexiones prestadas'),
+        'db_pool_idle': (pool['libres'], 'Conexiones libres'),
+        'db_pool_overflow': (pool['desborde'], 'Conexiones de desborde en uso'),
+        'db_pool_created': (pool['creadas'], 'Conexiones abiertas desde el inicio', 'counter'),
+        'db_pool_waits': (pool['esperas'], 'Veces que se esperó una conexión libre', 'counter'),
+        'db_pool_exhausted': (pool['agotado'], 'Veces que se agotó la espera', 'counter'),
+        'user_cache_hits': (usuarios['aciertos'], 'Aciertos de la caché de usuarios', 'counter'),
+        'user_cache_misses': (usuarios['fallos'], 'Fallos de la caché de usuarios', 'counter'),
+        'user_cache_entries': (usuarios['entradas'], 'Usuarios en caché'),
+        'password_hash_rejected': (hashes['rechazados'], 'Hashes rechazados por cola llena', 'counter'),
+        'password_hash_timeouts': (hashes['agotados'], 'Hashes que superaron el tiempo límite', 'counter'),
+        'password_hash_upgraded': (hashes['actualizados'], 'Hashes actualizados al método configurado', 'counter'),
+        'password_hash_seconds': (round(hashes['segundos'], 3), 'Segundos acumulados calculando hashes', 'counter'),
+        'compression_responses': (compresion['respuestas_comprimidas'], 'Respuestas comprimidas', 'counter'),
+        'compression_bytes_in': (compresion['bytes_originales'], 'Bytes antes de comprimir', 'counter'),
+        'compression_bytes_out': (compresion['bytes_enviados'], 'Bytes enviados tras comprimir', 'counter'),
+        'compression_bytes_saved': (compresion['bytes_ahorrados'], 'Bytes ahorrados por la compresión', 'counter'),
+    }
+    return app.response_class(metricas.exportar(indicadores), mimetype='text/plain; version=0.0.4')
+
+@app.route('/estado/consultas')
+@login_required
+def estado_consultas():
+    orden = request.args.get('orden', 'tiempo_total')
+    return jsonify(perfilador.top(limite=50, orden=orden))
+
+@app.route('/estado/pool')
+@login_required
+def estado_pool():
+    return jsonify(db_pool.estadisticas())
+
+@app.route('/estado/contadores')
+@login_required
+def estado_contadores():
+    return jsonify(contadores.resumen())
+
+@app.route('/estado/cache')
+@login_required
+def estado_cache():
+    return jsonify({
+        'usuarios': cache_usuarios.estadisticas(),
+        'hashes': hasheador.estadisticas(),
+        'compresion': compresor.estadisticas(),
+        'servicios': {'version': catalogo_servicios.version}
+    })
+
 # ============================================
 # INICIO DE LA APLICACIÓN
 # ============================================
@@ -762,4 +1111,9 @@ if __name__ == '__main__':
     ║     ✅ Estado: Listo para usar                           ║
     ╚══════════════════════════════════════════════════════════╝
     ''')
+    # En desarrollo se migra al iniciar; en producción se usa "python migraciones.py"
+    try:
+        init_db()
+    except Exception as e:
+        print(f"⚠️ Error en base de datos: {e}")
     app.run(debug=True)
@@ -0,0 +1,476 @@
+﻿# benchmark_app.py
+# Benchmark de carga por ruta para la aplicación web (app.py)
+#
+# Usa una base MySQL propia (por defecto turnos_bench, variable DB_NAME),
+# nunca turnos_db salvo que se indique explícitamente. Los turnos que la
+# carga agenda o cancela se deshacen al terminar cada ejecución, así todas
+# miden sobre los mismos datos y --comparar compara lo mismo.
+#
+#   python benchmark_app.py --sembrar --usuarios 10000 --turnos 1000000
+#   python benchmark_app.py --concurrencia 20 --duracion 30 --guardar bench_base.json
+#   python benchmark_app.py --concurrencia 20 --duracion 30 --comparar bench_base.json
+#   python benchmark_app.py --wsgi ...   (servidor WSGI local en vez del test client)
+
+import argparse
+import http.cookiejar
+import json
+import logging
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from datetime import date, timedelta
+
+os.environ.setdefault('DB_NAME', 'turnos_bench')
+os.environ.setdefault('DB_VERIFICAR_ESQUEMA', '0')
+
+import mysql.connector
+from werkzeug.security import generate_password_hash
+
+import app as aplicacion
+from migraciones import migrar
+
+PASSWORD_BENCH = 'bench-patronato'
+MOTIVO_CARGA = 'Benchmark'
+# Cada hilo usa su propio random.Random(SEMILLA + i): la misma secuencia de
+# rutas y datos en cada ejecución, sin compartir el generador entre hilos
+SEMILLA = 2024
+# El pool de hash (PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE) responde 503
+# si todos inician sesión a la vez: se reintenta con espera creciente
+INTENTOS_LOGIN = 20
+ESPERA_LOGIN = 0.05
+ESTADOS_PESOS = [('Programado', 60), ('Confirmado', 20), ('Cancelado', 15), ('Completado', 5)]
+
+# Colección: Lista de (nombre de ruta, peso) para elegir la siguiente petición
+MEZCLA_RUTAS = [
+    ('GET /', 25),
+    ('GET /login', 5),
+    ('GET /agendar', 15),
+    ('POST /agendar', 10),
+    ('GET /mis-turnos', 35),
+    ('GET /cancelar-turno/<id>', 10),
+]
+
+
+# ============================================
+# SEMBRADO DE DATOS
+# ============================================
+
+def crear_base_datos():
+    """Crea la base de benchmark si no existe y aplica las migraciones"""
+    config = dict(aplicacion.DB_CONFIG)
+    nombre = config.pop('database')
+    conn = mysql.connector.connect(**config)
+    cursor = conn.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{nombre}` CHARACTER SET utf8mb4")
+    cursor.close()
+    conn.close()
+
+    conn = aplicacion.get_db()
+    migrar(conn)
+    conn.close()
+
+
+def sembrar(usuarios, turnos, lote=5000):
+    """Inserta usuarios bench* y turnos aleatorios en lotes"""
+    crear_base_datos()
+    azar = random.Random(SEMILLA)
+    conn = aplicacion.get_db()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT id, nombre FROM servicios")
+    servicios = cursor.fetchall()
+    cursor.execute("SELECT COUNT(*) FROM usuarios WHERE email LIKE 'bench%%@patronato.test'")
+    existentes = cursor.fetchone()[0]
+
+    # Un solo hash para todos: el sembrado no debe medir PBKDF2
+    password_hash = generate_password_hash(PASSWORD_BENCH)
+    inicio = time.perf_counter()
+    filas = []
+    for i in range(existentes, usuarios):
+        filas.append((f'Usuario Bench {i}', f'bench{i}@patronato.test', password_hash))
+        if len(filas) >= lote:
+            cursor.executemany("INSERT INTO usuarios (nombre, email, password) VALUES (%s, %s, %s)", filas)
+            conn.commit()
+            filas = []
+    if filas:
+        cursor.executemany("INSERT INTO usuarios (nombre, email, password) VALUES (%s, %s, %s)", filas)
+        conn.commit()
+    print(f"👥 {usuarios - existentes} usuarios en {time.perf_counter() - inicio:.1f}s")
+
+    cursor.execute("SELECT id FROM usuarios WHERE email LIKE 'bench%%@patronato.test'")
+    ids_usuarios = [fila[0] for fila in cursor.fetchall()]
+    cursor.execute("SELECT COUNT(*) FROM turnos")
+    faltantes = turnos - cursor.fetchone()[0]
+
+    estados = [e for e, _ in ESTADOS_PESOS]
+    pesos = [p for _, p in ESTADOS_PESOS]
+    hoy = date.today()
+    inicio = time.perf_counter()
+    filas = []
+    for i in range(max(0, faltantes)):
+        servicio_id, servicio_nombre = azar.choice(servicios)
+        filas.append((
+            azar.choice(ids_usuarios),
+            f'Paciente Bench {i}',
+            f'{azar.randint(1100000000, 1199999999)}',
+            '0991234567',
+            servicio_id,
+            servicio_nombre,
+            hoy + timedelta(days=azar.randint(-365, 365)),
+            f'{azar.randint(8, 16):02d}:{azar.choice((0, 15, 30, 45)):02d}',
+            'Turno de benchmark',
+            azar.choices(estados, pesos)[0],
+        ))
+        if len(filas) >= lote:
+            insertar_turnos(cursor, filas)
+            conn.commit()
+            filas = []
+    if filas:
+        insertar_turnos(cursor, filas)
+        conn.commit()
+    print(f"📅 {max(0, faltantes)} turnos en {time.perf_counter() - inicio:.1f}s")
+
+    cursor.close()
+    conn.close()
+
+
+def insertar_turnos(cursor, filas):
+    cursor.executemany('''
+        INSERT INTO turnos (usuario_id, nombre_completo, cedula, telefono, servicio_id,
+                            servicio_nombre, fecha, hora, motivo, estado)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ''', filas)
+
+
+# ============================================
+# CLIENTES SIMULADOS
+# ============================================
+
+class ClienteTest:
+    """Peticiones a través del test client de Flask (sin red).
+
+    get() y post() retornan (código HTTP, Location) como ClienteHTTP.
+    """
+
+    def __init__(self, base_url=None):
+        self.cliente = aplicacion.app.test_client()
+
+    def _resultado(self, respuesta):
+        return respuesta.status_code, respuesta.headers.get('Location', '')
+
+    def get(self, ruta):
+        return self._resultado(self.cliente.get(ruta))
+
+    def post(self, ruta, datos):
+        return self._resultado(self.cliente.post(ruta, data=datos))
+
+
+class SinRedireccion(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class ClienteHTTP:
+    """Peticiones HTTP reales contra el servidor WSGI local"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()),
+            SinRedireccion()
+        )
+
+    def _abrir(self, peticion):
+        try:
+            with self.opener.open(peticion) as respuesta:
+                respuesta.read()
+                return respuesta.status, ''
+        except urllib.error.HTTPError as e:
+            # Incluye las redirecciones, que SinRedireccion no sigue
+            return e.code, e.headers.get('Location', '')
+
+    def get(self, ruta):
+        return self._abrir(self.base_url + ruta)
+
+    def post(self, ruta, datos):
+        cuerpo = urllib.parse.urlencode(datos).encode()
+        return self._abrir(urllib.request.Request(self.base_url + ruta, data=cuerpo))
+
+
+def usuarios_activos(cantidad):
+    """Retorna [(email, [ids de turnos])] de los primeros usuarios bench"""
+    conn = aplicacion.get_db()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT id, email FROM usuarios WHERE email LIKE 'bench%%@patronato.test'
+        ORDER BY id LIMIT %s
+    ''', (cantidad,))
+    usuarios = cursor.fetchall()
+    activos = []
+    for usuario_id, email in usuarios:
+        cursor.execute("SELECT id FROM turnos WHERE usuario_id = %s LIMIT 100", (usuario_id,))
+        activos.append((email, [fila[0] for fila in cursor.fetchall()]))
+    cursor.close()
+    conn.close()
+    return activos
+
+
+def es_error(estado, destino):
+    """4xx/5xx y las redirecciones a /login (la sesión no es válida)"""
+    if estado >= 400:
+        return True
+    return 300 <= estado < 400 and urllib.parse.urlparse(destino).path == '/login'
+
+
+def medir(resultados, nombre, funcion, *args):
+    """Ejecuta la petición, guarda (segundos, código, es_error) y retorna (código, Location)"""
+    inicio = time.perf_counter()
+    estado, destino = funcion(*args)
+    resultados[nombre].append((time.perf_counter() - inicio, estado, es_error(estado, destino)))
+    return estado, destino
+
+
+def iniciar_sesion(cliente, email, azar, resultados):
+    """Reintenta el login hasta recibir el 302 a /; retorna True si lo logró"""
+    for intento in range(INTENTOS_LOGIN):
+        estado, destino = medir(resultados, 'POST /login', cliente.post, '/login',
+                                {'email': email, 'password': PASSWORD_BENCH})
+        if estado == 302 and urllib.parse.urlparse(destino).path == '/':
+            return True
+        if estado != 503:
+            # Credenciales u otro error: reintentar no lo va a arreglar
+            return False
+        time.sleep(ESPERA_LOGIN * (intento + 1) * azar.uniform(0.5, 1.5))
+    return False
+
+
+def simular_usuario(cliente, azar, turnos_ids, servicios_ids, hasta, resultados):
+    """Hace peticiones (con sesión ya iniciada) según MEZCLA_RUTAS hasta `hasta`"""
+    rutas = [r for r, _ in MEZCLA_RUTAS]
+    pesos = [p for _, p in MEZCLA_RUTAS]
+
+    while time.perf_counter() < hasta:
+        ruta = azar.choices(rutas, pesos)[0]
+        if ruta == 'GET /':
+            medir(resultados, ruta, cliente.get, '/')
+        elif ruta == 'GET /login':
+            medir(resultados, ruta, cliente.get, '/login')
+        elif ruta == 'GET /agendar':
+            medir(resultados, ruta, cliente.get, '/agendar')
+        elif ruta == 'POST /agendar':
+            datos = {
+                'servicio_id': azar.choice(servicios_ids),
+                'nombre_completo': 'Paciente Bench',
+                'cedula': '1100000000',
+                'telefono': '0991234567',
+                'fecha': (date.today() + timedelta(days=azar.randint(1, 60))).isoformat(),
+                'hora': f'{azar.randint(8, 16):02d}:{azar.choice((0, 15, 30, 45)):02d}',
+                'motivo': MOTIVO_CARGA,
+            }
+            medir(resultados, ruta, cliente.post, '/agendar', datos)
+        elif ruta == 'GET /mis-turnos':
+            medir(resultados, ruta, cliente.get, '/mis-turnos')
+        elif turnos_ids:
+            medir(resultados, ruta, cliente.get, f'/cancelar-turno/{azar.choice(turnos_ids)}')
+
+
+# ============================================
+# RESTABLECER DATOS ENTRE EJECUCIONES
+# ============================================
+
+def instantanea(activos, lote=1000):
+    """Último id de turnos y estado de los turnos que la carga puede cancelar"""
+    conn = aplicacion.get_db()
+    cursor = conn.cursor()
+    # Restos de una ejecución interrumpida
+    cursor.execute("DELETE FROM turnos WHERE motivo = %s", (MOTIVO_CARGA,))
+    conn.commit()
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM turnos")
+    ultimo_id = cursor.fetchone()[0]
+    ids = sorted({turno_id for _, turnos_ids in activos for turno_id in turnos_ids})
+    estados = []
+    for i in range(0, len(ids), lote):
+        parte = ids[i:i + lote]
+        cursor.execute(f"SELECT estado, id FROM turnos WHERE id IN ({', '.join(['%s'] * len(parte))})", parte)
+        estados.extend(cursor.fetchall())
+    cursor.close()
+    conn.close()
+    return ultimo_id, estados
+
+
+def restablecer(ultimo_id, estados):
+    """Borra los turnos agendados por la carga y devuelve su estado a los cancelados"""
+    conn = aplicacion.get_db()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM turnos WHERE id > %s", (ultimo_id,))
+    borrados = cursor.rowcount
+    cursor.executemany("UPDATE turnos SET estado = %s WHERE id = %s", estados)
+    conn.commit()
+    cursor.close()
+    conn.close()
+    print(f"♻️  Datos restablecidos: {borrados} turnos agendados borrados, {len(estados)} estados repuestos")
+
+
+# ============================================
+# EJECUCIÓN Y REPORTE
+# ============================================
+
+def ejecutar_hilos(cantidad, funcion):
+    """Ejecuta funcion(i) en `cantidad` hilos y espera a que terminen"""
+    hilos = [threading.Thread(target=funcion, args=(i,)) for i in range(cantidad)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+
+def resumir(muestras, segundos):
+    """Peticiones, errores, req/s y percentiles de latencia de una ruta"""
+    latencias = sorted(duracion * 1000 for duracion, _, _ in muestras)
+    return {
+        'peticiones': len(muestras),
+        'errores': sum(1 for _, _, error in muestras if error),
+        'rps': round(len(muestras) / segundos, 2) if segundos else 0.0,
+        'p50_ms': round(percentil(latencias, 50), 2),
+        'p95_ms': round(percentil(latencias, 95), 2),
+        'p99_ms': round(percentil(latencias, 99), 2),
+    }
+
+
+def percentil(valores_ordenados, p):
+    """Percentil por rango más cercano sobre una lista ya ordenada"""
+    if not valores_ordenados:
+        return 0.0
+    indice = max(0, min(len(valores_ordenados) - 1, round(p / 100 * len(valores_ordenados)) - 1))
+    return valores_ordenados[indice]
+
+
+def ejecutar(concurrencia, duracion, usar_wsgi, cantidad_usuarios):
+    activos = usuarios_activos(max(concurrencia, cantidad_usuarios))
+    if not activos:
+        raise SystemExit("❌ No hay usuarios bench. Ejecute primero con --sembrar")
+    servicios_ids = [s['id'] for s in aplicacion.catalogo_servicios.listar()]
+    ultimo_id, estados = instantanea(activos)
+    try:
+        return medir_carga(concurrencia, duracion, usar_wsgi, activos, servicios_ids)
+    finally:
+        restablecer(ultimo_id, estados)
+
+
+def medir_carga(concurrencia, duracion, usar_wsgi, activos, servicios_ids):
+    servidor = None
+    base_url = None
+    clase_cliente = ClienteTest
+    if usar_wsgi:
+        from werkzeug.serving import make_server
+        # Sin log por petición: solo interesa el reporte
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        servidor = make_server('127.0.0.1', 0, aplicacion.app, threaded=True)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{servidor.server_port}'
+        clase_cliente = ClienteHTTP
+
+    # Colección: Diccionario ruta -> lista de (segundos, código HTTP, es_error)
+    resultados = defaultdict(list)
+    azares = [random.Random(SEMILLA + i) for i in range(concurrencia)]
+    clientes = [clase_cliente(base_url) for _ in range(concurrencia)]
+
+    try:
+        # Fase 1: todos inician sesión (fuera de la ventana medida)
+        sesiones = [False] * concurrencia
+        resultados_login = defaultdict(list)
+
+        def iniciar(i):
+            email = activos[i % len(activos)][0]
+            sesiones[i] = iniciar_sesion(clientes[i], email, azares[i], resultados_login)
+
+        inicio = time.perf_counter()
+        ejecutar_hilos(concurrencia, iniciar)
+        duracion_login = time.perf_counter() - inicio
+        fallidos = [activos[i % len(activos)][0] for i, ok in enumerate(sesiones) if not ok]
+        if fallidos:
+            raise SystemExit(f"❌ {len(fallidos)} usuario(s) no pudieron iniciar sesión "
+                             f"tras {INTENTOS_LOGIN} intentos: {', '.join(fallidos[:5])}")
+
+        # Fase 2: la mezcla de rutas durante `duracion` segundos
+        inicio = time.perf_counter()
+        hasta = inicio + duracion
+        ejecutar_hilos(concurrencia, lambda i: simular_usuario(
+            clientes[i], azares[i], activos[i % len(activos)][1], servicios_ids, hasta, resultados))
+        transcurrido = time.perf_counter() - inicio
+    finally:
+        if servidor:
+            servidor.shutdown()
+
+    reporte = {'POST /login': resumir(resultados_login['POST /login'], duracion_login)}
+    for ruta, muestras in sorted(resultados.items()):
+        reporte[ruta] = resumir(muestras, transcurrido)
+    return {
+        'modo': 'wsgi' if usar_wsgi else 'test_client',
+        'concurrencia': concurrencia,
+        'duracion_s': round(transcurrido, 2),
+        'pool': aplicacion.db_pool.estadisticas(),
+        'rutas': reporte,
+    }
+
+
+def imprimir(resultado, base=None):
+    print(f"\n📊 Modo {resultado['modo']}, {resultado['concurrencia']} usuarios, {resultado['duracion_s']}s")
+    encabezado = f"{'Ruta':<28}{'n':>8}{'err':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    if base:
+        encabezado += f"{'Δp95':>10}{'Δreq/s':>10}"
+    print(encabezado)
+    print('-' * len(encabezado))
+    for ruta, r in resultado['rutas'].items():
+        linea = (f"{ruta:<28}{r['peticiones']:>8}{r['errores']:>6}{r['rps']:>10}"
+                 f"{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}")
+        anterior = base['rutas'].get(ruta) if base else None
+        if anterior:
+            linea += f"{variacion(r['p95_ms'], anterior['p95_ms']):>10}{variacion(r['rps'], anterior['rps']):>10}"
+        print(linea)
+
+
+def variacion(actual, anterior):
+    if not anterior:
+        return '-'
+    return f"{(actual - anterior) / anterior * 100:+.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de carga por ruta de app.py')
+    parser.add_argument('--sembrar', action='store_true', help='Crear y poblar la base de benchmark')
+    parser.add_argument('--usuarios', type=int, default=10000, help='Usuarios a sembrar')
+    parser.add_argument('--turnos', type=int, default=1000000, help='Turnos a sembrar')
+    parser.add_argument('--concurrencia', type=int, default=10, help='Usuarios simulados simultáneos')
+    parser.add_argument('--activos', type=int, default=200, help='Usuarios distintos que inician sesión')
+    parser.add_argument('--duracion', type=float, default=20, help='Segundos de carga')
+    parser.add_argument('--wsgi', action='store_true', help='Usar un servidor WSGI local en vez del test client')
+    parser.add_argument('--guardar', help='Guardar el resultado como línea base (JSON)')
+    parser.add_argument('--comparar', help='Comparar contra una línea base guardada (JSON)')
+    args = parser.parse_args()
+
+    print(f"🗄️  Base de datos: {aplicacion.DB_CONFIG['database']}")
+    if args.sembrar:
+        sembrar(args.usuarios, args.turnos)
+        return
+
+    resultado = ejecutar(args.concurrencia, args.duracion, args.wsgi, args.activos)
+    base = None
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            base = json.load(f)
+    imprimir(resultado, base)
+
+    if args.guardar:
+        with open(args.guardar, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Línea base guardada en {args.guardar}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# benchmark_memoria.py
+# Mide la memoria por entidad (Paciente, Medico, Cita) al cargar un inventario grande
+#
+# Compara las clases anteriores (atributos en __dict__, fecha como texto y
+# fecha_creacion formateada en cada objeto) con las actuales de models_backup
+# (__slots__, fecha como ordinal, estado/especialidad/hora compartidos).
+#
+# Uso:
+#   python benchmark_memoria.py                 # 1.000.000 de citas
+#   python benchmark_memoria.py --citas 200000
+
+import argparse
+import random
+import sqlite3
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+from models_backup import Cita, InventarioCitas, Medico, Paciente
+
+
+# ==================== CLASES ANTERIORES (REFERENCIA) ====================
+
+class PacienteAnterior:
+    def __init__(self, id=None, cedula="", nombre="", apellido="",
+                 fecha_nacimiento="", telefono="", direccion="", email=""):
+        self.id = id
+        self.cedula = cedula
+        self.nombre = nombre
+        self.apellido = apellido
+        self.fecha_nacimiento = fecha_nacimiento
+        self.telefono = telefono
+        self.direccion = direccion
+        self.email = email
+
+
+class MedicoAnterior:
+    def __init__(self, id=None, cedula="", nombre="", apellido="",
+                 especialidad="", telefono="", email=""):
+        self.id = id
+        self.cedula = cedula
+        self.nombre = nombre
+        self.apellido = apellido
+        self.especialidad = especialidad if especialidad in Medico.ESPECIALIDADES else "Medicina General"
+        self.telefono = telefono
+        self.email = email
+
+
+class CitaAnterior:
+    def __init__(self, id=None, paciente_id=None, medico_id=None,
+                 fecha="", hora="", motivo="", estado="Programada"):
+        self.id = id
+        self.paciente_id = paciente_id
+        self.medico_id = medico_id
+        self.fecha = fecha
+        self.hora = hora
+        self.motivo = motivo
+        self.estado = estado if estado in Cita.ESTADOS else "Programada"
+        self.fecha_creacion = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+# ==================== DATOS DE PRUEBA ====================
+
+def crear_base(n_citas, n_pacientes, n_medicos, semilla=2024):
+    """Base SQLite en memoria con el esquema mínimo y datos aleatorios"""
+    azar = random.Random(semilla)
+    conn = sqlite3.connect(':memory:')
+    conn.executescript('''
+        CREATE TABLE pacientes (id INTEGER PRIMARY KEY, cedula TEXT, nombre TEXT, apellido TEXT,
+                                fecha_nacimiento TEXT, telefono TEXT, direccion TEXT, email TEXT);
+        CREATE TABLE medicos (id INTEGER PRIMARY KEY, cedula TEXT, nombre TEXT, apellido TEXT,
+                              especialidad TEXT, telefono TEXT, email TEXT);
+        CREATE TABLE citas (id INTEGER PRIMARY KEY, paciente_id INTEGER, medico_id INTEGER,
+                            fecha TEXT, hora TEXT, motivo TEXT, estado TEXT);
+    ''')
+    conn.executemany('INSERT INTO pacientes VALUES (?, ?, ?, ?, ?, ?, ?, ?)', (
+        (i, f'{1100000000 + i:010d}', f'Nombre{i}', f'Apellido{i}',
+         f'19{azar.randint(40, 99)}-0{azar.randint(1, 9)}-1{azar.randint(0, 9)}',
+         f'09{azar.randint(10000000, 99999999)}', f'Calle {i}', f'paciente{i}@mail.com')
+        for i in range(1, n_pacientes + 1)))
+    conn.executemany('INSERT INTO medicos VALUES (?, ?, ?, ?, ?, ?, ?)', (
+        (i, f'{1700000000 + i:010d}', f'Medico{i}', f'Apellido{i}',
+         Medico.ESPECIALIDADES[i % len(Medico.ESPECIALIDADES)],
+         f'09{azar.randint(10000000, 99999999)}', f'medico{i}@patronato.com')
+        for i in range(1, n_medicos + 1)))
+    inicio = date(2024, 1, 1)
+    horas = [f'{h:02d}:{m:02d}' for h in range(8, 17) for m in (0, 30)]
+    motivos = ('Control', 'Consulta general', 'Revisión', 'Terapia', 'Chequeo anual')
+    conn.executemany('INSERT INTO citas VALUES (?, ?, ?, ?, ?, ?, ?)', (
+        (i, azar.randint(1, n_pacientes), azar.randint(1, n_medicos),
+         (inicio + timedelta(days=azar.randint(0, 729))).isoformat(),
+         azar.choice(horas), azar.choice(motivos), azar.choice(sorted(Cita.ESTADOS)))
+        for i in range(1, n_citas + 1)))
+    return conn
+
+
+# ==================== MEDICIÓN ====================
+
+def medir(conn, clase, consulta):
+    """Bytes retenidos por objeto y segundos al construir `clase` desde las filas"""
+    cursor = conn.execute(consulta)
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    objetos = {}
+    for row in cursor:
+        objetos[row[0]] = clase(*row)
+    segundos = time.perf_counter() - inicio
+    actual, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # El diccionario que los contiene es igual en ambos casos; se descuenta
+    contenedor = sys.getsizeof(objetos)
+    return (actual - contenedor) / max(len(objetos), 1), segundos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Memoria por entidad antes y después de __slots__')
+    parser.add_argument('--citas', type=int, default=1_000_000)
+    parser.add_argument('--pacientes', type=int, default=50_000)
+    parser.add_argument('--medicos', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    print(f"Generando {args.citas} citas, {args.pacientes} pacientes y {args.medicos} médicos...")
+    conn = crear_base(args.citas, args.pacientes, args.medicos)
+
+    casos = (
+        ('Paciente', PacienteAnterior, Paciente, InventarioCitas.COLUMNAS_PACIENTES, 'pacientes'),
+        ('Medico', MedicoAnterior, Medico, InventarioCitas.COLUMNAS_MEDICOS, 'medicos'),
+        ('Cita', CitaAnterior, Cita, InventarioCitas.COLUMNAS_CITAS, 'citas'),
+    )
+    print(f"\n{'Entidad':<10}{'Antes (B)':>12}{'Después (B)':>14}{'Ahorro':>9}{'Antes (s)':>12}{'Después (s)':>13}")
+    for nombre, anterior, actual, columnas, tabla in casos:
+        consulta = f"SELECT {columnas} FROM {tabla}"
+        bytes_antes, seg_antes = medir(conn, anterior, consulta)
+        bytes_despues, seg_despues = medir(conn, actual, consulta)
+        ahorro = 100 * (1 - bytes_despues / bytes_antes)
+        print(f"{nombre:<10}{bytes_antes:>12.0f}{bytes_despues:>14.0f}{ahorro:>8.0f}%"
+              f"{seg_antes:>12.2f}{seg_despues:>13.2f}")
+    conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
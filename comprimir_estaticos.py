@@ -0,0 +1,71 @@
+﻿# comprimir_estaticos.py
+# Genera las variantes .gz y .br de los archivos de static/ (se ejecuta en el build)
+#
+# Uso:
+#   python comprimir_estaticos.py            # nivel máximo (gzip 9, brotli 11)
+#   python comprimir_estaticos.py --limpiar  # borra las variantes generadas
+
+import argparse
+import os
+import sys
+
+from services.compresion import EXTENSIONES, codificaciones_disponibles, comprimir_bytes
+
+DIRECTORIO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+EXTENSIONES_COMPRIMIBLES = ('.css', '.js', '.svg', '.html', '.txt', '.json')
+NIVELES = {'gzip': 9, 'br': 11}
+
+
+def archivos_comprimibles(directorio):
+    for raiz, _, archivos in os.walk(directorio):
+        for nombre in sorted(archivos):
+            if nombre.endswith(EXTENSIONES_COMPRIMIBLES):
+                yield os.path.join(raiz, nombre)
+
+
+def comprimir(directorio):
+    total_original = total_comprimido = 0
+    for ruta in archivos_comprimibles(directorio):
+        with open(ruta, 'rb') as f:
+            datos = f.read()
+        tamanos = []
+        menor = len(datos)
+        for codificacion in codificaciones_disponibles():
+            comprimido = comprimir_bytes(datos, codificacion, NIVELES[codificacion])
+            # Solo se guarda si realmente ahorra bytes
+            if len(comprimido) >= len(datos):
+                continue
+            with open(ruta + EXTENSIONES[codificacion], 'wb') as f:
+                f.write(comprimido)
+            tamanos.append(f'{codificacion} {len(comprimido)}')
+            menor = min(menor, len(comprimido))
+        total_original += len(datos)
+        total_comprimido += menor
+        relativa = os.path.relpath(ruta, directorio)
+        print(f"✅ {relativa}: {len(datos)} bytes -> {', '.join(tamanos) or 'sin cambios'}")
+    if total_original:
+        print(f"Ahorro: {total_original - total_comprimido} bytes "
+              f"({100 * (1 - total_comprimido / total_original):.1f}%)")
+
+
+def limpiar(directorio):
+    for ruta in archivos_comprimibles(directorio):
+        for extension in EXTENSIONES.values():
+            if os.path.exists(ruta + extension):
+                os.remove(ruta + extension)
+                print(f"🗑️ {os.path.relpath(ruta + extension, directorio)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Precomprime los archivos estáticos')
+    parser.add_argument('--limpiar', action='store_true', help='borra las variantes .gz/.br')
+    args = parser.parse_args(argv)
+    if args.limpiar:
+        limpiar(DIRECTORIO)
+    else:
+        comprimir(DIRECTORIO)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
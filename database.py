@@ -3,6 +3,35 @@
 
 import sqlite3
 
+# Hora actual con milisegundos (formato de fecha_modificacion)
+AHORA_MS = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+def asegurar_fecha_modificacion(cursor):
+    """Columna fecha_modificacion, su índice y los triggers que la mantienen.
+
+    InventarioCitas la usa como marca de agua para recargar solo lo que
+    cambió. Se agrega también a bases de datos creadas antes de existir.
+    """
+    for tabla in ('pacientes', 'medicos', 'citas'):
+        columnas = {fila[1] for fila in cursor.execute(f"PRAGMA table_info({tabla})").fetchall()}
+        if 'fecha_modificacion' not in columnas:
+            cursor.execute(f"ALTER TABLE {tabla} ADD COLUMN fecha_modificacion TEXT")
+            cursor.execute(f"UPDATE {tabla} SET fecha_modificacion = {AHORA_MS}")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{tabla}_modificacion ON {tabla}(fecha_modificacion)")
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{tabla}_insertar AFTER INSERT ON {tabla}
+            BEGIN
+                UPDATE {tabla} SET fecha_modificacion = {AHORA_MS} WHERE id = NEW.id;
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{tabla}_modificar AFTER UPDATE ON {tabla}
+            WHEN NEW.fecha_modificacion IS OLD.fecha_modificacion
+            BEGIN
+                UPDATE {tabla} SET fecha_modificacion = {AHORA_MS} WHERE id = NEW.id;
+            END
+        ''')
+
 def crear_base_datos():
     """Crea la base de datos y las tablas necesarias"""
     
@@ -60,6 +89,9 @@ def crear_base_datos():
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_citas_medico ON citas(medico_id)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_citas_estado ON citas(estado)')
     
+    # Marca de agua para la recarga incremental
+    asegurar_fecha_modificacion(cursor)
+    
     conn.commit()
     conn.close()
     
@@ -2,7 +2,7 @@
 # Decoradores para proteger rutas
 
 from functools import wraps
-from flask import flash, redirect, url_for
+from flask import flash, jsonify, redirect, url_for
 from flask_login import current_user
 
 def login_required_message(message="Debe iniciar sesión para acceder a esta página"):
@@ -33,3 +33,12 @@ def admin_required(message="Se requieren permisos de administrador"):
             return f(*args, **kwargs)
         return decorated_function
     return decorator
+
+def api_login_required(f):
+    """Como login_required, pero responde 401 en JSON en lugar de redirigir"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return jsonify({'error': 'Debe iniciar sesión'}), 401
+        return f(*args, **kwargs)
+    return decorated_function
@@ -0,0 +1,96 @@
+# importar_csv.py
+# Importación masiva de pacientes, médicos o citas desde archivos CSV
+#
+# Uso:
+#   python importar_csv.py pacientes pacientes.csv
+#   python importar_csv.py medicos medicos.csv
+#   python importar_csv.py citas citas.csv
+#
+# El archivo lleva encabezado con los nombres de las columnas y se separa
+# con coma o punto y coma (se detecta solo). Se lee como UTF-8 y, si no lo
+# es, como Windows-1252 (lo que guarda Excel en Windows). Columnas:
+#   pacientes: cedula, nombre, apellido, fecha_nacimiento, telefono, direccion, email
+#   medicos:   cedula, nombre, apellido, especialidad, telefono, email
+#   citas:     paciente_id o paciente_cedula, medico_id o medico_cedula,
+#              fecha (YYYY-MM-DD), hora (HH:MM), motivo, estado
+
+import argparse
+import csv
+import sys
+
+from database import crear_base_datos
+from models_backup import InventarioCitas
+
+TIPOS = ('pacientes', 'medicos', 'citas')
+MAX_RECHAZOS_MOSTRADOS = 20
+
+# Errores al abrir o interpretar el archivo (no se importa ninguna fila)
+ERRORES_LECTURA = (OSError, UnicodeDecodeError, csv.Error)
+
+
+def leer_csv(ruta):
+    """Filas del archivo como diccionarios (acepta BOM y separador , o ;)"""
+    try:
+        return _leer_csv(ruta, 'utf-8-sig')
+    except UnicodeDecodeError:
+        # Latin-1 / Windows-1252: tildes y eñes en un solo byte
+        return _leer_csv(ruta, 'cp1252')
+
+
+def _leer_csv(ruta, codificacion):
+    with open(ruta, newline='', encoding=codificacion) as f:
+        muestra = f.read(4096)
+        f.seek(0)
+        try:
+            dialecto = csv.Sniffer().sniff(muestra, delimiters=',;')
+        except csv.Error:
+            dialecto = csv.excel
+        return list(csv.DictReader(f, dialect=dialecto))
+
+
+def importar(inventario, tipo, ruta):
+    """Importa el archivo al inventario y muestra el resumen; retorna el resultado"""
+    filas = leer_csv(ruta)
+    importadores = {
+        'pacientes': inventario.importar_pacientes,
+        'medicos': inventario.importar_medicos,
+        'citas': inventario.importar_citas,
+    }
+    resultado = importadores[tipo](filas)
+
+    if resultado['error']:
+        print(f"❌ Error al importar {tipo}: {resultado['error']} (no se guardó ninguna fila)")
+    else:
+        print(f"✅ Importación de {tipo}: {resultado['insertados']} de {len(filas)} filas "
+              f"en {resultado['segundos']:.2f}s ({resultado['filas_por_segundo']:.0f} filas/s)")
+    rechazados = resultado['rechazados']
+    if rechazados:
+        print(f"⚠️ {len(rechazados)} fila(s) rechazadas:")
+        for numero, motivo in rechazados[:MAX_RECHAZOS_MOSTRADOS]:
+            # +1 por la línea de encabezado
+            print(f"  Línea {numero + 1}: {motivo}")
+        if len(rechazados) > MAX_RECHAZOS_MOSTRADOS:
+            print(f"  ... y {len(rechazados) - MAX_RECHAZOS_MOSTRADOS} más")
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Importa pacientes, médicos o citas desde CSV')
+    parser.add_argument('tipo', choices=TIPOS)
+    parser.add_argument('archivo', help='ruta del archivo CSV')
+    args = parser.parse_args(argv)
+
+    crear_base_datos()
+    inventario = InventarioCitas()
+    try:
+        resultado = importar(inventario, args.tipo, args.archivo)
+    except ERRORES_LECTURA as e:
+        print(f"❌ No se pudo leer el archivo: {e}")
+        return 1
+    finally:
+        inventario.cerrar()
+    return 1 if resultado['error'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
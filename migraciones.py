@@ -0,0 +1,155 @@
+﻿# migraciones.py
+# Migraciones versionadas del esquema MySQL de la aplicación web (app.py)
+#
+# Se aplican una sola vez por despliegue con:
+#     python migraciones.py
+# Los workers solo comparan la versión de schema_version al arrancar.
+
+
+def crear_tablas_base(cursor):
+    """Tablas usuarios, servicios y turnos"""
+    # Tabla de usuarios
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS usuarios (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            nombre VARCHAR(100) NOT NULL,
+            email VARCHAR(100) UNIQUE NOT NULL,
+            password VARCHAR(255) NOT NULL,
+            fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Tabla de servicios médicos
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS servicios (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            nombre VARCHAR(50) NOT NULL,
+            descripcion TEXT,
+            duracion INT DEFAULT 30
+        )
+    ''')
+
+    # Tabla de turnos
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS turnos (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            usuario_id INT NOT NULL,
+            nombre_completo VARCHAR(100) NOT NULL,
+            cedula VARCHAR(20) NOT NULL,
+            telefono VARCHAR(20) NOT NULL,
+            servicio_id INT NOT NULL,
+            servicio_nombre VARCHAR(50) NOT NULL,
+            fecha DATE NOT NULL,
+            hora TIME NOT NULL,
+            motivo TEXT,
+            estado VARCHAR(20) DEFAULT 'Programado',
+            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (usuario_id) REFERENCES usuarios(id) ON DELETE CASCADE,
+            FOREIGN KEY (servicio_id) REFERENCES servicios(id) ON DELETE CASCADE
+        )
+    ''')
+
+
+def crear_indices_turnos(cursor):
+    """Índices de paginación de "Mis Turnos" y de disponibilidad por servicio"""
+    # Versiones anteriores de init_db pudieron crear ya algunos de ellos
+    cursor.execute('''
+        SELECT DISTINCT index_name FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = 'turnos'
+    ''')
+    indices = {fila[0] for fila in cursor.fetchall()}
+    indices_turnos = {
+        'idx_turnos_usuario_fecha': '(usuario_id, fecha, hora)',
+        'idx_turnos_usuario_estado_fecha': '(usuario_id, estado, fecha, hora)',
+        'idx_turnos_servicio_fecha': '(servicio_id, fecha, hora)'
+    }
+    for nombre, columnas in indices_turnos.items():
+        if nombre not in indices:
+            cursor.execute(f"ALTER TABLE turnos ADD INDEX {nombre} {columnas}")
+
+
+def insertar_servicios(cursor):
+    """Servicios médicos por defecto"""
+    cursor.execute("SELECT COUNT(*) FROM servicios")
+    if cursor.fetchone()[0] == 0:
+        servicios = [
+            ('Medicina General', 'Atención médica general para todas las edades', 30),
+            ('Pediatría', 'Atención especializada para niños y adolescentes', 30),
+            ('Ginecología', 'Salud de la mujer y control prenatal', 30),
+            ('Odontología', 'Cuidado dental y prevención', 30),
+            ('Cardiología', 'Atención cardíaca especializada', 45),
+            ('Trabajo Social', 'Asesoría familiar y gestión social', 30),
+            ('Psicología', 'Apoyo emocional y salud mental', 45),
+            ('Nutrición', 'Consejería nutricional', 30)
+        ]
+        cursor.executemany("INSERT INTO servicios (nombre, descripcion, duracion) VALUES (%s, %s, %s)", servicios)
+
+
+# Colección: Lista ordenada de (versión, descripción, función)
+MIGRACIONES = [
+    (1, 'Tablas usuarios, servicios y turnos', crear_tablas_base),
+    (2, 'Índices de turnos por usuario y por servicio', crear_indices_turnos),
+    (3, 'Servicios médicos por defecto', insertar_servicios),
+]
+
+ULTIMA_VERSION = MIGRACIONES[-1][0]
+
+
+def version_actual(cursor):
+    """Versión aplicada del esquema (0 si nunca se migró)"""
+    cursor.execute('''
+        SELECT COUNT(*) FROM information_schema.tables
+        WHERE table_schema = DATABASE() AND table_name = 'schema_version'
+    ''')
+    if cursor.fetchone()[0] == 0:
+        return 0
+    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return cursor.fetchone()[0]
+
+
+def migrar(conn, timeout_bloqueo=60):
+    """Aplica en orden las migraciones pendientes.
+
+    Usa GET_LOCK para que dos procesos no migren a la vez.
+    Retorna la lista de versiones aplicadas.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT GET_LOCK('turnos_migraciones', %s)", (timeout_bloqueo,))
+    if cursor.fetchone()[0] != 1:
+        cursor.close()
+        raise RuntimeError("Otra migración está en curso")
+
+    aplicadas = []
+    try:
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INT PRIMARY KEY,
+                descripcion VARCHAR(200) NOT NULL,
+                aplicada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        actual = version_actual(cursor)
+        for version, descripcion, aplicar in MIGRACIONES:
+            if version <= actual:
+                continue
+            print(f"➡️  Aplicando migración {version}: {descripcion}")
+            aplicar(cursor)
+            cursor.execute(
+                "INSERT INTO schema_version (version, descripcion) VALUES (%s, %s)",
+                (version, descripcion)
+            )
+            conn.commit()
+            aplicadas.append(version)
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK('turnos_migraciones')")
+        cursor.fetchall()
+        cursor.close()
+    return aplicadas
+
+
+if __name__ == "__main__":
+    import os
+    # Evita el aviso de versión al importar app; aquí se va a migrar
+    os.environ.setdefault('DB_VERIFICAR_ESQUEMA', '0')
+    from app import init_db
+    init_db()
@@ -1,12 +1,79 @@
 # models.py
 # Clases para el Sistema de Citas del Patronato de Catacocha
 
-from datetime import datetime
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from heapq import nsmallest
+from datetime import date, datetime, timedelta
+from itertools import islice
+from operator import attrgetter
+import re
 import sqlite3
+import sys
+import time
+import unicodedata
+
+from Conexion.sqlite import ConexionSQLite
+
+try:
+    import numpy as np
+except ImportError:  # numpy viene en requirements.txt; sin él los reportes recorren los índices
+    np = None
+
+# Colección: Diccionarios 'YYYY-MM-DD' <-> ordinal; cada día usa un único
+# objeto int y un único str aunque lo compartan miles de citas
+_ORDINALES = {}
+_FECHAS = {}
+
+def a_ordinal(fecha):
+    """'YYYY-MM-DD' (o date) -> date.toordinal(); ValueError si no es válida"""
+    if isinstance(fecha, int):
+        return fecha
+    if isinstance(fecha, date):
+        return fecha.toordinal()
+    ordinal = _ORDINALES.get(fecha)
+    if ordinal is None:
+        # fromisoformat también acepta '20300115' o '2030-W03-2'
+        if not FORMATO_FECHA.fullmatch(fecha):
+            raise ValueError(f"Fecha inválida: '{fecha}' (YYYY-MM-DD)")
+        dia = date.fromisoformat(fecha)
+        # _FECHAS guarda siempre el texto canónico, no el que llegó primero
+        par = _FECHAS.setdefault(dia.toordinal(), (dia.toordinal(), dia.isoformat()))
+        ordinal = _ORDINALES.setdefault(fecha, par[0])
+    return ordinal
+
+def a_fecha(ordinal):
+    """date.toordinal() -> 'YYYY-MM-DD'"""
+    par = _FECHAS.get(ordinal)
+    if par is None:
+        par = _FECHAS.setdefault(ordinal, (ordinal, date.fromordinal(ordinal).isoformat()))
+    return par[1]
+
+# Formatos que se validan al importar
+FORMATO_CEDULA = re.compile(r'\d{10}')
+FORMATO_HORA = re.compile(r'([01]\d|2[0-3]):[0-5]\d')
+FORMATO_FECHA = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+def cedula_valida(cedula):
+    """La cédula tiene exactamente 10 dígitos"""
+    return bool(FORMATO_CEDULA.fullmatch(cedula or ''))
+
+def fecha_valida(fecha):
+    """La fecha existe y tiene exactamente el formato YYYY-MM-DD"""
+    if not FORMATO_FECHA.fullmatch(fecha or ''):
+        return False
+    try:
+        date.fromisoformat(fecha)
+    except ValueError:
+        return False
+    return True
 
 class Paciente:
     """Clase que representa a un paciente del Patronato"""
     
+    __slots__ = ('id', 'cedula', 'nombre', 'apellido', 'fecha_nacimiento',
+                 'telefono', 'direccion', 'email')
+    
     def __init__(self, id=None, cedula="", nombre="", apellido="", 
                  fecha_nacimiento="", telefono="", direccion="", email=""):
         self.id = id
@@ -52,13 +119,18 @@ class Medico:
         "Nutrición"
     )
     
+    # Colección: Diccionario especialidad -> texto único (todas las instancias lo comparten)
+    _ESPECIALIDADES = {e: e for e in ESPECIALIDADES}
+    
+    __slots__ = ('id', 'cedula', 'nombre', 'apellido', 'especialidad', 'telefono', 'email')
+    
     def __init__(self, id=None, cedula="", nombre="", apellido="", 
                  especialidad="", telefono="", email=""):
         self.id = id
         self.cedula = cedula
         self.nombre = nombre
         self.apellido = apellido
-        self.especialidad = especialidad if especialidad in self.ESPECIALIDADES else "Medicina General"
+        self.especialidad = self._ESPECIALIDADES.get(especialidad, "Medicina General")
         self.telefono = telefono
         self.email = email
     
@@ -70,30 +142,553 @@ class Medico:
 
 
 class Cita:
-    """Clase que representa una cita médica"""
+    """Clase que representa una cita médica.
+
+    Usa __slots__ y guarda la fecha como ordinal (`dia`) para ocupar poco
+    con cientos de miles de citas en memoria; `fecha` sigue disponible como
+    texto YYYY-MM-DD. Estado y hora se comparten entre instancias.
+    """
     
     # Colección: Conjunto de estados posibles (set)
     ESTADOS = {"Programada", "Confirmada", "En curso", "Completada", "Cancelada", "No asistió"}
     
+    # Colección: Estados que ya no cuentan como próximas citas
+    ESTADOS_CERRADOS = frozenset({"Cancelada", "Completada"})
+    
+    # Colección: Diccionario estado -> texto único (todas las instancias lo comparten)
+    _ESTADOS = {e: e for e in ESTADOS}
+    
+    __slots__ = ('id', 'paciente_id', 'medico_id', 'dia', 'hora', 'motivo',
+                 'estado', 'fecha_creacion')
+    
     def __init__(self, id=None, paciente_id=None, medico_id=None, 
-                 fecha="", hora="", motivo="", estado="Programada"):
+                 fecha="", hora="", motivo="", estado="Programada", fecha_creacion=None):
         self.id = id
         self.paciente_id = paciente_id
         self.medico_id = medico_id
-        self.fecha = fecha  # Formato: YYYY-MM-DD
-        self.hora = hora    # Formato: HH:MM
+        self.fecha = fecha  # Formato: YYYY-MM-DD (se guarda como ordinal)
+        self.hora = sys.intern(hora) if isinstance(hora, str) else hora  # Formato: HH:MM
         self.motivo = motivo
-        self.estado = estado if estado in self.ESTADOS else "Programada"
-        self.fecha_creacion = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.estado = self.normalizar_estado(estado)
+        # La pone la base de datos al insertar; no se genera al cargar
+        self.fecha_creacion = fecha_creacion
+    
+    @classmethod
+    def normalizar_estado(cls, estado):
+        """Texto único del estado (o "Programada" si no es válido)"""
+        return cls._ESTADOS.get(estado, "Programada")
+    
+    @property
+    def fecha(self):
+        return a_fecha(self.dia) if self.dia is not None else ""
+    
+    @fecha.setter
+    def fecha(self, valor):
+        self.dia = a_ordinal(valor) if valor else None
     
     def __str__(self):
         return f"Cita #{self.id} - {self.fecha} {self.hora} - {self.estado}"
 
 
+def clave_hora(cita):
+    """Orden de las citas dentro de un mismo día"""
+    return (cita.hora, cita.id)
+
+
+def clave_cronologica(cita):
+    """Orden cronológico de las citas; el id desempata"""
+    return (cita.dia, cita.hora, cita.id)
+
+
+clave_fecha = attrgetter('dia')
+
+
+class ListaCronologica:
+    """Lista de citas ordenada por (fecha, hora, id) con inserción por bisect.
+
+    Al estar ordenada por fecha, un rango de días es un corte de la lista
+    que se localiza con dos bisect: O(log n + k). Las primeras N citas
+    desde una fecha o las últimas N hasta otra salen igual, sin ordenar.
+    """
+    
+    def __init__(self):
+        # Colección: Lista ordenada por (fecha, hora, id)
+        self.citas = []
+    
+    def agregar(self, cita):
+        insort(self.citas, cita, key=clave_cronologica)
+    
+    def agregar_varios(self, citas):
+        """Carga masiva: agrega al final y ordena una sola vez"""
+        self.citas.extend(citas)
+        self.citas.sort(key=clave_cronologica)
+    
+    def quitar(self, cita):
+        """Quita una cita (con la fecha y hora con que se agregó)"""
+        i = bisect_left(self.citas, clave_cronologica(cita), key=clave_cronologica)
+        if i < len(self.citas) and self.citas[i] is cita:
+            del self.citas[i]
+    
+    def _inicio(self, desde):
+        return bisect_left(self.citas, a_ordinal(desde), key=clave_fecha) if desde else 0
+    
+    def _fin(self, hasta):
+        return bisect_right(self.citas, a_ordinal(hasta), key=clave_fecha) if hasta else len(self.citas)
+    
+    def _filtrar(self, posiciones, estado):
+        for i in posiciones:
+            cita = self.citas[i]
+            if estado is None or cita.estado == estado:
+                yield cita
+    
+    def rango(self, desde=None, hasta=None, estado=None):
+        """Itera las citas entre dos fechas (incluidas), opcionalmente de un estado"""
+        return self._filtrar(range(self._inicio(desde), self._fin(hasta)), estado)
+    
+    def siguientes(self, desde=None, n=10, estado=None):
+        """Las primeras n citas desde una fecha (incluida), en orden cronológico"""
+        return list(islice(self.rango(desde, None, estado), n))
+    
+    def anteriores(self, hasta=None, n=10, estado=None):
+        """Las últimas n citas hasta una fecha (incluida), de la más reciente a la más antigua"""
+        return list(islice(self._filtrar(reversed(range(self._fin(hasta))), estado), n))
+    
+    def __len__(self):
+        return len(self.citas)
+    
+    def __iter__(self):
+        return iter(self.citas)
+
+
+class IndiceFechas:
+    """Índice fecha -> citas de ese día ordenadas por (hora, id).
+
+    Los días (ordinales de Cita.dia) se guardan además en una lista
+    ordenada: un rango de días se resuelve con dos bisect y solo se
+    recorren las citas del rango, O(log n + k).
+    """
+    
+    def __init__(self):
+        # Colección: Diccionario día -> lista de citas ordenada por (hora, id)
+        self.dias = {}
+        # Colección: Lista ordenada de días con citas
+        self.fechas = []
+    
+    def agregar(self, cita):
+        dia = self.dias.get(cita.dia)
+        if dia is None:
+            dia = self.dias[cita.dia] = []
+            insort(self.fechas, cita.dia)
+        insort(dia, cita, key=clave_hora)
+    
+    def agregar_varios(self, citas):
+        """Carga masiva: agrega al final y ordena una sola vez cada día tocado"""
+        tocados = set()
+        for cita in citas:
+            dia = self.dias.get(cita.dia)
+            if dia is None:
+                dia = self.dias[cita.dia] = []
+                self.fechas.append(cita.dia)
+            dia.append(cita)
+            tocados.add(cita.dia)
+        for fecha in tocados:
+            self.dias[fecha].sort(key=clave_hora)
+        self.fechas.sort()
+    
+    def quitar(self, cita):
+        """Quita una cita del índice (con la fecha y hora con que se agregó)"""
+        dia = self.dias.get(cita.dia, [])
+        i = bisect_left(dia, clave_hora(cita), key=clave_hora)
+        if i < len(dia) and dia[i] is cita:
+            del dia[i]
+            if not dia:
+                del self.dias[cita.dia]
+                del self.fechas[bisect_left(self.fechas, cita.dia)]
+    
+    def del_dia(self, fecha):
+        """Citas de una fecha, ordenadas por hora"""
+        return list(self.dias.get(a_ordinal(fecha), ()))
+    
+    def rango(self, desde, hasta):
+        """Itera las citas entre dos fechas (incluidas) en orden cronológico"""
+        inicio = bisect_left(self.fechas, a_ordinal(desde))
+        fin = bisect_right(self.fechas, a_ordinal(hasta))
+        for fecha in self.fechas[inicio:fin]:
+            yield from self.dias[fecha]
+    
+    def __len__(self):
+        return len(self.fechas)
+
+
+def normalizar_texto(texto):
+    """Minúsculas y sin tildes: 'Ramírez' -> 'ramirez'"""
+    descompuesto = unicodedata.normalize('NFKD', str(texto or ''))
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c)).casefold()
+
+
+def trigramas(palabra):
+    return {palabra[i:i + 3] for i in range(len(palabra) - 2)}
+
+
+class IndiceBusquedaPacientes:
+    """Índice de búsqueda de pacientes por nombre, apellido y cédula.
+
+    Sin distinguir tildes ni mayúsculas. Cada término de la búsqueda debe
+    coincidir con el paciente; se resuelve con:
+      - una lista ordenada de (palabra, id) para prefijos de palabra,
+      - una lista ordenada de (cédula, id) para prefijos de cédula,
+      - trigramas -> ids para subcadenas de 3 o más letras; las de 1 o 2
+        (p. ej. dos dígitos del medio de una cédula) se buscan recorriendo
+        los documentos, como la búsqueda lineal original.
+    Los resultados se ordenan por relevancia: palabra o cédula exacta,
+    luego prefijo y por último subcadena.
+    """
+    
+    # Puntaje por tipo de coincidencia (menor es mejor)
+    EXACTA, PREFIJO, SUBCADENA = 0, 1, 2
+    
+    def __init__(self):
+        # Colección: Lista ordenada de (palabra normalizada, id)
+        self.palabras = []
+        # Colección: Lista ordenada de (cédula, id)
+        self.cedulas = []
+        # Colección: Diccionario trigrama -> conjunto de ids
+        self.trigramas = {}
+        # Colección: Diccionario id -> (palabras, cédula, texto) indexados
+        self.documentos = {}
+    
+    def _documentar(self, paciente):
+        """Registra el paciente en documentos y trigramas; retorna (palabras, cédula)"""
+        palabras = tuple(dict.fromkeys(
+            normalizar_texto(f"{paciente.nombre} {paciente.apellido}").split()
+        ))
+        cedula = str(paciente.cedula or '')
+        self.documentos[paciente.id] = (palabras, cedula, ' '.join(palabras + (cedula,)))
+        for palabra in palabras + (cedula,):
+            for trigrama in trigramas(palabra):
+                self.trigramas.setdefault(trigrama, set()).add(paciente.id)
+        return palabras, cedula
+    
+    def agregar(self, paciente):
+        if paciente.id in self.documentos:
+            self.quitar(paciente.id)
+        palabras, cedula = self._documentar(paciente)
+        for palabra in palabras:
+            insort(self.palabras, (palabra, paciente.id))
+        insort(self.cedulas, (cedula, paciente.id))
+    
+    def agregar_varios(self, pacientes):
+        """Carga masiva: agrega al final y ordena una sola vez"""
+        for paciente in pacientes:
+            if paciente.id in self.documentos:
+                self.quitar(paciente.id)
+            palabras, cedula = self._documentar(paciente)
+            self.palabras.extend((palabra, paciente.id) for palabra in palabras)
+            self.cedulas.append((cedula, paciente.id))
+        self.palabras.sort()
+        self.cedulas.sort()
+    
+    def quitar(self, paciente_id):
+        documento = self.documentos.pop(paciente_id, None)
+        if documento is None:
+            return
+        palabras, cedula, _ = documento
+        for palabra in palabras:
+            del self.palabras[bisect_left(self.palabras, (palabra, paciente_id))]
+        del self.cedulas[bisect_left(self.cedulas, (cedula, paciente_id))]
+        for palabra in palabras + (cedula,):
+            for trigrama in trigramas(palabra):
+                ids = self.trigramas[trigrama]
+                ids.discard(paciente_id)
+                if not ids:
+                    del self.trigramas[trigrama]
+    
+    @staticmethod
+    def _prefijos(lista, termino, puntajes):
+        """Agrega a `puntajes` los ids cuya clave empieza por `termino`"""
+        for i in range(bisect_left(lista, (termino,)), len(lista)):
+            clave, paciente_id = lista[i]
+            if not clave.startswith(termino):
+                break
+            puntaje = IndiceBusquedaPacientes.EXACTA if clave == termino else IndiceBusquedaPacientes.PREFIJO
+            if puntaje < puntajes.get(paciente_id, IndiceBusquedaPacientes.SUBCADENA + 1):
+                puntajes[paciente_id] = puntaje
+    
+    def _buscar_termino(self, termino, suficientes=None):
+        """Diccionario id -> mejor puntaje para un término.
+
+        Si los prefijos ya dan `suficientes` resultados no se buscan subcadenas,
+        que quedarían detrás en el orden de relevancia.
+        """
+        puntajes = {}
+        self._prefijos(self.palabras, termino, puntajes)
+        self._prefijos(self.cedulas, termino, puntajes)
+        if suficientes is not None and len(puntajes) >= suficientes:
+            return puntajes
+        if len(termino) < 3:
+            # Sin trigramas que consultar: recorrido lineal de los documentos
+            for paciente_id, (_, _, texto) in self.documentos.items():
+                if paciente_id not in puntajes and termino in texto:
+                    puntajes[paciente_id] = self.SUBCADENA
+        else:
+            conjuntos = [self.trigramas.get(t, set()) for t in trigramas(termino)]
+            conjuntos.sort(key=len)
+            candidatos = set(conjuntos[0]).intersection(*conjuntos[1:])
+            for paciente_id in candidatos:
+                # Los trigramas pueden dar falsos positivos: se confirma la subcadena
+                if paciente_id not in puntajes and termino in self.documentos[paciente_id][2]:
+                    puntajes[paciente_id] = self.SUBCADENA
+        return puntajes
+    
+    def _puntaje_documento(self, paciente_id, termino):
+        """Puntaje de un término para un paciente concreto (None si no coincide)"""
+        palabras, cedula, texto = self.documentos[paciente_id]
+        if termino in palabras or termino == cedula:
+            return self.EXACTA
+        if cedula.startswith(termino) or any(p.startswith(termino) for p in palabras):
+            return self.PREFIJO
+        if termino in texto:
+            return self.SUBCADENA
+        return None
+    
+    def buscar(self, criterio, limite=None):
+        """Ids de los pacientes que coinciden, los más relevantes primero.
+
+        Retorna None si el criterio no tiene términos (coinciden todos).
+        Con `limite` solo se ordenan los `limite` mejores.
+        """
+        terminos = normalizar_texto(criterio).split()
+        if not terminos:
+            return None
+        # El término más largo suele ser el más selectivo: se busca en el
+        # índice y el resto solo se comprueba sobre sus candidatos
+        terminos = sorted(set(terminos), key=len, reverse=True)
+        resultado = self._buscar_termino(terminos[0], limite if len(terminos) == 1 else None)
+        for termino in terminos[1:]:
+            if not resultado:
+                break
+            nuevo = {}
+            for paciente_id, puntaje in resultado.items():
+                extra = self._puntaje_documento(paciente_id, termino)
+                if extra is not None:
+                    nuevo[paciente_id] = puntaje + extra
+            resultado = nuevo
+        if not resultado:
+            return []
+        clave = lambda i: (resultado[i], self.documentos[i][0])
+        if limite is not None:
+            return nsmallest(limite, resultado, key=clave)
+        return sorted(resultado, key=clave)
+
+
+def a_minutos(hora):
+    """'HH:MM' -> minutos desde la medianoche (-1 si no es válida)"""
+    try:
+        horas, minutos = hora.split(':')[:2]
+        return int(horas) * 60 + int(minutos)
+    except (AttributeError, ValueError):
+        return -1
+
+
+def a_mes(ordinal):
+    """Ordinal de fecha -> número de mes (año * 12 + mes - 1)"""
+    fecha = date.fromordinal(ordinal)
+    return fecha.year * 12 + fecha.month - 1
+
+
+def texto_mes(mes):
+    """Número de mes (ver a_mes) -> 'YYYY-MM'"""
+    return f"{mes // 12:04d}-{mes % 12 + 1:02d}"
+
+
+class ColumnasCitas:
+    """Copia columnar (arreglos NumPy) de las citas para reportes agregados.
+
+    Cada cita ocupa una fila con su día (ordinal), mes, hora en minutos,
+    médico, paciente y código de estado. Contar, agrupar y filtrar por
+    rango de fechas son operaciones vectorizadas sobre los arreglos, sin
+    recorrer objetos Python. Los arreglos crecen al doble cuando se llenan
+    y al quitar una cita la última fila ocupa su lugar (O(1)).
+    """
+    
+    # Colección: Tupla de estados; el código de un estado es su posición
+    ESTADOS = tuple(sorted(Cita.ESTADOS))
+    # Colección: Diccionario estado -> código
+    CODIGOS = {estado: codigo for codigo, estado in enumerate(ESTADOS)}
+    
+    # Colección: Columnas y su tipo
+    TIPOS = {
+        'id': 'int64',
+        'dia': 'int32',
+        'mes': 'int32',
+        'minuto': 'int16',
+        'medico': 'int64',
+        'paciente': 'int64',
+        'estado': 'int8',
+    }
+    
+    def __init__(self, capacidad=1024):
+        self.n = 0
+        self.columnas = {nombre: np.empty(capacidad, dtype=tipo)
+                         for nombre, tipo in self.TIPOS.items()}
+        # Colección: Diccionario cita_id -> fila
+        self.filas = {}
+    
+    @classmethod
+    def desde_citas(cls, citas):
+        """Construye las columnas de una vez a partir de las citas"""
+        citas = list(citas)
+        columnas = cls(max(len(citas), 1024))
+        columnas.agregar_varios(citas)
+        return columnas
+    
+    def __len__(self):
+        return self.n
+    
+    def _crecer(self):
+        for nombre, columna in self.columnas.items():
+            nueva = np.empty(len(columna) * 2, dtype=columna.dtype)
+            nueva[:self.n] = columna[:self.n]
+            self.columnas[nombre] = nueva
+    
+    def agregar(self, cita):
+        """Agrega la cita (o reemplaza su fila si ya estaba)"""
+        fila = self.filas.get(cita.id)
+        if fila is None:
+            if self.n == len(self.columnas['id']):
+                self._crecer()
+            fila = self.filas[cita.id] = self.n
+            self.n += 1
+        datos = self.columnas
+        datos['id'][fila] = cita.id
+        datos['dia'][fila] = cita.dia
+        datos['mes'][fila] = a_mes(cita.dia)
+        datos['minuto'][fila] = a_minutos(cita.hora)
+        datos['medico'][fila] = cita.medico_id
+        datos['paciente'][fila] = cita.paciente_id
+        datos['estado'][fila] = self.CODIGOS[cita.estado]
+    
+    def agregar_varios(self, citas):
+        """Agrega muchas citas llenando cada columna de una sola vez"""
+        nuevas = []
+        for cita in citas:
+            if cita.id in self.filas:
+                self.agregar(cita)
+            else:
+                nuevas.append(cita)
+        k = len(nuevas)
+        while self.n + k > len(self.columnas['id']):
+            self._crecer()
+        inicio, fin = self.n, self.n + k
+        datos = self.columnas
+        datos['id'][inicio:fin] = np.fromiter((c.id for c in nuevas), 'int64', k)
+        datos['dia'][inicio:fin] = np.fromiter((c.dia for c in nuevas), 'int32', k)
+        meses = {}
+        datos['mes'][inicio:fin] = np.fromiter(
+            (meses[c.dia] if c.dia in meses else meses.setdefault(c.dia, a_mes(c.dia))
+             for c in nuevas), 'int32', k)
+        minutos = {}
+        datos['minuto'][inicio:fin] = np.fromiter(
+            (minutos[c.hora] if c.hora in minutos else minutos.setdefault(c.hora, a_minutos(c.hora))
+             for c in nuevas), 'int16', k)
+        datos['medico'][inicio:fin] = np.fromiter((c.medico_id for c in nuevas), 'int64', k)
+        datos['paciente'][inicio:fin] = np.fromiter((c.paciente_id for c in nuevas), 'int64', k)
+        datos['estado'][inicio:fin] = np.fromiter((self.CODIGOS[c.estado] for c in nuevas), 'int8', k)
+        self.filas.update((c.id, inicio + i) for i, c in enumerate(nuevas))
+        self.n = fin
+    
+    def quitar(self, cita_id):
+        fila = self.filas.pop(cita_id, None)
+        if fila is None:
+            return
+        self.n -= 1
+        if fila != self.n:
+            # La última fila pasa al hueco
+            for columna in self.columnas.values():
+                columna[fila] = columna[self.n]
+            self.filas[int(self.columnas['id'][fila])] = fila
+    
+    def cambiar_estado(self, cita):
+        fila = self.filas.get(cita.id)
+        if fila is not None:
+            self.columnas['estado'][fila] = self.CODIGOS[cita.estado]
+    
+    def columna(self, nombre):
+        """Vista de una columna con solo las filas ocupadas"""
+        return self.columnas[nombre][:self.n]
+    
+    def filtro(self, desde=None, hasta=None, medico_id=None, estado=None):
+        """Máscara booleana de las filas que cumplen todos los criterios"""
+        mascara = np.ones(self.n, dtype=bool)
+        if desde:
+            mascara &= self.columna('dia') >= a_ordinal(desde)
+        if hasta:
+            mascara &= self.columna('dia') <= a_ordinal(hasta)
+        if medico_id is not None:
+            mascara &= self.columna('medico') == medico_id
+        if estado is not None:
+            if estado not in self.CODIGOS:
+                mascara[:] = False
+            else:
+                mascara &= self.columna('estado') == self.CODIGOS[estado]
+        return mascara
+    
+    def contar(self, **criterios):
+        return int(np.count_nonzero(self.filtro(**criterios)))
+    
+    def ids(self, **criterios):
+        """Ids de las citas que cumplen los criterios, en orden ascendente"""
+        return np.sort(self.columna('id')[self.filtro(**criterios)])
+    
+    def por_estado(self, **criterios):
+        """Diccionario estado -> cantidad de citas"""
+        codigos = self.columna('estado')[self.filtro(**criterios)]
+        conteo = np.bincount(codigos, minlength=len(self.ESTADOS))
+        return {estado: int(conteo[codigo]) for codigo, estado in enumerate(self.ESTADOS)}
+    
+    def agrupar(self, claves, **criterios):
+        """Cantidad de citas por combinación de columnas (p. ej. mes, médico, estado).
+
+        Retorna una lista de tuplas (valor de cada clave..., cantidad)
+        ordenada por las claves.
+        """
+        mascara = self.filtro(**criterios)
+        distintos, posiciones = [], []
+        for clave in claves:
+            valores, posicion = np.unique(self.columna(clave)[mascara], return_inverse=True)
+            distintos.append(valores)
+            posiciones.append(posicion)
+        if not len(posiciones[0]):
+            return []
+        # Cada combinación se vuelve un único entero y se cuenta en una pasada
+        forma = tuple(len(valores) for valores in distintos)
+        grupos, conteo = np.unique(np.ravel_multi_index(posiciones, forma), return_counts=True)
+        columnas = [valores[i] for valores, i in zip(distintos, np.unravel_index(grupos, forma))]
+        return [tuple(int(v) for v in fila) + (int(n),) for *fila, n in zip(*columnas, conteo)]
+
+
 class InventarioCitas:
     """Clase para gestionar el inventario de citas usando colecciones"""
     
-    def __init__(self):
+    # Columnas que se leen de cada tabla (en el orden de los constructores)
+    COLUMNAS_PACIENTES = "id, cedula, nombre, apellido, fecha_nacimiento, telefono, direccion, email"
+    COLUMNAS_MEDICOS = "id, cedula, nombre, apellido, especialidad, telefono, email"
+    COLUMNAS_CITAS = "id, paciente_id, medico_id, fecha, hora, motivo, estado"
+    
+    def __init__(self, ruta_db='citas.db'):
+        # Conexión SQLite abierta durante toda la sesión (WAL, caché de sentencias)
+        self.db = ConexionSQLite(ruta_db)
+        
+        # Marca de agua de la última carga: fecha de la base de datos y
+        # último id leído de cada tabla (None = nunca se cargó)
+        self.marca_agua = None
+        
+        self._vaciar_colecciones()
+        
+        # Cargar datos desde la base de datos
+        self.cargar_datos()
+    
+    def _vaciar_colecciones(self):
         # Colección: Diccionario para almacenar citas por ID (búsqueda rápida O(1))
         self.citas = {}
         
@@ -103,121 +698,332 @@ class InventarioCitas:
         # Colección: Diccionario para almacenar médicos por ID
         self.medicos = {}
         
-        # Colección: Lista para mantener orden cronológico
-        self.citas_ordenadas = []
+        # Colección: Todas las citas ordenadas por (fecha, hora, id)
+        self.citas_ordenadas = ListaCronologica()
         
-        # Colección: Conjunto para fechas con citas (evita duplicados)
+        # Colección: Conjunto de fechas 'YYYY-MM-DD' con citas (evita duplicados)
         self.fechas_con_citas = set()
         
-        # Colección: Diccionario para índice de búsqueda por paciente
+        # Colección: Diccionario paciente_id -> {cita_id: cita} (quitar es O(1))
         self.indice_paciente = {}
         
-        # Cargar datos desde la base de datos
-        self.cargar_datos()
+        # Colección: Índice fecha -> citas del día ordenadas por hora
+        self.indice_fecha = IndiceFechas()
+        
+        # Colección: Diccionario medico_id -> ListaCronologica de sus citas
+        self.indice_medico = {}
+        
+        # Colección: Contadores por estado y por (estado, medico_id)
+        self.conteo_estados = Counter()
+        self.conteo_estado_medico = Counter()
+        
+        # Colección: Citas no canceladas ni completadas, en orden cronológico
+        self.citas_pendientes = ListaCronologica()
+        
+        # Colección: Índice de búsqueda de pacientes (nombre, apellido, cédula)
+        self.indice_busqueda = IndiceBusquedaPacientes()
+        
+        # Colección: Copia columnar para reportes vectorizados (si hay numpy)
+        self.columnas = ColumnasCitas() if np is not None else None
+    
+    # Las filas se vuelven a leer desde este margen antes de la marca de agua:
+    # una transacción que escribió antes de la marca pero confirmó después
+    # (o varias escrituras en el mismo milisegundo) no se pierde
+    MARGEN_MARCA_AGUA = timedelta(seconds=60)
     
-    def cargar_datos(self):
-        """Carga los datos desde la base de datos SQLite"""
+    def _ahora_db(self, cursor):
+        """Hora actual según SQLite, con el mismo formato que fecha_modificacion"""
+        cursor.execute("SELECT strftime('%Y-%m-%d %H:%M:%f', 'now')")
+        return cursor.fetchone()[0]
+    
+    def cargar_datos(self, incremental=False):
+        """Carga los datos desde la base de datos SQLite.
+
+        Con incremental=True solo se leen las filas nuevas (id mayor que el
+        último leído) o modificadas desde la carga anterior, con un margen
+        de MARGEN_MARCA_AGUA (fecha_modificacion, ver database.py), y se
+        aplican sobre las colecciones: cuesta O(cambios). Aplicar dos veces
+        la misma fila no tiene efecto. Las filas borradas fuera de este inventario solo
+        desaparecen con una carga completa.
+        """
         try:
-            conn = sqlite3.connect('citas.db')
-            cursor = conn.cursor()
-            
-            # Cargar pacientes
-            cursor.execute("SELECT * FROM pacientes")
-            for row in cursor.fetchall():
-                paciente = Paciente(*row)
-                self.pacientes[paciente.id] = paciente
-            
-            # Cargar médicos
-            cursor.execute("SELECT * FROM medicos")
-            for row in cursor.fetchall():
-                medico = Medico(*row)
-                self.medicos[medico.id] = medico
-            
-            # Cargar citas
-            cursor.execute("SELECT * FROM citas")
-            for row in cursor.fetchall():
-                cita = Cita(*row)
-                self.citas[cita.id] = cita
-                self.citas_ordenadas.append(cita)
-                self.fechas_con_citas.add(cita.fecha)
-                
-                # Actualizar índice por paciente
-                if cita.paciente_id not in self.indice_paciente:
-                    self.indice_paciente[cita.paciente_id] = []
-                self.indice_paciente[cita.paciente_id].append(cita)
-            
-            conn.close()
-            print("✅ Datos cargados desde la base de datos")
+            cursor = self.db.conexion.cursor()
+            try:
+                if incremental and self.marca_agua is not None:
+                    try:
+                        filas = self._cargar_cambios(cursor)
+                        print(f"✅ Datos actualizados desde la base de datos ({filas} fila(s) revisadas)")
+                        return
+                    except sqlite3.OperationalError:
+                        # Base de datos sin fecha_modificacion: se recarga todo
+                        pass
+                self._cargar_todo(cursor)
+                print("✅ Datos cargados desde la base de datos")
+            finally:
+                cursor.close()
         except sqlite3.Error as e:
             print(f"⚠️ Error cargando datos: {e}")
     
+    def _cargar_todo(self, cursor):
+        # La marca se toma antes de leer: lo que cambie durante la carga
+        # entra en la siguiente carga incremental
+        marca = self._ahora_db(cursor)
+        self._vaciar_colecciones()
+        
+        # Cargar pacientes
+        cursor.execute(f"SELECT {self.COLUMNAS_PACIENTES} FROM pacientes")
+        for row in cursor.fetchall():
+            paciente = Paciente(*row)
+            self.pacientes[paciente.id] = paciente
+        self.indice_busqueda.agregar_varios(self.pacientes.values())
+        
+        # Cargar médicos
+        cursor.execute(f"SELECT {self.COLUMNAS_MEDICOS} FROM medicos")
+        for row in cursor.fetchall():
+            medico = Medico(*row)
+            self.medicos[medico.id] = medico
+        
+        # Cargar citas (las columnas se arman de una vez al final). Vienen
+        # en orden cronológico, así cada insort en los índices cae al final
+        self.columnas = None
+        cursor.execute(f"SELECT {self.COLUMNAS_CITAS} FROM citas ORDER BY fecha, hora, id")
+        for cita in self._crear_citas(cursor.fetchall())[0]:
+            self._indexar_cita(cita)
+        if np is not None:
+            self.columnas = ColumnasCitas.desde_citas(self.citas.values())
+        
+        self.marca_agua = {
+            'fecha': marca,
+            'pacientes': max(self.pacientes, default=0),
+            'medicos': max(self.medicos, default=0),
+            'citas': max(self.citas, default=0),
+        }
+    
+    def _cargar_cambios(self, cursor):
+        """Aplica las filas nuevas o modificadas desde la marca de agua"""
+        # La marca se toma antes de leer (ver _cargar_todo)
+        marca = self._ahora_db(cursor)
+        anterior = self.marca_agua
+        # Se relee la ventana MARGEN_MARCA_AGUA anterior a la marca; volver a
+        # aplicar una fila ya vista no cambia nada
+        desde = (datetime.fromisoformat(anterior['fecha']) - self.MARGEN_MARCA_AGUA
+                 ).isoformat(sep=' ', timespec='milliseconds')
+        condicion = "WHERE id > ? OR fecha_modificacion >= ?"
+        
+        cursor.execute(f"SELECT {self.COLUMNAS_PACIENTES} FROM pacientes {condicion}",
+                       (anterior['pacientes'], desde))
+        pacientes = [Paciente(*row) for row in cursor.fetchall()]
+        cursor.execute(f"SELECT {self.COLUMNAS_MEDICOS} FROM medicos {condicion}",
+                       (anterior['medicos'], desde))
+        medicos = [Medico(*row) for row in cursor.fetchall()]
+        cursor.execute(f"SELECT {self.COLUMNAS_CITAS} FROM citas {condicion}",
+                       (anterior['citas'], desde))
+        citas, omitidas = self._crear_citas(cursor.fetchall())
+        
+        for paciente in pacientes:
+            self.pacientes[paciente.id] = paciente
+            self.indice_busqueda.agregar(paciente)
+        for medico in medicos:
+            self.medicos[medico.id] = medico
+        for cita in citas:
+            self._aplicar_cita(cita)
+        for cita_id in omitidas:
+            # Una cita que ahora tiene fecha inválida no queda con la versión anterior
+            if cita_id in self.citas:
+                self._desindexar_cita(self.citas[cita_id])
+        
+        self.marca_agua = {
+            'fecha': marca,
+            'pacientes': max([anterior['pacientes']] + [p.id for p in pacientes]),
+            'medicos': max([anterior['medicos']] + [m.id for m in medicos]),
+            'citas': max([anterior['citas']] + [c.id for c in citas] + omitidas),
+        }
+        return len(pacientes) + len(medicos) + len(citas)
+    
+    def _crear_citas(self, filas):
+        """Citas de las filas leídas; las de fecha inválida se omiten y se informan.
+
+        Retorna (citas, ids omitidos).
+        """
+        citas, omitidas = [], []
+        for row in filas:
+            try:
+                cita = Cita(*row)
+            except (ValueError, TypeError):
+                cita = None
+            if cita is None or cita.dia is None:
+                omitidas.append(row[0])
+            else:
+                citas.append(cita)
+        if omitidas:
+            print(f"⚠️ {len(omitidas)} cita(s) con fecha inválida omitidas "
+                  f"(ids: {', '.join(map(str, omitidas[:10]))}{'...' if len(omitidas) > 10 else ''})")
+        return citas, omitidas
+    
+    def _aplicar_cita(self, nueva):
+        """Agrega o reemplaza una cita leída de la base de datos (idempotente)"""
+        actual = self.citas.get(nueva.id)
+        if actual is None:
+            self._indexar_cita(nueva)
+        elif (actual.paciente_id, actual.medico_id, actual.dia, actual.hora) == \
+                (nueva.paciente_id, nueva.medico_id, nueva.dia, nueva.hora):
+            # Mismo lugar en los índices: basta con actualizar los datos
+            actual.motivo = nueva.motivo
+            if actual.estado != nueva.estado:
+                self._contar_estado(actual, -1)
+                actual.estado = nueva.estado
+                self._contar_estado(actual, 1)
+                if self.columnas is not None:
+                    self.columnas.cambiar_estado(actual)
+        else:
+            self._desindexar_cita(actual)
+            self._indexar_cita(nueva)
+    
+    def _indexar_cita(self, cita):
+        """Registra una cita (ya con id) en todas las colecciones"""
+        self.citas[cita.id] = cita
+        self.citas_ordenadas.agregar(cita)
+        self.fechas_con_citas.add(cita.fecha)
+        
+        # Actualizar índice por paciente
+        if cita.paciente_id not in self.indice_paciente:
+            self.indice_paciente[cita.paciente_id] = {}
+        self.indice_paciente[cita.paciente_id][cita.id] = cita
+        
+        self.indice_fecha.agregar(cita)
+        
+        if cita.medico_id not in self.indice_medico:
+            self.indice_medico[cita.medico_id] = ListaCronologica()
+        self.indice_medico[cita.medico_id].agregar(cita)
+        
+        self._contar_estado(cita, 1)
+        if self.columnas is not None:
+            self.columnas.agregar(cita)
+    
+    def _indexar_citas(self, citas):
+        """Registra muchas citas nuevas (ya con id) ordenando cada índice una sola vez"""
+        citas = list(citas)
+        por_medico = {}
+        for cita in citas:
+            self.citas[cita.id] = cita
+            self.fechas_con_citas.add(cita.fecha)
+            self.indice_paciente.setdefault(cita.paciente_id, {})[cita.id] = cita
+            por_medico.setdefault(cita.medico_id, []).append(cita)
+            self.conteo_estados[cita.estado] += 1
+            self.conteo_estado_medico[(cita.estado, cita.medico_id)] += 1
+        self.citas_ordenadas.agregar_varios(citas)
+        self.citas_pendientes.agregar_varios(
+            c for c in citas if c.estado not in Cita.ESTADOS_CERRADOS)
+        self.indice_fecha.agregar_varios(citas)
+        for medico_id, suyas in por_medico.items():
+            self.indice_medico.setdefault(medico_id, ListaCronologica()).agregar_varios(suyas)
+        if self.columnas is not None:
+            self.columnas.agregar_varios(citas)
+    
+    def _desindexar_cita(self, cita):
+        """Quita una cita de todas las colecciones"""
+        del self.citas[cita.id]
+        self.citas_ordenadas.quitar(cita)
+        del self.indice_paciente[cita.paciente_id][cita.id]
+        self.indice_fecha.quitar(cita)
+        if cita.dia not in self.indice_fecha.dias:
+            self.fechas_con_citas.discard(cita.fecha)
+        self.indice_medico[cita.medico_id].quitar(cita)
+        self._contar_estado(cita, -1)
+        if self.columnas is not None:
+            self.columnas.quitar(cita.id)
+    
+    def _contar_estado(self, cita, signo):
+        """Suma (signo=1) o resta (signo=-1) la cita de los contadores por estado"""
+        self.conteo_estados[cita.estado] += signo
+        self.conteo_estado_medico[(cita.estado, cita.medico_id)] += signo
+        if cita.estado not in Cita.ESTADOS_CERRADOS:
+            if signo > 0:
+                self.citas_pendientes.agregar(cita)
+            else:
+                self.citas_pendientes.quitar(cita)
+    
+    def transaccion(self):
+        """Agrupa varias operaciones en un solo commit.
+
+        with inventario.transaccion():
+            inventario.agregar_paciente(...)
+            inventario.agregar_cita(...)
+
+        Dentro de la transacción un error de la base de datos en cualquier
+        operación se propaga en vez de solo informarse, para que se revierta
+        todo el grupo y no se confirme una escritura a medias. Las
+        colecciones en memoria se actualizan en cada operación; si la
+        transacción se revierte hay que volver a cargar los datos.
+        """
+        return self.db.transaccion()
+    
+    def cerrar(self):
+        """Cierra la conexión a la base de datos"""
+        self.db.cerrar()
+    
     # ----- CRUD de Pacientes -----
     
     def agregar_paciente(self, paciente):
         """Añade un nuevo paciente"""
         # El ID se genera en la base de datos
-        conn = sqlite3.connect('citas.db')
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute('''
-                INSERT INTO pacientes (cedula, nombre, apellido, fecha_nacimiento, telefono, direccion, email)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (paciente.cedula, paciente.nombre, paciente.apellido, 
-                  paciente.fecha_nacimiento, paciente.telefono, paciente.direccion, paciente.email))
-            
-            conn.commit()
+            with self.db.transaccion() as cursor:
+                cursor.execute('''
+                    INSERT INTO pacientes (cedula, nombre, apellido, fecha_nacimiento, telefono, direccion, email)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (paciente.cedula, paciente.nombre, paciente.apellido, 
+                      paciente.fecha_nacimiento, paciente.telefono, paciente.direccion, paciente.email))
             paciente.id = cursor.lastrowid
             
             # Actualizar colección en memoria
             self.pacientes[paciente.id] = paciente
+            self.indice_busqueda.agregar(paciente)
             
             print(f"✅ Paciente agregado: {paciente.nombre_completo()}")
             return paciente.id
         except sqlite3.Error as e:
+            if self.db.en_transaccion:
+                # Dentro de inventario.transaccion(): la exterior hace ROLLBACK
+                raise
             print(f"❌ Error al agregar paciente: {e}")
             return None
-        finally:
-            conn.close()
-    
-    def buscar_paciente(self, criterio):
-        """Busca pacientes por nombre o cédula usando list comprehension"""
-        # Búsqueda en el diccionario (eficiente)
-        resultados = [
-            p for p in self.pacientes.values() 
-            if criterio.lower() in p.nombre.lower() or 
-               criterio.lower() in p.apellido.lower() or 
-               criterio in p.cedula
-        ]
-        return resultados
+    
+    def buscar_paciente(self, criterio, limite=None):
+        """Busca pacientes por nombre, apellido o cédula usando el índice.
+
+        No distingue tildes ni mayúsculas; los más relevantes van primero.
+        """
+        ids = self.indice_busqueda.buscar(criterio, limite)
+        if ids is None:
+            return list(self.pacientes.values())[:limite]
+        return [self.pacientes[i] for i in ids]
     
     def actualizar_paciente(self, paciente):
         """Actualiza datos de un paciente"""
-        conn = sqlite3.connect('citas.db')
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute('''
-                UPDATE pacientes 
-                SET cedula=?, nombre=?, apellido=?, fecha_nacimiento=?, 
-                    telefono=?, direccion=?, email=?
-                WHERE id=?
-            ''', (paciente.cedula, paciente.nombre, paciente.apellido, 
-                  paciente.fecha_nacimiento, paciente.telefono, 
-                  paciente.direccion, paciente.email, paciente.id))
-            
-            conn.commit()
+            with self.db.transaccion() as cursor:
+                cursor.execute('''
+                    UPDATE pacientes 
+                    SET cedula=?, nombre=?, apellido=?, fecha_nacimiento=?, 
+                        telefono=?, direccion=?, email=?
+                    WHERE id=?
+                ''', (paciente.cedula, paciente.nombre, paciente.apellido, 
+                      paciente.fecha_nacimiento, paciente.telefono, 
+                      paciente.direccion, paciente.email, paciente.id))
             
             # Actualizar colección en memoria
             self.pacientes[paciente.id] = paciente
+            self.indice_busqueda.agregar(paciente)
             
             print(f"✅ Paciente actualizado: {paciente.nombre_completo()}")
             return True
         except sqlite3.Error as e:
+            if self.db.en_transaccion:
+                # Dentro de inventario.transaccion(): la exterior hace ROLLBACK
+                raise
             print(f"❌ Error al actualizar paciente: {e}")
             return False
-        finally:
-            conn.close()
     
     def eliminar_paciente(self, paciente_id):
         """Elimina un paciente"""
@@ -226,12 +1032,9 @@ class InventarioCitas:
             print(f"❌ No se puede eliminar: El paciente tiene {len(self.indice_paciente[paciente_id])} citas")
             return False
         
-        conn = sqlite3.connect('citas.db')
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute("DELETE FROM pacientes WHERE id=?", (paciente_id,))
-            conn.commit()
+            with self.db.transaccion() as cursor:
+                cursor.execute("DELETE FROM pacientes WHERE id=?", (paciente_id,))
             
             if cursor.rowcount > 0:
                 # Eliminar de colecciones
@@ -239,15 +1042,17 @@ class InventarioCitas:
                     del self.pacientes[paciente_id]
                 if paciente_id in self.indice_paciente:
                     del self.indice_paciente[paciente_id]
+                self.indice_busqueda.quitar(paciente_id)
                 
                 print(f"✅ Paciente eliminado")
                 return True
             return False
         except sqlite3.Error as e:
+            if self.db.en_transaccion:
+                # Dentro de inventario.transaccion(): la exterior hace ROLLBACK
+                raise
             print(f"❌ Error al eliminar paciente: {e}")
             return False
-        finally:
-            conn.close()
     
     # ----- CRUD de Citas -----
     
@@ -261,45 +1066,68 @@ class InventarioCitas:
             print("❌ Médico no existe")
             return None
         
-        conn = sqlite3.connect('citas.db')
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute('''
-                INSERT INTO citas (paciente_id, medico_id, fecha, hora, motivo, estado)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (cita.paciente_id, cita.medico_id, cita.fecha, 
-                  cita.hora, cita.motivo, cita.estado))
-            
-            conn.commit()
+            with self.db.transaccion() as cursor:
+                cursor.execute('''
+                    INSERT INTO citas (paciente_id, medico_id, fecha, hora, motivo, estado)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (cita.paciente_id, cita.medico_id, cita.fecha, 
+                      cita.hora, cita.motivo, cita.estado))
             cita.id = cursor.lastrowid
             
             # Actualizar colecciones
-            self.citas[cita.id] = cita
-            self.citas_ordenadas.append(cita)
-            self.fechas_con_citas.add(cita.fecha)
-            
-            if cita.paciente_id not in self.indice_paciente:
-                self.indice_paciente[cita.paciente_id] = []
-            self.indice_paciente[cita.paciente_id].append(cita)
+            self._indexar_cita(cita)
             
             paciente = self.pacientes[cita.paciente_id]
             medico = self.medicos[cita.medico_id]
             print(f"✅ Cita agendada: {paciente.nombre_completo()} con {medico.nombre_completo()}")
             return cita.id
         except sqlite3.Error as e:
+            if self.db.en_transaccion:
+                # Dentro de inventario.transaccion(): la exterior hace ROLLBACK
+                raise
             print(f"❌ Error al agendar cita: {e}")
             return None
-        finally:
-            conn.close()
     
     def buscar_citas_por_fecha(self, fecha):
-        """Busca citas por fecha usando list comprehension"""
-        return [c for c in self.citas.values() if c.fecha == fecha]
+        """Busca citas por fecha usando el índice (ordenadas por hora)"""
+        try:
+            return self.indice_fecha.del_dia(fecha)
+        except ValueError:
+            return []
+    
+    def buscar_citas_por_rango(self, desde, hasta):
+        """Citas entre dos fechas (incluidas), en orden cronológico"""
+        try:
+            return list(self.indice_fecha.rango(desde, hasta))
+        except ValueError:
+            return []
+    
+    def proximas_citas(self, n=10, desde=None, solo_pendientes=False):
+        """Las próximas n citas desde una fecha (hoy por defecto), en orden cronológico.
+
+        Con solo_pendientes=True se omiten las canceladas y completadas.
+        """
+        lista = self.citas_pendientes if solo_pendientes else self.citas_ordenadas
+        try:
+            return lista.siguientes(desde or date.today(), n)
+        except ValueError:
+            return []
+    
+    def ultimas_citas(self, n=10, hasta=None):
+        """Las últimas n citas hasta una fecha (todas por defecto), la más reciente primero"""
+        try:
+            return self.citas_ordenadas.anteriores(hasta, n)
+        except ValueError:
+            return []
+    
+    def iterar_citas(self, desde=None, hasta=None, estado=None):
+        """Itera las citas en orden cronológico, acotadas por fechas y estado si se indican"""
+        return self.citas_ordenadas.rango(desde, hasta, estado)
     
     def buscar_citas_por_paciente(self, paciente_id):
         """Busca citas por paciente usando índice"""
-        return self.indice_paciente.get(paciente_id, [])
+        return list(self.indice_paciente.get(paciente_id, {}).values())
     
     def actualizar_estado_cita(self, cita_id, nuevo_estado):
         """Actualiza el estado de una cita"""
@@ -307,54 +1135,281 @@ class InventarioCitas:
             print(f"❌ Estado inválido. Estados válidos: {', '.join(Cita.ESTADOS)}")
             return False
         
-        conn = sqlite3.connect('citas.db')
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute("UPDATE citas SET estado=? WHERE id=?", (nuevo_estado, cita_id))
-            conn.commit()
+            with self.db.transaccion() as cursor:
+                cursor.execute("UPDATE citas SET estado=? WHERE id=?", (nuevo_estado, cita_id))
             
             if cursor.rowcount > 0:
-                # Actualizar en memoria
-                if cita_id in self.citas:
-                    self.citas[cita_id].estado = nuevo_estado
+                # Actualizar en memoria (los índices guardan el mismo objeto,
+                # y el estado no cambia su posición en el índice por fecha)
+                cita = self.citas.get(cita_id)
+                if cita:
+                    self._contar_estado(cita, -1)
+                    cita.estado = Cita.normalizar_estado(nuevo_estado)
+                    self._contar_estado(cita, 1)
+                    if self.columnas is not None:
+                        self.columnas.cambiar_estado(cita)
                 print(f"✅ Estado de cita actualizado a: {nuevo_estado}")
                 return True
             return False
         except sqlite3.Error as e:
+            if self.db.en_transaccion:
+                # Dentro de inventario.transaccion(): la exterior hace ROLLBACK
+                raise
             print(f"❌ Error al actualizar estado: {e}")
             return False
-        finally:
-            conn.close()
     
     def cancelar_cita(self, cita_id):
         """Cancela una cita"""
         return self.actualizar_estado_cita(cita_id, "Cancelada")
     
+    # ----- Importación masiva -----
+    
+    CAMPOS_PACIENTE = ('cedula', 'nombre', 'apellido', 'fecha_nacimiento', 'telefono', 'direccion', 'email')
+    CAMPOS_MEDICO = ('cedula', 'nombre', 'apellido', 'especialidad', 'telefono', 'email')
+    
+    def _siguiente_id(self, cursor, tabla):
+        """Primer id libre de la tabla (con el bloqueo de escritura ya tomado)"""
+        cursor.execute(f"SELECT MAX(id) FROM {tabla}")
+        maximo = cursor.fetchone()[0] or 0
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name=?", (tabla,))
+        secuencia = cursor.fetchone()
+        return max(maximo, secuencia[0] if secuencia else 0) + 1
+    
+    def _insertar_lote(self, tabla, campos, objetos):
+        """Inserta los objetos con ids consecutivos en una transacción (executemany)"""
+        with self.db.transaccion() as cursor:
+            base = self._siguiente_id(cursor, tabla)
+            for i, objeto in enumerate(objetos):
+                objeto.id = base + i
+            cursor.executemany(
+                f"INSERT INTO {tabla} (id, {', '.join(campos)}) "
+                f"VALUES ({', '.join('?' * (len(campos) + 1))})",
+                ((objeto.id,) + tuple(getattr(objeto, campo) for campo in campos)
+                 for objeto in objetos))
+    
+    def _importar(self, tabla, filas, validar, campos, indexar):
+        """Valida las filas, inserta las válidas en lote y actualiza la memoria.
+
+        Retorna un diccionario con insertados, rechazados (lista de
+        (número de fila, motivo)), error, segundos y filas_por_segundo.
+        """
+        inicio = time.perf_counter()
+        validos, rechazados = [], []
+        total = 0
+        for numero, fila in enumerate(filas, 1):
+            total += 1
+            datos = {campo: str(fila.get(campo) or '').strip() for campo in fila if campo}
+            resultado = validar(datos)
+            if isinstance(resultado, str):
+                rechazados.append((numero, resultado))
+            else:
+                validos.append(resultado)
+        
+        error = None
+        if validos:
+            try:
+                self._insertar_lote(tabla, campos, validos)
+                indexar(validos)
+            except sqlite3.Error as e:
+                if self.db.en_transaccion:
+                    raise
+                error = str(e)
+                validos = []
+        
+        segundos = time.perf_counter() - inicio
+        return {
+            'insertados': len(validos),
+            'rechazados': rechazados,
+            'error': error,
+            'segundos': segundos,
+            'filas_por_segundo': total / segundos if segundos > 0 else 0.0,
+        }
+    
+    def _validador_persona(self, existentes):
+        """Validaciones comunes a pacientes y médicos (cédula, nombre, apellido)"""
+        cedulas = {persona.cedula for persona in existentes}
+        def validar(datos):
+            cedula = datos.get('cedula', '')
+            if not cedula_valida(cedula):
+                return f"cédula inválida: '{cedula}' (deben ser 10 dígitos)"
+            if cedula in cedulas:
+                return f"cédula duplicada: {cedula}"
+            if not datos.get('nombre') or not datos.get('apellido'):
+                return "nombre y apellido son obligatorios"
+            cedulas.add(cedula)
+            return None
+        return validar
+    
+    def importar_pacientes(self, filas):
+        """Importa muchos pacientes en una sola transacción.
+
+        `filas` son diccionarios con las columnas de CAMPOS_PACIENTE (por
+        ejemplo de csv.DictReader). Las filas inválidas se rechazan con su
+        motivo sin impedir que se importe el resto.
+        """
+        validar_persona = self._validador_persona(self.pacientes.values())
+        def validar(datos):
+            nacimiento = datos.get('fecha_nacimiento', '')
+            if nacimiento and not fecha_valida(nacimiento):
+                return f"fecha_nacimiento inválida: '{nacimiento}' (YYYY-MM-DD)"
+            motivo = validar_persona(datos)
+            if motivo:
+                return motivo
+            return Paciente(None, **{campo: datos.get(campo, '') for campo in self.CAMPOS_PACIENTE})
+        
+        def indexar(pacientes):
+            self.pacientes.update((paciente.id, paciente) for paciente in pacientes)
+            self.indice_busqueda.agregar_varios(pacientes)
+        
+        return self._importar('pacientes', filas, validar, self.CAMPOS_PACIENTE, indexar)
+    
+    def importar_medicos(self, filas):
+        """Importa muchos médicos en una sola transacción (columnas de CAMPOS_MEDICO)"""
+        validar_persona = self._validador_persona(self.medicos.values())
+        def validar(datos):
+            especialidad = datos.get('especialidad', '')
+            if especialidad not in Medico.ESPECIALIDADES:
+                return f"especialidad desconocida: '{especialidad}'"
+            motivo = validar_persona(datos)
+            if motivo:
+                return motivo
+            return Medico(None, **{campo: datos.get(campo, '') for campo in self.CAMPOS_MEDICO})
+        
+        def indexar(medicos):
+            self.medicos.update((medico.id, medico) for medico in medicos)
+        
+        return self._importar('medicos', filas, validar, self.CAMPOS_MEDICO, indexar)
+    
+    def importar_citas(self, filas):
+        """Importa muchas citas en una sola transacción.
+
+        Paciente y médico se indican por id (paciente_id, medico_id) o por
+        cédula (paciente_cedula, medico_cedula) y deben existir en el
+        inventario. Los índices en memoria se actualizan en un solo lote.
+        """
+        pacientes = {p.cedula: p.id for p in self.pacientes.values()}
+        medicos = {m.cedula: m.id for m in self.medicos.values()}
+        
+        def referencia(datos, nombre, existentes, por_cedula):
+            if datos.get(f'{nombre}_id'):
+                try:
+                    identificador = int(datos[f'{nombre}_id'])
+                except ValueError:
+                    return None
+                return identificador if identificador in existentes else None
+            return por_cedula.get(datos.get(f'{nombre}_cedula', ''))
+        
+        def validar(datos):
+            paciente_id = referencia(datos, 'paciente', self.pacientes, pacientes)
+            if paciente_id is None:
+                return "paciente no existe"
+            medico_id = referencia(datos, 'medico', self.medicos, medicos)
+            if medico_id is None:
+                return "médico no existe"
+            fecha = datos.get('fecha', '')
+            if not fecha_valida(fecha):
+                return f"fecha inválida: '{fecha}' (YYYY-MM-DD)"
+            hora = datos.get('hora', '')
+            if not FORMATO_HORA.fullmatch(hora):
+                return f"hora inválida: '{hora}' (HH:MM)"
+            estado = datos.get('estado') or "Programada"
+            if estado not in Cita.ESTADOS:
+                return f"estado inválido: '{estado}'"
+            return Cita(None, paciente_id, medico_id, fecha, hora, datos.get('motivo', ''), estado)
+        
+        campos = ('paciente_id', 'medico_id', 'fecha', 'hora', 'motivo', 'estado')
+        return self._importar('citas', filas, validar, campos, self._indexar_citas)
+    
     # ----- Reportes -----
     
-    def reporte_citas_por_medico(self, medico_id):
-        """Genera reporte de citas por médico usando filter"""
-        return list(filter(lambda c: c.medico_id == medico_id, self.citas.values()))
+    def reporte_citas_por_medico(self, medico_id, desde=None, hasta=None, estado=None):
+        """Citas de un médico en orden cronológico usando el índice por médico.
+
+        Se puede acotar por rango de fechas (incluidas) y por estado sin
+        recorrer las citas de otros médicos ni las de fuera del rango.
+        """
+        indice = self.indice_medico.get(medico_id)
+        if indice is None:
+            return []
+        try:
+            return list(indice.rango(desde, hasta, estado))
+        except ValueError:
+            return []
+    
+    def reporte_citas_por_estado(self, estado, desde=None, hasta=None):
+        """Citas en un estado (opcionalmente entre dos fechas), ordenadas por id"""
+        try:
+            if self.columnas is not None:
+                ids = self.columnas.ids(desde=desde, hasta=hasta, estado=estado)
+                return [self.citas[int(i)] for i in ids]
+            citas = self.indice_fecha.rango(desde, hasta) if desde and hasta else self.citas.values()
+            return sorted((c for c in citas if c.estado == estado
+                           and (not desde or c.dia >= a_ordinal(desde))
+                           and (not hasta or c.dia <= a_ordinal(hasta))),
+                          key=attrgetter('id'))
+        except ValueError:
+            return []
+    
+    def conteo_citas(self, estado, medico_id=None, desde=None, hasta=None):
+        """Cantidad de citas en un estado (de un médico si se indica).
+
+        Sin fechas es O(1) con los contadores; con un rango de fechas se
+        cuenta sobre las columnas (o el índice por fecha si no hay numpy).
+        """
+        if not desde and not hasta:
+            if medico_id is None:
+                return self.conteo_estados[estado]
+            return self.conteo_estado_medico[(estado, medico_id)]
+        if self.columnas is not None:
+            return self.columnas.contar(desde=desde, hasta=hasta, medico_id=medico_id, estado=estado)
+        if medico_id is not None:
+            return len(self.reporte_citas_por_medico(medico_id, desde, hasta, estado))
+        return len(self.reporte_citas_por_estado(estado, desde, hasta))
     
-    def reporte_citas_por_estado(self, estado):
-        """Reporte de citas por estado usando list comprehension"""
-        return [c for c in self.citas.values() if c.estado == estado]
+    def reporte_mensual(self, desde=None, hasta=None, medico_id=None):
+        """Cantidad de citas por mes, médico y estado.
+
+        Retorna una lista de tuplas ('YYYY-MM', medico_id, estado, cantidad)
+        ordenada por mes, médico y estado. Con numpy es una agrupación
+        vectorizada sobre las columnas; sin él se recorre el índice por fecha.
+        """
+        try:
+            if self.columnas is not None:
+                grupos = self.columnas.agrupar(('mes', 'medico', 'estado'),
+                                               desde=desde, hasta=hasta, medico_id=medico_id)
+                return [(texto_mes(mes), medico, ColumnasCitas.ESTADOS[codigo], cantidad)
+                        for mes, medico, codigo, cantidad in grupos]
+            if medico_id is not None:
+                citas = self.reporte_citas_por_medico(medico_id, desde, hasta)
+            elif desde and hasta:
+                citas = self.indice_fecha.rango(desde, hasta)
+            else:
+                inicio = a_ordinal(desde) if desde else None
+                fin = a_ordinal(hasta) if hasta else None
+                citas = (c for c in self.citas.values()
+                         if (inicio is None or c.dia >= inicio) and (fin is None or c.dia <= fin))
+            conteo = Counter((a_mes(c.dia), c.medico_id, c.estado) for c in citas)
+            return [(texto_mes(mes), medico, estado, cantidad)
+                    for (mes, medico, estado), cantidad in sorted(conteo.items())]
+        except ValueError:
+            return []
     
     def estadisticas(self):
-        """Genera estadísticas del sistema usando colecciones"""
+        """Genera estadísticas del sistema con los contadores mantenidos"""
+        hoy = date.today().toordinal()
+        pendientes = self.citas_pendientes.citas
         return {
             "total_pacientes": len(self.pacientes),
             "total_medicos": len(self.medicos),
             "total_citas": len(self.citas),
             "citas_por_estado": {
-                estado: len(self.reporte_citas_por_estado(estado))
+                estado: self.conteo_estados[estado]
                 for estado in Cita.ESTADOS
             },
             "fechas_con_citas": len(self.fechas_con_citas),
-            "proximas_citas": len([c for c in self.citas.values() 
-                                  if c.fecha >= datetime.now().strftime("%Y-%m-%d") 
-                                  and c.estado not in ["Cancelada", "Completada"]])
+            # Las pendientes están ordenadas por fecha: las próximas son el final de la lista
+            "proximas_citas": len(pendientes) - bisect_left(pendientes, hoy, key=clave_fecha)
         }
     
     def mostrar_todo(self):
@@ -372,9 +1427,8 @@ class InventarioCitas:
             print(f"  • {medico}")
         
         print(f"\n📅 CITAS ({len(self.citas)}):")
-        # Ordenar citas por fecha usando sorted
-        citas_ordenadas = sorted(self.citas.values(), key=lambda c: (c.fecha, c.hora))
-        for cita in citas_ordenadas:
+        # La lista cronológica ya está en orden: no hace falta ordenar
+        for cita in self.citas_ordenadas:
             paciente = self.pacientes.get(cita.paciente_id, Paciente(nombre="Desconocido"))
             medico = self.medicos.get(cita.medico_id, Medico(nombre="Desconocido"))
             print(f"  • {cita.fecha} {cita.hora} - {paciente.nombre_completo()} con {medico.nombre_completo()} [{cita.estado}]")
\ No newline at end of file
@@ -0,0 +1,75 @@
+﻿# services/cache.py
+# Caché en memoria con tamaño máximo y tiempo de vida (TTL)
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheTTL:
+    """Caché LRU acotada cuyas entradas expiran tras `ttl` segundos.
+
+    Es local a cada proceso: con varios workers de gunicorn, el TTL limita
+    cuánto tiempo puede verse un dato ya modificado por otro worker.
+    """
+
+    def __init__(self, max_items=1000, ttl=300):
+        self.max_items = max_items
+        self.ttl = ttl
+        # Colección: Diccionario ordenado clave -> (valor, expira_en)
+        self._datos = OrderedDict()
+        self._candado = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+        self.invalidaciones = 0
+
+    def obtener(self, clave):
+        """Retorna el valor guardado o None si no existe o ya expiró"""
+        with self._candado:
+            entrada = self._datos.get(clave)
+            if entrada is not None:
+                valor, expira_en = entrada
+                if expira_en > time.monotonic():
+                    self._datos.move_to_end(clave)
+                    self.aciertos += 1
+                    return valor
+                del self._datos[clave]
+            self.fallos += 1
+            return None
+
+    def guardar(self, clave, valor):
+        """Guarda un valor y expulsa el menos usado si se supera el límite"""
+        with self._candado:
+            self._datos[clave] = (valor, time.monotonic() + self.ttl)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_items:
+                self._datos.popitem(last=False)
+                self.expulsiones += 1
+
+    def invalidar(self, clave):
+        """Elimina una clave de la caché"""
+        with self._candado:
+            if self._datos.pop(clave, None) is not None:
+                self.invalidaciones += 1
+
+    def limpiar(self):
+        """Vacía la caché por completo"""
+        with self._candado:
+            self.invalidaciones += len(self._datos)
+            self._datos.clear()
+
+    def estadisticas(self):
+        """Retorna los contadores de uso de la caché"""
+        with self._candado:
+            consultas = self.aciertos + self.fallos
+            return {
+                'entradas': len(self._datos),
+                'max_items': self.max_items,
+                'ttl': self.ttl,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'tasa_aciertos': round(self.aciertos / consultas, 4) if consultas else 0.0,
+                'expulsiones': self.expulsiones,
+                'invalidaciones': self.invalidaciones,
+            }
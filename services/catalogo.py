@@ -0,0 +1,77 @@
+﻿# services/catalogo.py
+# Catálogo de servicios médicos en memoria, versionado
+
+import threading
+import time
+
+
+class CatalogoServicios:
+    """Copia en memoria de la tabla servicios (id -> nombre/duración).
+
+    `cargador` es una función que retorna las filas de servicios como
+    diccionarios. Cada recarga incrementa `version`. invalidar() debe
+    llamarse al modificar servicios; el TTL cubre los cambios hechos
+    desde otros procesos.
+    """
+
+    def __init__(self, cargador, ttl=600):
+        self.cargador = cargador
+        self.ttl = ttl
+        self.version = 0
+        # Colección: Diccionario id -> servicio
+        self._por_id = {}
+        # Colección: Lista de servicios ordenada por nombre
+        self._ordenados = []
+        self._cargado_en = None
+        self._candado = threading.Lock()
+
+    def _vigente(self):
+        return (self._cargado_en is not None
+                and time.monotonic() - self._cargado_en < self.ttl)
+
+    def _asegurar(self):
+        if self._vigente():
+            return
+        with self._candado:
+            if self._vigente():
+                return
+            filas = self.cargador()
+            ordenados = sorted(
+                (
+                    {
+                        'id': fila['id'],
+                        'nombre': fila['nombre'],
+                        'descripcion': fila.get('descripcion'),
+                        'duracion': fila.get('duracion') or 30,
+                    }
+                    for fila in filas
+                ),
+                key=lambda s: s['nombre']
+            )
+            self._por_id = {s['id']: s for s in ordenados}
+            self._ordenados = ordenados
+            self._cargado_en = time.monotonic()
+            self.version += 1
+
+    def listar(self):
+        """Retorna los servicios ordenados por nombre"""
+        self._asegurar()
+        return self._ordenados
+
+    def obtener(self, servicio_id):
+        """Retorna un servicio por id, o None si no existe"""
+        self._asegurar()
+        try:
+            return self._por_id.get(int(servicio_id))
+        except (TypeError, ValueError):
+            return None
+
+    def total(self):
+        """Cantidad de servicios en el catálogo"""
+        self._asegurar()
+        return len(self._ordenados)
+
+    def invalidar(self):
+        """Fuerza la recarga en la próxima consulta"""
+        with self._candado:
+            self._cargado_en = None
@@ -0,0 +1,166 @@
+﻿# services/compresion.py
+# Compresión gzip/brotli de respuestas según Accept-Encoding
+
+import gzip
+import os
+import threading
+import zlib
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional; sin él solo se ofrece gzip
+    brotli = None
+
+# Tipos de contenido que vale la pena comprimir
+TIPOS_COMPRIMIBLES = (
+    'text/html', 'text/css', 'text/plain', 'text/javascript',
+    'application/javascript', 'application/json', 'image/svg+xml',
+)
+
+# Extensiones de los archivos precomprimidos por codificación
+EXTENSIONES = {'br': '.br', 'gzip': '.gz'}
+
+
+def codificaciones_disponibles():
+    """Codificaciones soportadas, de la preferida a la menos preferida"""
+    return ('br', 'gzip') if brotli else ('gzip',)
+
+
+def comprimir_bytes(datos, codificacion, nivel):
+    if codificacion == 'br':
+        return brotli.compress(datos, quality=nivel)
+    # mtime=0 para que el mismo contenido produzca siempre los mismos bytes
+    return gzip.compress(datos, compresslevel=nivel, mtime=0)
+
+
+def variantes_precomprimidas(ruta):
+    """Codificaciones con archivo .br/.gz del build al día con `ruta`"""
+    modificado = os.path.getmtime(ruta)
+    return [
+        codificacion for codificacion in codificaciones_disponibles()
+        if os.path.exists(ruta + EXTENSIONES[codificacion])
+        and os.path.getmtime(ruta + EXTENSIONES[codificacion]) >= modificado
+    ]
+
+
+def leer_precomprimidos(ruta):
+    """Diccionario codificación -> bytes de las variantes precomprimidas"""
+    variantes = {}
+    for codificacion in variantes_precomprimidas(ruta):
+        with open(ruta + EXTENSIONES[codificacion], 'rb') as f:
+            variantes[codificacion] = f.read()
+    return variantes
+
+
+class CompresorRespuestas:
+    """Comprime en un after_request las respuestas que lo merecen.
+
+    Solo se comprimen los TIPOS_COMPRIMIBLES de al menos `minimo` bytes;
+    las respuestas en streaming se comprimen por partes (con flush en cada
+    fragmento, así el navegador puede ir mostrando la página). Las que ya
+    traen Content-Encoding o son archivos (direct_passthrough) no se tocan.
+    """
+
+    def __init__(self, nivel_gzip=6, nivel_brotli=5, minimo=500):
+        self.niveles = {'gzip': nivel_gzip, 'br': nivel_brotli}
+        self.minimo = minimo
+        self._candado = threading.Lock()
+        self._contadores = {
+            'respuestas_comprimidas': 0,
+            'respuestas_sin_comprimir': 0,
+            'bytes_originales': 0,
+            'bytes_enviados': 0,
+        }
+
+    def elegir(self, accept_encodings, ofrecidas=None):
+        """Mejor codificación aceptada por el cliente (o None).
+
+        Con `ofrecidas` solo se eligen las que existen (p. ej. las variantes
+        precomprimidas): si el cliente prefiere br y solo hay .gz, gzip.
+        """
+        candidatas = codificaciones_disponibles()
+        if ofrecidas is not None:
+            candidatas = [c for c in candidatas if c in ofrecidas]
+        return accept_encodings.best_match(candidatas)
+
+    def registrar(self, original, enviado):
+        with self._candado:
+            self._contadores['respuestas_comprimidas'] += 1
+            self._contadores['bytes_originales'] += original
+            self._contadores['bytes_enviados'] += enviado
+
+    def procesar(self, request, response):
+        if (response.mimetype not in TIPOS_COMPRIMIBLES
+                or response.direct_passthrough
+                or 'Content-Encoding' in response.headers):
+            return response
+        response.vary.add('Accept-Encoding')
+        if response.status_code == 304:
+            # El 304 lleva el mismo validador que el 200 comprimido que tiene
+            # el cliente: si lo recibió débil, se responde débil
+            etag, debil = response.get_etag()
+            if etag and not debil and request.if_none_match.is_weak(etag):
+                response.set_etag(etag, weak=True)
+            return response
+        if response.status_code == 204 or response.status_code < 200 or response.cache_control.no_transform:
+            return response
+
+        codificacion = self.elegir(request.accept_encodings)
+        if codificacion is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self._comprimir_flujo(response.response, codificacion)
+        else:
+            datos = response.get_data()
+            if len(datos) < self.minimo:
+                with self._candado:
+                    self._contadores['respuestas_sin_comprimir'] += 1
+                return response
+            comprimido = comprimir_bytes(datos, codificacion, self.niveles[codificacion])
+            response.set_data(comprimido)
+            self.registrar(len(datos), len(comprimido))
+
+        response.headers['Content-Encoding'] = codificacion
+        # El cuerpo cambió, el ETag pasa a ser débil (como hace nginx)
+        etag, debil = response.get_etag()
+        if etag and not debil:
+            response.set_etag(etag, weak=True)
+        return response
+
+    def _comprimir_flujo(self, fragmentos, codificacion):
+        nivel = self.niveles[codificacion]
+        if codificacion == 'br':
+            compresor = brotli.Compressor(quality=nivel)
+            comprimir = lambda d: compresor.process(d) + compresor.flush()
+            terminar = compresor.finish
+        else:
+            compresor = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+            comprimir = lambda d: compresor.compress(d) + compresor.flush(zlib.Z_SYNC_FLUSH)
+            terminar = compresor.flush
+
+        original = enviado = 0
+        try:
+            for fragmento in fragmentos:
+                if isinstance(fragmento, str):
+                    fragmento = fragmento.encode('utf-8')
+                if not fragmento:
+                    continue
+                salida = comprimir(fragmento)
+                original += len(fragmento)
+                enviado += len(salida)
+                yield salida
+            salida = terminar()
+            enviado += len(salida)
+            yield salida
+        finally:
+            if hasattr(fragmentos, 'close'):
+                fragmentos.close()
+            self.registrar(original, enviado)
+
+    def estadisticas(self):
+        with self._candado:
+            datos = dict(self._contadores)
+        datos['bytes_ahorrados'] = datos['bytes_originales'] - datos['bytes_enviados']
+        datos['codificaciones'] = list(codificaciones_disponibles())
+        return datos
@@ -0,0 +1,81 @@
+﻿# services/contadores.py
+# Contadores del tablero de inicio mantenidos en memoria
+
+import threading
+import time
+from collections import Counter
+
+
+class ContadoresTablero:
+    """Conteos de usuarios, servicios y turnos por estado/servicio.
+
+    Se actualizan de forma incremental desde las rutas (turno creado,
+    estado cambiado, usuario registrado) y se reconcilian con la base de
+    datos cada `intervalo` segundos usando `cargador`, que retorna
+    {'usuarios': int, 'servicios': int, 'turnos': [(estado, servicio_id, total)]}.
+    La reconciliación corrige también lo hecho por otros procesos.
+    """
+
+    def __init__(self, cargador, intervalo=60):
+        self.cargador = cargador
+        self.intervalo = intervalo
+        self.usuarios = 0
+        self.servicios = 0
+        # Colección: Contador (estado, servicio_id) -> cantidad de turnos
+        self._turnos = Counter()
+        self._reconciliado_en = None
+        self.reconciliaciones = 0
+        self._candado = threading.Lock()
+
+    def _vigente(self):
+        return (self._reconciliado_en is not None
+                and time.monotonic() - self._reconciliado_en < self.intervalo)
+
+    def reconciliar(self):
+        """Recalcula todos los conteos desde la base de datos"""
+        datos = self.cargador()
+        turnos = Counter()
+        for estado, servicio_id, total in datos['turnos']:
+            turnos[(estado, servicio_id)] += total
+        with self._candado:
+            self.usuarios = datos['usuarios']
+            self.servicios = datos['servicios']
+            self._turnos = turnos
+            self._reconciliado_en = time.monotonic()
+            self.reconciliaciones += 1
+
+    def _asegurar(self):
+        if not self._vigente():
+            self.reconciliar()
+
+    def turno_creado(self, servicio_id, estado='Programado'):
+        with self._candado:
+            self._turnos[(estado, servicio_id)] += 1
+
+    def turno_cambio_estado(self, servicio_id, anterior, nuevo):
+        with self._candado:
+            clave = (anterior, servicio_id)
+            if self._turnos[clave] > 0:
+                self._turnos[clave] -= 1
+            self._turnos[(nuevo, servicio_id)] += 1
+
+    def usuario_registrado(self):
+        with self._candado:
+            self.usuarios += 1
+
+    def resumen(self):
+        """Retorna todos los conteos del tablero"""
+        self._asegurar()
+        with self._candado:
+            por_estado = Counter()
+            por_servicio = Counter()
+            for (estado, servicio_id), total in self._turnos.items():
+                por_estado[estado] += total
+                por_servicio[servicio_id] += total
+            return {
+                'usuarios': self.usuarios,
+                'servicios': self.servicios,
+                'turnos': sum(por_estado.values()),
+                'por_estado': dict(por_estado),
+                'por_servicio': dict(por_servicio),
+            }
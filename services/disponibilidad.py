@@ -0,0 +1,134 @@
+﻿# services/disponibilidad.py
+# Agenda de horarios ocupados por servicio y día
+
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import timedelta
+
+
+def a_minutos(hora):
+    """Convierte 'HH:MM', 'HH:MM:SS' o un timedelta (columna TIME) a minutos"""
+    if isinstance(hora, timedelta):
+        return int(hora.total_seconds()) // 60
+    partes = str(hora).split(':')
+    if len(partes) not in (2, 3):
+        raise ValueError(f"Hora inválida: {hora}")
+    horas, minutos = int(partes[0]), int(partes[1])
+    if not (0 <= horas < 24 and 0 <= minutos < 60):
+        raise ValueError(f"Hora inválida: {hora}")
+    return horas * 60 + minutos
+
+
+def a_hora(minutos):
+    """Convierte minutos desde medianoche a 'HH:MM'"""
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+
+class DiaAgenda:
+    """Turnos ocupados de un servicio en un día.
+
+    Todos los turnos de un servicio duran lo mismo (servicios.duracion),
+    así que basta con la lista ordenada de horas de inicio: un turno nuevo
+    choca solo con su vecino anterior o siguiente (búsqueda O(log n)).
+    Se comparte entre los hilos del worker, por eso cada operación toma
+    el candado del día.
+    """
+
+    def __init__(self, duracion, ocupados=()):
+        self.duracion = duracion
+        self._candado = threading.Lock()
+        # Colección: Lista ordenada de inicios (minutos), uno por turno
+        self._inicios = []
+        # Colección: Diccionario turno_id -> inicio
+        self._inicio_por_turno = {}
+        for turno_id, inicio in sorted(ocupados, key=lambda t: t[1]):
+            self._inicios.append(inicio)
+            self._inicio_por_turno[turno_id] = inicio
+
+    def _conflicto(self, inicio):
+        i = bisect_left(self._inicios, inicio)
+        if i < len(self._inicios) and self._inicios[i] < inicio + self.duracion:
+            return True
+        if i > 0 and self._inicios[i - 1] + self.duracion > inicio:
+            return True
+        return False
+
+    def conflicto(self, inicio):
+        """True si un turno que empieza en `inicio` se solapa con otro"""
+        with self._candado:
+            return self._conflicto(inicio)
+
+    def ocupar(self, inicio, turno_id):
+        with self._candado:
+            # El día pudo recargarse ya con este turno
+            if turno_id in self._inicio_por_turno:
+                return
+            insort(self._inicios, inicio)
+            self._inicio_por_turno[turno_id] = inicio
+
+    def liberar(self, turno_id):
+        with self._candado:
+            inicio = self._inicio_por_turno.pop(turno_id, None)
+            if inicio is None:
+                return False
+            del self._inicios[bisect_left(self._inicios, inicio)]
+            return True
+
+    def libres(self, apertura, cierre):
+        """Horas de inicio libres entre apertura y cierre (en minutos)"""
+        with self._candado:
+            return [
+                inicio
+                for inicio in range(apertura, cierre - self.duracion + 1, self.duracion)
+                if not self._conflicto(inicio)
+            ]
+
+
+class AgendaServicios:
+    """Caché de DiaAgenda por (servicio_id, fecha) con tiempo de vida.
+
+    Sirve las consultas de disponibilidad sin ir a la base de datos. La
+    reserva no depende de ella: comprueba el choque en MySQL bajo
+    SELECT ... FOR UPDATE y luego solo actualiza el día si está en caché.
+    """
+
+    def __init__(self, ttl=60, max_dias=5000):
+        self.ttl = ttl
+        self.max_dias = max_dias
+        # Colección: Diccionario (servicio_id, fecha) -> (DiaAgenda, cargado_en)
+        self._dias = {}
+        self._candado = threading.Lock()
+
+    def dia(self, servicio_id, fecha):
+        """Retorna el DiaAgenda en caché o None si no está o expiró"""
+        with self._candado:
+            entrada = self._dias.get((servicio_id, fecha))
+            if entrada and time.monotonic() - entrada[1] < self.ttl:
+                return entrada[0]
+            return None
+
+    def reemplazar_dia(self, servicio_id, fecha, duracion, ocupados):
+        """Guarda el estado leído de la base de datos para ese día"""
+        dia = DiaAgenda(duracion, ocupados)
+        with self._candado:
+            if len(self._dias) >= self.max_dias:
+                self._dias.clear()
+            self._dias[(servicio_id, fecha)] = (dia, time.monotonic())
+        return dia
+
+    def ocupar(self, servicio_id, fecha, inicio, turno_id):
+        """Registra un turno recién creado si el día está en caché"""
+        dia = self.dia(servicio_id, fecha)
+        if dia:
+            dia.ocupar(inicio, turno_id)
+
+    def liberar(self, servicio_id, fecha, turno_id):
+        """Quita un turno cancelado si el día está en caché"""
+        dia = self.dia(servicio_id, fecha)
+        if dia:
+            dia.liberar(turno_id)
+
+    def invalidar(self, servicio_id, fecha):
+        with self._candado:
+            self._dias.pop((servicio_id, fecha), None)
@@ -0,0 +1,140 @@
+﻿# services/hashing.py
+# Hash de contraseñas en un pool acotado, fuera del hilo de la petición
+
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+
+class HasheadorOcupado(Exception):
+    """Se lanza cuando la cola de hashes está llena o el hash tarda demasiado"""
+    pass
+
+
+def normalizar_metodo(metodo):
+    """Completa el método con los parámetros que Werkzeug guarda en el hash.
+
+    'scrypt' -> 'scrypt:32768:8:1', 'pbkdf2' -> 'pbkdf2:sha256:<iteraciones>'
+    """
+    partes = metodo.split(':')
+    if partes[0] == 'scrypt':
+        valores = partes[1:] + ['32768', '8', '1'][len(partes) - 1:]
+        return ':'.join(['scrypt'] + valores[:3])
+    if partes[0] == 'pbkdf2':
+        valores = partes[1:] + ['sha256', str(DEFAULT_PBKDF2_ITERATIONS)][len(partes) - 1:]
+        return ':'.join(['pbkdf2'] + valores[:2])
+    raise ValueError(f"Método de hash no soportado: {metodo}")
+
+
+class HasheadorContrasenas:
+    """Genera y verifica hashes de contraseñas en un pool de hilos o procesos.
+
+    Como mucho `trabajadores + max_pendientes` hashes en curso; el resto
+    se rechaza al instante con HasheadorOcupado en lugar de acumularse.
+    hashlib libera el GIL durante scrypt/PBKDF2, así que los hilos bastan;
+    `procesos=True` usa un ProcessPoolExecutor.
+
+    El límite solo sirve si cada proceso atiende varias peticiones a la
+    vez (gunicorn con worker gthread, ver render.yaml): con
+    `trabajadores + max_pendientes` menor que los hilos del worker, los
+    inicios de sesión nunca ocupan todos los hilos y el resto del sitio
+    sigue respondiendo.
+    """
+
+    def __init__(self, metodo='scrypt', trabajadores=2, max_pendientes=2,
+                 timeout=10, procesos=False):
+        self.metodo = normalizar_metodo(metodo)
+        self.trabajadores = trabajadores
+        self.max_pendientes = max_pendientes
+        self.timeout = timeout
+        self.procesos = procesos
+        self._cupos = threading.BoundedSemaphore(trabajadores + max_pendientes)
+        self._candado = threading.Lock()
+        self._ejecutor = None
+        self._contadores = {
+            'generados': 0,
+            'verificados': 0,
+            'actualizados': 0,
+            'rechazados': 0,
+            'agotados': 0,
+            'segundos': 0.0,
+        }
+
+    def _obtener_ejecutor(self):
+        # Se crea al primer uso, después del fork de cada worker de gunicorn
+        with self._candado:
+            if self._ejecutor is None:
+                clase = ProcessPoolExecutor if self.procesos else ThreadPoolExecutor
+                self._ejecutor = clase(max_workers=self.trabajadores)
+            return self._ejecutor
+
+    def _ejecutar(self, funcion, *args):
+        if not self._cupos.acquire(blocking=False):
+            with self._candado:
+                self._contadores['rechazados'] += 1
+            raise HasheadorOcupado("Demasiados inicios de sesión simultáneos")
+        inicio = time.perf_counter()
+        try:
+            futuro = self._obtener_ejecutor().submit(funcion, *args)
+        except BaseException:
+            self._cupos.release()
+            raise
+        # El cupo se libera cuando el hash termina de verdad: cancel() no
+        # detiene un hash que ya empezó, aunque la petición deje de esperarlo
+        futuro.add_done_callback(self._liberar_cupo)
+        try:
+            return futuro.result(timeout=self.timeout)
+        except TimeoutError:
+            futuro.cancel()
+            with self._candado:
+                self._contadores['agotados'] += 1
+            raise HasheadorOcupado(f"El hash tardó más de {self.timeout} segundos")
+        finally:
+            with self._candado:
+                self._contadores['segundos'] += time.perf_counter() - inicio
+
+    def _liberar_cupo(self, futuro):
+        self._cupos.release()
+
+    def generar(self, password):
+        """Hash nuevo con el método configurado"""
+        resultado = self._ejecutar(generate_password_hash, password, self.metodo)
+        with self._candado:
+            self._contadores['generados'] += 1
+        return resultado
+
+    def necesita_actualizar(self, password_hash):
+        """True si el hash guardado usa otros parámetros que los configurados"""
+        return password_hash.split('$', 1)[0] != self.metodo
+
+    def verificar(self, password_hash, password):
+        """Retorna (valida, hash_nuevo).
+
+        hash_nuevo no es None cuando la contraseña es correcta pero el hash
+        guardado usa parámetros antiguos y hay que reemplazarlo. La
+        actualización es opcional: si el pool está ocupado se deja para un
+        próximo inicio de sesión en lugar de rechazar una contraseña válida.
+        """
+        valida = self._ejecutar(check_password_hash, password_hash, password)
+        with self._candado:
+            self._contadores['verificados'] += 1
+        if valida and self.necesita_actualizar(password_hash):
+            try:
+                nuevo = self.generar(password)
+            except HasheadorOcupado:
+                return True, None
+            with self._candado:
+                self._contadores['actualizados'] += 1
+            return True, nuevo
+        return valida, None
+
+    def estadisticas(self):
+        with self._candado:
+            return {
+                'metodo': self.metodo,
+                'trabajadores': self.trabajadores,
+                'max_pendientes': self.max_pendientes,
+                **self._contadores,
+            }
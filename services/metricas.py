@@ -0,0 +1,195 @@
+﻿# services/metricas.py
+# Métricas por ruta (latencia, consultas, render) en formato Prometheus
+
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from flask import g, has_request_context
+
+# Límites de los buckets en segundos
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histograma:
+    """Histograma acumulativo con buckets fijos, como los de Prometheus"""
+
+    def __init__(self, limites=BUCKETS_SEGUNDOS):
+        self.limites = limites
+        self.cuentas = [0] * len(limites)
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        i = bisect_left(self.limites, valor)
+        if i < len(self.cuentas):
+            self.cuentas[i] += 1
+        self.suma += valor
+        self.total += 1
+
+    def lineas(self, nombre, etiquetas):
+        acumulado = 0
+        for limite, cuenta in zip(self.limites, self.cuentas):
+            acumulado += cuenta
+            yield f'{nombre}_bucket{{{etiquetas},le="{limite}"}} {acumulado}'
+        yield f'{nombre}_bucket{{{etiquetas},le="+Inf"}} {self.total}'
+        yield f'{nombre}_sum{{{etiquetas}}} {self.suma:.6f}'
+        yield f'{nombre}_count{{{etiquetas}}} {self.total}'
+
+
+class MedicionPeticion:
+    """Lo que ocurre durante una petición (se guarda en flask.g)"""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.conexiones = 0
+        self.consultas = 0
+        self.filas = 0
+        self.render = 0.0
+        # Código HTTP de la respuesta (500 si la vista lanzó una excepción)
+        self.estado = None
+        # Colección: Lista de (sql, segundos) para el log de peticiones lentas
+        self.sql = []
+
+
+class RegistroMetricas:
+    """Acumula métricas de todas las peticiones de este proceso.
+
+    Con varios workers de gunicorn cada uno expone sus propias métricas en
+    /metrics. Actúa también como observador de CursorMedido.
+    """
+
+    def __init__(self, prefijo='turnos', umbral_lento=None, logger=None):
+        self.prefijo = prefijo
+        # Segundos a partir de los cuales se registra la petición con su SQL
+        self.umbral_lento = umbral_lento
+        self.logger = logger
+        self._candado = threading.Lock()
+        self._latencia = defaultdict(Histograma)
+        self._render = defaultdict(Histograma)
+        self._peticiones = defaultdict(int)
+        self._conexiones = defaultdict(int)
+        self._consultas = defaultdict(int)
+        self._filas = defaultdict(int)
+        self.peticiones_lentas = 0
+
+    # ----- Durante la petición -----
+
+    def _actual(self):
+        if has_request_context():
+            return g.get('medicion')
+        return None
+
+    def iniciar_peticion(self):
+        g.medicion = MedicionPeticion()
+
+    def conexion(self):
+        medicion = self._actual()
+        if medicion:
+            medicion.conexiones += 1
+
+    def consulta(self, sql, params, segundos):
+        medicion = self._actual()
+        if medicion:
+            medicion.consultas += 1
+            # El SQL solo se guarda si puede terminar en el log de peticiones lentas
+            if self.umbral_lento is not None:
+                medicion.sql.append((' '.join(str(sql).split()), segundos))
+
+    def filas(self, cantidad):
+        medicion = self._actual()
+        if medicion:
+            medicion.filas += cantidad
+
+    def render(self, segundos):
+        medicion = self._actual()
+        if medicion:
+            medicion.render += segundos
+
+    def respuesta(self, estado):
+        """Anota el código de la respuesta (desde after_request)"""
+        medicion = self._actual()
+        if medicion:
+            medicion.estado = estado
+
+    def finalizar_peticion(self, ruta, metodo, error=None):
+        """Cierra la medición (desde teardown_request, que corre también si la vista falló)"""
+        medicion = g.pop('medicion', None)
+        if medicion is None:
+            return
+        duracion = time.perf_counter() - medicion.inicio
+        estado = 500 if error is not None or medicion.estado is None else medicion.estado
+        clave = (ruta, metodo)
+        lenta = self.umbral_lento is not None and duracion >= self.umbral_lento
+        with self._candado:
+            self._latencia[clave].observar(duracion)
+            self._peticiones[(ruta, metodo, estado)] += 1
+            self._conexiones[clave] += medicion.conexiones
+            self._consultas[clave] += medicion.consultas
+            self._filas[clave] += medicion.filas
+            if medicion.render:
+                self._render[clave].observar(medicion.render)
+            if lenta:
+                self.peticiones_lentas += 1
+
+        if lenta:
+            if self.logger:
+                lineas = [
+                    f"Petición lenta {metodo} {ruta} -> {estado} en {duracion * 1000:.1f} ms "
+                    f"({medicion.conexiones} conexiones, {medicion.consultas} consultas, "
+                    f"{medicion.filas} filas)"
+                ]
+                lineas += [f'    {segundos * 1000:.1f} ms  {sql}' for sql, segundos in medicion.sql]
+                self.logger.warning('\n'.join(lineas))
+
+    # ----- Exportación -----
+
+    def exportar(self, indicadores=None):
+        """Texto en formato de exposición de Prometheus.
+
+        `indicadores` es un diccionario nombre -> (valor, ayuda) o
+        (valor, ayuda, tipo) con valores del pool y las cachés; sin tipo se
+        publican como gauge, los acumulados desde el inicio llevan 'counter'.
+        """
+        p = self.prefijo
+        lineas = []
+        with self._candado:
+            lineas.append(f'# HELP {p}_http_request_duration_seconds Latencia por ruta')
+            lineas.append(f'# TYPE {p}_http_request_duration_seconds histogram')
+            for (ruta, metodo), histograma in sorted(self._latencia.items()):
+                lineas.extend(histograma.lineas(
+                    f'{p}_http_request_duration_seconds', f'route="{ruta}",method="{metodo}"'))
+
+            lineas.append(f'# HELP {p}_http_requests_total Peticiones por ruta y código')
+            lineas.append(f'# TYPE {p}_http_requests_total counter')
+            for (ruta, metodo, estado), total in sorted(self._peticiones.items()):
+                lineas.append(f'{p}_http_requests_total{{route="{ruta}",method="{metodo}",status="{estado}"}} {total}')
+
+            contadores = (
+                ('db_connections_total', 'Conexiones tomadas del pool', self._conexiones),
+                ('db_queries_total', 'Consultas SQL ejecutadas', self._consultas),
+                ('db_rows_fetched_total', 'Filas leídas de la base de datos', self._filas),
+            )
+            for nombre, ayuda, datos in contadores:
+                lineas.append(f'# HELP {p}_{nombre} {ayuda}')
+                lineas.append(f'# TYPE {p}_{nombre} counter')
+                for (ruta, metodo), total in sorted(datos.items()):
+                    lineas.append(f'{p}_{nombre}{{route="{ruta}",method="{metodo}"}} {total}')
+
+            lineas.append(f'# HELP {p}_render_duration_seconds Tiempo en render_page por ruta')
+            lineas.append(f'# TYPE {p}_render_duration_seconds histogram')
+            for (ruta, metodo), histograma in sorted(self._render.items()):
+                lineas.extend(histograma.lineas(
+                    f'{p}_render_duration_seconds', f'route="{ruta}",method="{metodo}"'))
+
+            lineas.append(f'# HELP {p}_slow_requests_total Peticiones sobre el umbral de lentitud')
+            lineas.append(f'# TYPE {p}_slow_requests_total counter')
+            lineas.append(f'{p}_slow_requests_total {self.peticiones_lentas}')
+
+        for nombre, (valor, ayuda, *tipo) in sorted((indicadores or {}).items()):
+            lineas.append(f'# HELP {p}_{nombre} {ayuda}')
+            lineas.append(f'# TYPE {p}_{nombre} {tipo[0] if tipo else "gauge"}')
+            lineas.append(f'{p}_{nombre} {valor}')
+
+        return '\n'.join(lineas) + '\n'
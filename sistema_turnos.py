@@ -5,8 +5,9 @@
 import os
 import sys
 from datetime import datetime
-from models import Paciente, Medico, Cita as Turno, InventarioCitas as InventarioTurnos
+from models_backup import Paciente, Medico, Cita as Turno, InventarioCitas as InventarioTurnos
 from database import crear_base_datos, insertar_datos_prueba
+from importar_csv import ERRORES_LECTURA, importar
 
 class SistemaTurnosConsole:
     '''Clase principal del sistema con interfaz de consola'''
@@ -54,7 +55,8 @@ class SistemaTurnosConsole:
         print("  3. 📅 Gestión de Turnos")
         print("  4. 📊 Reportes y Estadísticas")
         print("  5. 🗄️  Mostrar Todo el Inventario")
-        print("  6. ❌ Salir")
+        print("  6. 📥 Importar desde CSV")
+        print("  7. ❌ Salir")
         print("-"*60)
     
     def menu_pacientes(self):
@@ -283,26 +285,21 @@ class SistemaTurnosConsole:
         email = input("Email [opcional]: ") or ""
         
         import sqlite3
-        conn = sqlite3.connect('turnos.db')
-        cursor = conn.cursor()
         
         try:
-            cursor.execute('''
-                INSERT INTO medicos (cedula, nombre, apellido, especialidad, telefono, email)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (cedula, nombre, apellido, especialidad, telefono, email))
-            
-            conn.commit()
+            with self.inventario.transaccion() as cursor:
+                cursor.execute('''
+                    INSERT INTO medicos (cedula, nombre, apellido, especialidad, telefono, email)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (cedula, nombre, apellido, especialidad, telefono, email))
             medico_id = cursor.lastrowid
             print(f"✅ Médico registrado con ID: {medico_id}")
             
-            # Recargar inventario
-            self.inventario.cargar_datos()
+            # Recargar inventario (solo lo que cambió)
+            self.inventario.cargar_datos(incremental=True)
             
         except sqlite3.Error as e:
             print(f"❌ Error al registrar médico: {e}")
-        finally:
-            conn.close()
         
         self.pausar()
     
@@ -454,7 +451,12 @@ class SistemaTurnosConsole:
         print("-"*40)
         
         fecha = input("Ingrese fecha (YYYY-MM-DD): ")
-        resultados = self.inventario.buscar_citas_por_fecha(fecha)
+        hasta = input("Hasta fecha (Enter para un solo día): ").strip()
+        if hasta:
+            resultados = self.inventario.buscar_citas_por_rango(fecha, hasta)
+            fecha = f"{fecha} a {hasta}"
+        else:
+            resultados = self.inventario.buscar_citas_por_fecha(fecha)
         
         if resultados:
             print(f"\n📋 Turnos para {fecha}:")
@@ -462,7 +464,7 @@ class SistemaTurnosConsole:
                 paciente = self.inventario.pacientes.get(turno.paciente_id)
                 medico = self.inventario.medicos.get(turno.medico_id)
                 print(f"\n  ID: {turno.id}")
-                print(f"  Hora: {turno.hora}")
+                print(f"  Fecha: {turno.fecha} {turno.hora}")
                 print(f"  Paciente: {paciente.nombre_completo() if paciente else 'N/A'}")
                 print(f"  Médico: {medico.nombre_completo() if medico else 'N/A'}")
                 print(f"  Estado: {turno.estado}")
@@ -504,12 +506,15 @@ class SistemaTurnosConsole:
         print("-"*60)
         
         if self.inventario.citas:
-            turnos_ordenados = sorted(
-                self.inventario.citas.values(),
-                key=lambda t: (t.fecha, t.hora)
-            )
+            # Próximos 10 desde hoy; si no hay, los 10 más recientes
+            turnos = self.inventario.proximas_citas(10)
+            if turnos:
+                print("⏭️ Próximos turnos:")
+            else:
+                turnos = self.inventario.ultimas_citas(10)
+                print("⏮️ No hay turnos desde hoy. Últimos turnos:")
             
-            for turno in turnos_ordenados[:10]:
+            for turno in turnos:
                 paciente = self.inventario.pacientes.get(turno.paciente_id)
                 medico = self.inventario.medicos.get(turno.medico_id)
                 
@@ -520,8 +525,8 @@ class SistemaTurnosConsole:
                 print(f"  Estado: {turno.estado}")
                 print("-"*30)
             
-            if len(self.inventario.citas) > 10:
-                print(f"... y {len(self.inventario.citas) - 10} turno(s) más")
+            if len(self.inventario.citas) > len(turnos):
+                print(f"... y {len(self.inventario.citas) - len(turnos)} turno(s) más")
         else:
             print("  No hay turnos registrados")
         
@@ -603,14 +608,17 @@ class SistemaTurnosConsole:
                 print(f"  {estado}: {cantidad}")
             
             print("\n  1. 📋 Reporte de turnos por médico")
-            print("  2. 🔙 Volver al menú principal")
+            print("  2. 📆 Reporte mensual por médico y estado")
+            print("  3. 🔙 Volver al menú principal")
             print("-"*60)
             
-            opcion = input("Seleccione una opción (1-2): ")
+            opcion = input("Seleccione una opción (1-3): ")
             
             if opcion == '1':
                 self.reporte_turnos_por_medico()
             elif opcion == '2':
+                self.reporte_mensual()
+            elif opcion == '3':
                 break
             else:
                 print("❌ Opción inválida")
@@ -630,12 +638,16 @@ class SistemaTurnosConsole:
                 return
             
             medico = self.inventario.medicos[medico_id]
-            turnos = self.inventario.reporte_citas_por_medico(medico_id)
+            desde = input("Desde fecha (YYYY-MM-DD, Enter para todas): ").strip() or None
+            hasta = input("Hasta fecha (YYYY-MM-DD, Enter para todas): ").strip() or None
+            estado = input(f"Estado ({', '.join(Turno.ESTADOS)}, Enter para todos): ").strip() or None
+            turnos = self.inventario.reporte_citas_por_medico(medico_id, desde, hasta, estado)
             
-            print(f"\n📊 Turnos para {medico.nombre_completo()}:")
+            print(f"\n📊 Turnos para {medico.nombre_completo()} ({len(turnos)}):")
             if turnos:
+                pacientes = self.inventario.pacientes
                 for turno in turnos:
-                    paciente = self.inventario.pacientes.get(turno.paciente_id)
+                    paciente = pacientes.get(turno.paciente_id)
                     print(f"\n  Fecha: {turno.fecha} {turno.hora}")
                     print(f"  Paciente: {paciente.nombre_completo() if paciente else 'N/A'}")
                     print(f"  Estado: {turno.estado}")
@@ -647,34 +659,94 @@ class SistemaTurnosConsole:
         
         self.pausar()
     
+    def reporte_mensual(self):
+        '''Cantidad de turnos por mes, médico y estado'''
+        self.limpiar_pantalla()
+        print("\n📆 REPORTE MENSUAL POR MÉDICO Y ESTADO")
+        print("-"*40)
+        
+        try:
+            medico_id = input("ID del médico (Enter para todos): ").strip()
+            medico_id = int(medico_id) if medico_id else None
+        except ValueError:
+            print("❌ ID inválido")
+            self.pausar()
+            return
+        desde = input("Desde fecha (YYYY-MM-DD, Enter para todas): ").strip() or None
+        hasta = input("Hasta fecha (YYYY-MM-DD, Enter para todas): ").strip() or None
+        
+        filas = self.inventario.reporte_mensual(desde, hasta, medico_id)
+        if not filas:
+            print("  No hay turnos en ese período")
+        mes_actual = None
+        for mes, id_medico, estado, cantidad in filas:
+            if mes != mes_actual:
+                mes_actual = mes
+                print(f"\n  {mes}:")
+            medico = self.inventario.medicos.get(id_medico)
+            nombre = medico.nombre_completo() if medico else f"Médico {id_medico}"
+            print(f"    {nombre} - {estado}: {cantidad}")
+        
+        self.pausar()
+    
     def mostrar_inventario_completo(self):
         '''Muestra todo el inventario'''
         self.limpiar_pantalla()
         self.inventario.mostrar_todo()
         self.pausar()
     
+    def importar_csv(self):
+        '''Importa pacientes, médicos o turnos desde un archivo CSV'''
+        self.limpiar_pantalla()
+        print("\n📥 IMPORTACIÓN DESDE CSV")
+        print("-"*40)
+        print("  1. Pacientes (cedula, nombre, apellido, fecha_nacimiento, telefono, direccion, email)")
+        print("  2. Médicos (cedula, nombre, apellido, especialidad, telefono, email)")
+        print("  3. Turnos (paciente_id o paciente_cedula, medico_id o medico_cedula, fecha, hora, motivo, estado)")
+        
+        tipos = {'1': 'pacientes', '2': 'medicos', '3': 'citas'}
+        tipo = tipos.get(input("\nSeleccione qué importar (1-3): ").strip())
+        if tipo is None:
+            print("❌ Opción inválida")
+            self.pausar()
+            return
+        
+        ruta = input("Ruta del archivo CSV: ").strip()
+        try:
+            importar(self.inventario, tipo, ruta)
+        except ERRORES_LECTURA as e:
+            print(f"❌ No se pudo leer el archivo: {e}")
+        
+        self.pausar()
+    
     def ejecutar(self):
         '''Ejecuta el bucle principal del sistema'''
-        while True:
-            self.mostrar_menu_principal()
-            opcion = input("Seleccione una opción (1-6): ")
-            
-            if opcion == '1':
-                self.menu_pacientes()
-            elif opcion == '2':
-                self.menu_medicos()
-            elif opcion == '3':
-                self.menu_turnos()
-            elif opcion == '4':
-                self.menu_reportes()
-            elif opcion == '5':
-                self.mostrar_inventario_completo()
-            elif opcion == '6':
-                print("\n👋 ¡Gracias por usar el Sistema de Turnos del Patronato!")
-                break
-            else:
-                print("❌ Opción inválida")
-                self.pausar()
+        try:
+            while True:
+                self.mostrar_menu_principal()
+                opcion = input("Seleccione una opción (1-7): ")
+            
+                if opcion == '1':
+                    self.menu_pacientes()
+                elif opcion == '2':
+                    self.menu_medicos()
+                elif opcion == '3':
+                    self.menu_turnos()
+                elif opcion == '4':
+                    self.menu_reportes()
+                elif opcion == '5':
+                    self.mostrar_inventario_completo()
+                elif opcion == '6':
+                    self.importar_csv()
+                elif opcion == '7':
+                    print("\n👋 ¡Gracias por usar el Sistema de Turnos del Patronato!")
+                    break
+                else:
+                    print("❌ Opción inválida")
+                    self.pausar()
+        finally:
+            # Incorpora el WAL a la base de datos y libera la conexión
+            self.inventario.cerrar()
 
 if __name__ == "__main__":
     sistema = SistemaTurnosConsole()
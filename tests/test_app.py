@@ -0,0 +1,144 @@
+﻿# tests/test_app.py
+# Rutas y ganchos de la aplicación web (app.py) sin servidor MySQL
+#
+# Las conexiones se reemplazan por objetos simulados; al importar app.py
+# solo se informa que no hay MySQL (DB_VERIFICAR_ESQUEMA).
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import app
+except ImportError:  # Flask y el resto de requirements.txt no instalados
+    app = None
+
+
+@unittest.skipIf(app is None, "las dependencias de la aplicación web no están instaladas")
+class PruebaUsuarios(unittest.TestCase):
+
+    def test_error_de_base_de_datos_queda_en_el_log(self):
+        app.cache_usuarios.invalidar('99')
+        with mock.patch.object(app, 'get_db', side_effect=app.PoolAgotado('sin conexiones')):
+            with self.assertLogs(app.app.logger, 'ERROR') as registro:
+                self.assertIsNone(app.load_user('99'))
+        self.assertIn('No se pudo cargar el usuario 99', registro.output[0])
+
+    def test_usuario_en_cache_no_consulta(self):
+        usuario = app.Usuario(7, 'Ana', 'ana@mail.com', 'hash')
+        app.cache_usuarios.guardar('7', usuario)
+        with mock.patch.object(app, 'get_db', side_effect=AssertionError('no debe consultar')):
+            self.assertIs(app.load_user('7'), usuario)
+        app.invalidar_usuario(7)
+
+
+class CursorFalso:
+    """Cursor que registra las consultas y devuelve filas preparadas"""
+
+    def __init__(self, filas):
+        self.filas = filas
+        self.consultas = []
+
+    def execute(self, sql, params=()):
+        self.consultas.append((' '.join(sql.split()), params))
+
+    def fetchall(self):
+        return list(self.filas)
+
+    def fetchone(self):
+        return self.filas[0] if self.filas else None
+
+    def close(self):
+        pass
+
+
+class ConexionFalsa:
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self, *args, **kwargs):
+        return self._cursor
+
+    def close(self):
+        pass
+
+
+@unittest.skipIf(app is None, "las dependencias de la aplicación web no están instaladas")
+class PruebaApiTurnos(unittest.TestCase):
+
+    TURNO = {
+        'id': 5, 'nombre_completo': 'Ana Paz', 'cedula': '1101122334', 'telefono': '0991234567',
+        'servicio_id': 1, 'servicio_nombre': 'Medicina General', 'fecha': '2030-01-15',
+        'hora': '09:00:00', 'motivo': 'Control', 'estado': 'Programado', 'fecha_creacion': '2029-12-01',
+    }
+
+    def setUp(self):
+        app.cache_usuarios.guardar('1', app.Usuario(1, 'Ana', 'ana@mail.com', 'hash'))
+        self.addCleanup(app.invalidar_usuario, 1)
+        self.cursor = CursorFalso([dict(self.TURNO)])
+        parche = mock.patch.object(app, 'get_db', side_effect=lambda: ConexionFalsa(self.cursor))
+        parche.start()
+        self.addCleanup(parche.stop)
+        self.cliente = app.app.test_client()
+        with self.cliente.session_transaction() as sesion:
+            sesion['_user_id'] = '1'
+            sesion['_fresh'] = True
+
+    def test_sin_sesion_responde_401(self):
+        respuesta = app.app.test_client().get('/api/turnos')
+        self.assertEqual(respuesta.status_code, 401)
+        self.assertEqual(respuesta.get_json(), {'error': 'Debe iniciar sesión'})
+
+    def test_etag_y_304(self):
+        respuesta = self.cliente.get('/api/turnos')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.get_json()['turnos'][0]['id'], 5)
+        etag = respuesta.headers['ETag']
+
+        repetida = self.cliente.get('/api/turnos', headers={'If-None-Match': etag})
+        self.assertEqual(repetida.status_code, 304)
+        self.assertEqual(repetida.headers['ETag'], etag)
+        self.assertEqual(repetida.data, b'')
+
+        self.cursor.filas[0] = dict(self.TURNO, estado='Cancelado')
+        cambiada = self.cliente.get('/api/turnos', headers={'If-None-Match': etag})
+        self.assertEqual(cambiada.status_code, 200)
+        self.assertNotEqual(cambiada.headers['ETag'], etag)
+
+    def test_campos_permitidos(self):
+        # Solo se leen de la base de datos las columnas pedidas
+        self.cursor.filas = [{'estado': 'Programado', 'fecha': '2030-01-15'}]
+        respuesta = self.cliente.get('/api/turnos/5?campos=estado,fecha')
+        self.assertEqual(respuesta.get_json(), {'estado': 'Programado', 'fecha': '2030-01-15'})
+        self.assertEqual(self.cursor.consultas[-1][0],
+                         'SELECT estado, fecha FROM turnos WHERE id = %s AND usuario_id = %s')
+
+        self.cursor.filas = [dict(self.TURNO)]
+        respuesta = self.cliente.get('/api/turnos?campos=id,hora')
+        self.assertEqual(respuesta.get_json()['turnos'], [{'id': 5, 'hora': '09:00:00'}])
+
+    def test_campos_fuera_de_la_lista(self):
+        consultas = len(self.cursor.consultas)
+        for ruta in ('/api/turnos?campos=id,password', '/api/turnos/5?campos=usuario_id'):
+            respuesta = self.cliente.get(ruta)
+            self.assertEqual(respuesta.status_code, 400)
+            self.assertIn('Campos no válidos', respuesta.get_json()['error'])
+        self.assertEqual(len(self.cursor.consultas), consultas)
+
+    def test_crear_sin_datos_del_paciente_responde_400(self):
+        base = {'servicio_id': 1, 'fecha': '2030-01-15', 'hora': '09:00',
+                'nombre_completo': 'Ana Paz', 'cedula': '1101122334', 'telefono': '0991234567'}
+        for campo in ('nombre_completo', 'cedula', 'telefono'):
+            for datos in ({k: v for k, v in base.items() if k != campo}, dict(base, **{campo: '  '})):
+                respuesta = self.cliente.post('/api/turnos', json=datos)
+                self.assertEqual(respuesta.status_code, 400, campo)
+                self.assertIn('obligatorio', respuesta.get_json()['error'])
+        self.assertEqual(self.cursor.consultas, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+﻿# tests/test_cache.py
+# Caché LRU con tiempo de vida (services/cache.py)
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.cache import CacheTTL
+
+
+class PruebaCacheTTL(unittest.TestCase):
+
+    def test_expira_tras_el_ttl(self):
+        cache = CacheTTL(max_items=10, ttl=300)
+        with mock.patch('services.cache.time.monotonic', return_value=1000.0):
+            cache.guardar('1', 'Ana')
+        with mock.patch('services.cache.time.monotonic', return_value=1299.0):
+            self.assertEqual(cache.obtener('1'), 'Ana')
+        with mock.patch('services.cache.time.monotonic', return_value=1300.0):
+            self.assertIsNone(cache.obtener('1'))
+        self.assertEqual(cache.estadisticas()['entradas'], 0)
+
+    def test_expulsa_la_menos_usada(self):
+        cache = CacheTTL(max_items=2, ttl=300)
+        cache.guardar('a', 1)
+        cache.guardar('b', 2)
+        cache.obtener('a')  # 'b' pasa a ser la menos usada
+        cache.guardar('c', 3)
+        self.assertIsNone(cache.obtener('b'))
+        self.assertEqual((cache.obtener('a'), cache.obtener('c')), (1, 3))
+        self.assertEqual(cache.estadisticas()['expulsiones'], 1)
+
+    def test_guardar_de_nuevo_renueva(self):
+        cache = CacheTTL(max_items=2, ttl=300)
+        cache.guardar('a', 1)
+        cache.guardar('b', 2)
+        cache.guardar('a', 10)
+        cache.guardar('c', 3)
+        self.assertEqual(cache.obtener('a'), 10)
+        self.assertIsNone(cache.obtener('b'))
+
+    def test_invalidar_y_estadisticas(self):
+        cache = CacheTTL(max_items=10, ttl=300)
+        cache.guardar('a', 1)
+        cache.guardar('b', 2)
+        cache.invalidar('a')
+        cache.invalidar('no-existe')
+        self.assertIsNone(cache.obtener('a'))
+        self.assertEqual(cache.obtener('b'), 2)
+        cache.limpiar()
+        estadisticas = cache.estadisticas()
+        self.assertEqual((estadisticas['aciertos'], estadisticas['fallos']), (1, 1))
+        self.assertEqual(estadisticas['tasa_aciertos'], 0.5)
+        self.assertEqual(estadisticas['invalidaciones'], 2)
+        self.assertEqual(estadisticas['entradas'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
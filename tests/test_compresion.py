@@ -0,0 +1,119 @@
+﻿# tests/test_compresion.py
+# Negociación y compresión de respuestas (services/compresion.py)
+
+import gzip
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from flask import Flask, Response, request
+    from werkzeug.http import parse_accept_header
+    from services.compresion import CompresorRespuestas, brotli
+except ImportError:  # Flask no instalado
+    Flask = None
+
+CUERPO = '<p>' + 'Turno programado para el lunes. ' * 40 + '</p>'
+
+
+def aceptadas(encabezado):
+    return parse_accept_header(encabezado)
+
+
+def crear_app(compresor):
+    """Una vista condicional con ETag y el compresor como en app.py"""
+    app = Flask(__name__)
+
+    @app.after_request
+    def comprimir(response):
+        return compresor.procesar(request, response)
+
+    @app.route('/pagina')
+    def pagina():
+        response = Response(CUERPO, mimetype='text/html')
+        response.set_etag('v1')
+        return response.make_conditional(request)
+
+    @app.route('/corto')
+    def corto():
+        return Response('<p>hola</p>', mimetype='text/html')
+
+    @app.route('/imagen')
+    def imagen():
+        return Response(b'\x89PNG' * 500, mimetype='image/png')
+
+    return app
+
+
+@unittest.skipIf(Flask is None, "Flask no está instalado")
+class PruebaElegir(unittest.TestCase):
+
+    def setUp(self):
+        self.compresor = CompresorRespuestas()
+
+    def test_gzip_y_ninguna(self):
+        self.assertEqual(self.compresor.elegir(aceptadas('gzip, deflate')), 'gzip')
+        self.assertIsNone(self.compresor.elegir(aceptadas('deflate')))
+        self.assertIsNone(self.compresor.elegir(aceptadas('')))
+        self.assertIsNone(self.compresor.elegir(aceptadas('gzip;q=0')))
+
+    def test_ofrecidas(self):
+        self.assertEqual(self.compresor.elegir(aceptadas('br, gzip'), {'gzip': b''}), 'gzip')
+        self.assertIsNone(self.compresor.elegir(aceptadas('br, gzip'), {}))
+
+    @unittest.skipIf(brotli is None, "brotli no está instalado")
+    def test_prefiere_brotli_salvo_por_q(self):
+        self.assertEqual(self.compresor.elegir(aceptadas('gzip, deflate, br')), 'br')
+        self.assertEqual(self.compresor.elegir(aceptadas('br;q=0.5, gzip')), 'gzip')
+
+
+@unittest.skipIf(Flask is None, "Flask no está instalado")
+class PruebaProcesar(unittest.TestCase):
+
+    def setUp(self):
+        self.compresor = CompresorRespuestas()
+        self.cliente = crear_app(self.compresor).test_client()
+
+    def test_gzip_con_etag_debil(self):
+        respuesta = self.cliente.get('/pagina', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(respuesta.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(respuesta.headers['ETag'], 'W/"v1"')
+        self.assertIn('Accept-Encoding', respuesta.headers['Vary'])
+        self.assertEqual(gzip.decompress(respuesta.data).decode(), CUERPO)
+        self.assertEqual(self.compresor.estadisticas()['respuestas_comprimidas'], 1)
+
+    def test_304_con_el_mismo_validador(self):
+        respuesta = self.cliente.get('/pagina', headers={'Accept-Encoding': 'gzip'})
+        etag = respuesta.headers['ETag']
+        repetida = self.cliente.get('/pagina', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        self.assertEqual(repetida.status_code, 304)
+        self.assertEqual(repetida.headers['ETag'], etag)
+        # Sin comprimir, el validador sigue siendo fuerte
+        plano = self.cliente.get('/pagina', headers={'If-None-Match': '"v1"'})
+        self.assertEqual((plano.status_code, plano.headers['ETag']), (304, '"v1"'))
+
+    def test_sin_accept_encoding(self):
+        respuesta = self.cliente.get('/pagina')
+        self.assertNotIn('Content-Encoding', respuesta.headers)
+        self.assertEqual(respuesta.headers['ETag'], '"v1"')
+
+    def test_cuerpo_corto_o_tipo_no_comprimible(self):
+        corto = self.cliente.get('/corto', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', corto.headers)
+        self.assertEqual(corto.data, b'<p>hola</p>')
+        imagen = self.cliente.get('/imagen', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', imagen.headers)
+        self.assertNotIn('Vary', imagen.headers)
+        self.assertEqual(self.compresor.estadisticas()['respuestas_sin_comprimir'], 1)
+
+    @unittest.skipIf(brotli is None, "brotli no está instalado")
+    def test_brotli(self):
+        respuesta = self.cliente.get('/pagina', headers={'Accept-Encoding': 'gzip, br'})
+        self.assertEqual(respuesta.headers['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(respuesta.data).decode(), CUERPO)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+﻿# tests/test_contadores.py
+# Contadores del tablero de inicio (services/contadores.py)
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.contadores import ContadoresTablero
+
+
+class PruebaContadores(unittest.TestCase):
+
+    def setUp(self):
+        self.base = {
+            'usuarios': 3,
+            'servicios': 2,
+            'turnos': [('Programado', 1, 4), ('Cancelado', 1, 1), ('Programado', 2, 2)],
+        }
+        self.cargas = 0
+
+        def cargar():
+            self.cargas += 1
+            return self.base
+
+        self.contadores = ContadoresTablero(cargar, intervalo=60)
+
+    def test_resumen_desde_la_base(self):
+        self.assertEqual(self.contadores.resumen(), {
+            'usuarios': 3,
+            'servicios': 2,
+            'turnos': 7,
+            'por_estado': {'Programado': 6, 'Cancelado': 1},
+            'por_servicio': {1: 5, 2: 2},
+        })
+
+    def test_cambios_incrementales_sin_consultar(self):
+        self.contadores.resumen()
+        self.contadores.turno_creado(2)
+        self.contadores.turno_cambio_estado(1, 'Programado', 'Cancelado')
+        self.contadores.usuario_registrado()
+        resumen = self.contadores.resumen()
+        self.assertEqual(self.cargas, 1)
+        self.assertEqual(resumen['usuarios'], 4)
+        self.assertEqual(resumen['por_estado'], {'Programado': 6, 'Cancelado': 2})
+        self.assertEqual(resumen['por_servicio'], {1: 5, 2: 3})
+
+    def test_no_baja_de_cero(self):
+        self.contadores.resumen()
+        self.contadores.turno_cambio_estado(2, 'Confirmado', 'Cancelado')
+        resumen = self.contadores.resumen()
+        self.assertEqual(resumen['por_estado'].get('Confirmado', 0), 0)
+        self.assertEqual(resumen['por_estado']['Cancelado'], 2)
+
+    def test_reconcilia_tras_el_intervalo(self):
+        with mock.patch('services.contadores.time.monotonic', return_value=1000.0):
+            self.contadores.resumen()
+            self.contadores.turno_creado(1)
+        self.base = dict(self.base, usuarios=10)
+        with mock.patch('services.contadores.time.monotonic', return_value=1059.0):
+            self.assertEqual(self.contadores.resumen()['turnos'], 8)
+        with mock.patch('services.contadores.time.monotonic', return_value=1060.0):
+            resumen = self.contadores.resumen()
+        # La base de datos manda: el turno creado en memoria se descarta
+        self.assertEqual((resumen['turnos'], resumen['usuarios']), (7, 10))
+        self.assertEqual(self.contadores.reconciliaciones, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
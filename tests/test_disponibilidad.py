@@ -0,0 +1,80 @@
+﻿# tests/test_disponibilidad.py
+# Agenda de horarios por servicio y día (services/disponibilidad.py)
+
+import os
+import sys
+import unittest
+from datetime import timedelta
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.disponibilidad import AgendaServicios, DiaAgenda, a_hora, a_minutos
+
+APERTURA, CIERRE = 8 * 60, 12 * 60
+
+
+class PruebaDiaAgenda(unittest.TestCase):
+
+    def test_conversion_de_horas(self):
+        self.assertEqual(a_minutos('08:30'), 510)
+        self.assertEqual(a_minutos('08:30:59'), 510)
+        self.assertEqual(a_minutos(timedelta(hours=9, minutes=15)), 555)
+        self.assertEqual(a_hora(555), '09:15')
+        for hora in ('24:00', '8', '08:60', 'x:y'):
+            with self.assertRaises(ValueError):
+                a_minutos(hora)
+
+    def test_solapamientos(self):
+        # Turnos de 30 minutos a las 09:00 y 10:00
+        dia = DiaAgenda(30, [(1, 540), (2, 600)])
+        for inicio in (540, 520, 550, 580, 590, 629):
+            self.assertTrue(dia.conflicto(inicio), a_hora(inicio))
+        for inicio in (510, 570, 630, 480):
+            self.assertFalse(dia.conflicto(inicio), a_hora(inicio))
+
+    def test_libres_respeta_duracion_y_cierre(self):
+        dia = DiaAgenda(30, [(1, 540), (2, 615)])
+        libres = [a_hora(m) for m in dia.libres(APERTURA, CIERRE)]
+        self.assertEqual(libres, ['08:00', '08:30', '09:30', '11:00', '11:30'])
+        self.assertEqual(DiaAgenda(45).libres(APERTURA, 9 * 60 + 30), [480, 525])
+
+    def test_ocupar_y_liberar(self):
+        dia = DiaAgenda(30)
+        dia.ocupar(540, 7)
+        dia.ocupar(540, 7)  # el día pudo recargarse ya con el turno
+        self.assertTrue(dia.conflicto(540))
+        self.assertTrue(dia.liberar(7))
+        self.assertFalse(dia.liberar(7))
+        self.assertFalse(dia.conflicto(540))
+        self.assertEqual(len(dia.libres(APERTURA, CIERRE)), 8)
+
+
+class PruebaAgendaServicios(unittest.TestCase):
+
+    def test_cache_con_ttl(self):
+        agenda = AgendaServicios(ttl=60)
+        with mock.patch('services.disponibilidad.time.monotonic', return_value=1000.0):
+            agenda.reemplazar_dia(1, '2030-01-15', 30, [(1, 540)])
+        with mock.patch('services.disponibilidad.time.monotonic', return_value=1059.0):
+            self.assertIsNotNone(agenda.dia(1, '2030-01-15'))
+            self.assertIsNone(agenda.dia(2, '2030-01-15'))
+        with mock.patch('services.disponibilidad.time.monotonic', return_value=1060.0):
+            self.assertIsNone(agenda.dia(1, '2030-01-15'))
+
+    def test_ocupar_y_liberar_solo_dias_en_cache(self):
+        agenda = AgendaServicios(ttl=60)
+        agenda.ocupar(1, '2030-01-15', 540, 9)  # no está en caché: no hace nada
+        self.assertIsNone(agenda.dia(1, '2030-01-15'))
+
+        dia = agenda.reemplazar_dia(1, '2030-01-15', 30, [])
+        agenda.ocupar(1, '2030-01-15', 540, 9)
+        self.assertTrue(dia.conflicto(540))
+        agenda.liberar(1, '2030-01-15', 9)
+        self.assertFalse(dia.conflicto(540))
+        agenda.invalidar(1, '2030-01-15')
+        self.assertIsNone(agenda.dia(1, '2030-01-15'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+﻿# tests/test_hashing.py
+# Hash de contraseñas con cupos acotados (services/hashing.py)
+
+import os
+import sys
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash
+
+from services.hashing import HasheadorContrasenas, HasheadorOcupado, normalizar_metodo
+
+# Pocas iteraciones para que las pruebas no tarden
+METODO = 'pbkdf2:sha256:1000'
+
+
+class PruebaHasheador(unittest.TestCase):
+
+    def test_normalizar_metodo(self):
+        self.assertEqual(normalizar_metodo('scrypt'), 'scrypt:32768:8:1')
+        self.assertEqual(normalizar_metodo('scrypt:16384'), 'scrypt:16384:8:1')
+        self.assertEqual(normalizar_metodo('pbkdf2:sha256:1000'), 'pbkdf2:sha256:1000')
+        with self.assertRaises(ValueError):
+            normalizar_metodo('md5')
+
+    def test_generar_y_verificar(self):
+        hasheador = HasheadorContrasenas(METODO)
+        password_hash = hasheador.generar('clave123')
+        self.assertTrue(password_hash.startswith(METODO + '$'))
+        self.assertEqual(hasheador.verificar(password_hash, 'clave123'), (True, None))
+        self.assertEqual(hasheador.verificar(password_hash, 'otra'), (False, None))
+
+    def test_rechaza_sin_cupos(self):
+        hasheador = HasheadorContrasenas(METODO, trabajadores=1, max_pendientes=0)
+        liberar = threading.Event()
+        empezado = threading.Event()
+
+        def hash_lento(password, metodo):
+            empezado.set()
+            liberar.wait(5)
+            return 'hash'
+
+        with mock.patch('services.hashing.generate_password_hash', hash_lento):
+            hilo = threading.Thread(target=hasheador.generar, args=('x',))
+            hilo.start()
+            # El único cupo está ocupado: el siguiente se rechaza sin esperar
+            self.assertTrue(empezado.wait(5))
+            with self.assertRaises(HasheadorOcupado):
+                hasheador.generar('x')
+            liberar.set()
+            hilo.join(5)
+        self.assertEqual(hasheador.estadisticas()['rechazados'], 1)
+        self.assertEqual(hasheador.estadisticas()['generados'], 1)
+
+    def test_actualiza_hash_antiguo(self):
+        hasheador = HasheadorContrasenas(METODO)
+        antiguo = generate_password_hash('clave123', 'pbkdf2:sha256:500')
+        self.assertTrue(hasheador.necesita_actualizar(antiguo))
+        valida, nuevo = hasheador.verificar(antiguo, 'clave123')
+        self.assertTrue(valida)
+        self.assertTrue(nuevo.startswith(METODO + '$'))
+        self.assertFalse(hasheador.necesita_actualizar(nuevo))
+        # Con la contraseña incorrecta no se genera nada
+        self.assertEqual(hasheador.verificar(antiguo, 'otra'), (False, None))
+        self.assertEqual(hasheador.estadisticas()['actualizados'], 1)
+
+    def test_actualizacion_ocupada_no_rechaza(self):
+        hasheador = HasheadorContrasenas(METODO)
+        antiguo = generate_password_hash('clave123', 'pbkdf2:sha256:500')
+        with mock.patch.object(hasheador, 'generar', side_effect=HasheadorOcupado):
+            self.assertEqual(hasheador.verificar(antiguo, 'clave123'), (True, None))
+        self.assertEqual(hasheador.estadisticas()['actualizados'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
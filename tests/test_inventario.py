@@ -0,0 +1,271 @@
+﻿# tests/test_inventario.py
+# Pruebas del inventario de la consola (models_backup): índices de citas,
+# búsqueda de pacientes, almacén columnar e importación masiva
+#
+# Uso:
+#   python -m unittest discover tests
+#   python -m pytest tests
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import unittest
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import models_backup
+from models_backup import Cita, IndiceBusquedaPacientes, IndiceFechas, InventarioCitas, ListaCronologica, Paciente
+
+HORAS = [f'{h:02d}:{m:02d}' for h in range(8, 17) for m in (0, 30)]
+
+
+def citas_aleatorias(n, semilla=2024, medicos=5, pacientes=5):
+    azar = random.Random(semilla)
+    inicio = date(2024, 1, 1)
+    return [Cita(i, azar.randint(1, pacientes), azar.randint(1, medicos),
+                 (inicio + timedelta(days=azar.randint(0, 90))).isoformat(),
+                 azar.choice(HORAS), 'Control', azar.choice(sorted(Cita.ESTADOS)))
+            for i in range(1, n + 1)]
+
+
+def cronologico(citas):
+    return sorted(citas, key=models_backup.clave_cronologica)
+
+
+class PruebaIndices(unittest.TestCase):
+    """Índices de citas contra un recorrido completo"""
+
+    def setUp(self):
+        self.citas = citas_aleatorias(500)
+
+    def test_lista_cronologica_en_orden(self):
+        lista = ListaCronologica()
+        for cita in self.citas[:250]:
+            lista.agregar(cita)
+        lista.agregar_varios(self.citas[250:])
+        self.assertEqual(list(lista), cronologico(self.citas))
+
+        for cita in self.citas[::3]:
+            lista.quitar(cita)
+        self.assertEqual(list(lista), cronologico(c for c in self.citas if c not in self.citas[::3]))
+
+    def test_rango_siguientes_y_anteriores(self):
+        lista = ListaCronologica()
+        lista.agregar_varios(self.citas)
+        ordenadas = cronologico(self.citas)
+        desde, hasta = '2024-02-01', '2024-02-15'
+        inicio, fin = models_backup.a_ordinal(desde), models_backup.a_ordinal(hasta)
+
+        self.assertEqual(list(lista.rango(desde, hasta)),
+                         [c for c in ordenadas if inicio <= c.dia <= fin])
+        self.assertEqual(list(lista.rango(desde, hasta, 'Cancelada')),
+                         [c for c in ordenadas if inicio <= c.dia <= fin and c.estado == 'Cancelada'])
+        self.assertEqual(lista.siguientes(desde, 7), [c for c in ordenadas if c.dia >= inicio][:7])
+        self.assertEqual(lista.anteriores(hasta, 7), [c for c in reversed(ordenadas) if c.dia <= fin][:7])
+        self.assertEqual(lista.anteriores(None, 3), ordenadas[::-1][:3])
+
+    def test_indice_fechas(self):
+        indice = IndiceFechas()
+        for cita in self.citas[:100]:
+            indice.agregar(cita)
+        indice.agregar_varios(self.citas[100:])
+        por_hora = models_backup.clave_hora
+
+        for fecha in ('2024-01-01', '2024-02-10', '2024-12-31'):
+            esperado = sorted((c for c in self.citas if c.fecha == fecha), key=por_hora)
+            self.assertEqual(indice.del_dia(fecha), esperado)
+        self.assertEqual(list(indice.rango('2024-01-10', '2024-01-20')),
+                         cronologico(c for c in self.citas if '2024-01-10' <= c.fecha <= '2024-01-20'))
+
+        for cita in self.citas:
+            indice.quitar(cita)
+        self.assertEqual((indice.dias, indice.fechas), ({}, []))
+
+    def test_fechas_con_formato_estricto(self):
+        for fecha in ('20300115', '2030-W03-2', '2030-02-30', '2030-1-5'):
+            self.assertFalse(models_backup.fecha_valida(fecha))
+            with self.assertRaises(ValueError):
+                models_backup.a_ordinal(fecha)
+        self.assertTrue(models_backup.fecha_valida('2030-01-15'))
+        self.assertEqual(models_backup.a_fecha(models_backup.a_ordinal('2030-01-15')), '2030-01-15')
+
+
+class PruebaBusqueda(unittest.TestCase):
+    """IndiceBusquedaPacientes contra la búsqueda lineal que reemplazó"""
+
+    def setUp(self):
+        self.pacientes = [
+            Paciente(1, '1101122334', 'José', 'Ramírez'),
+            Paciente(2, '1104455667', 'María', 'Jiménez Ramos'),
+            Paciente(3, '1107788990', 'Josefina', 'Paz'),
+            Paciente(4, '1900112233', 'Andrés', 'Carrión'),
+        ]
+        self.indice = IndiceBusquedaPacientes()
+        self.indice.agregar_varios(self.pacientes)
+
+    def lineal(self, criterio):
+        criterio = models_backup.normalizar_texto(criterio)
+        return {p.id for p in self.pacientes
+                if criterio in models_backup.normalizar_texto(f"{p.nombre} {p.apellido}")
+                or criterio in p.cedula}
+
+    def test_sin_tildes_ni_mayusculas(self):
+        self.assertEqual(self.indice.buscar('RAMIREZ'), [1])
+        self.assertEqual(self.indice.buscar('ramírez'), [1])
+        self.assertEqual(self.indice.buscar('andres carrion'), [4])
+        self.assertIsNone(self.indice.buscar('  '))
+
+    def test_orden_por_relevancia(self):
+        # Palabra exacta, luego prefijo, luego subcadena; empates por nombre
+        self.indice.agregar(Paciente(5, '1111111111', 'Luis', 'Alpaz'))
+        self.indice.agregar(Paciente(6, '1122222222', 'Ana', 'Pazmiño'))
+        self.assertEqual(self.indice.buscar('paz'), [3, 6, 5])
+        self.assertEqual(self.indice.buscar('paz', limite=2), [3, 6])
+        self.assertEqual(self.indice.buscar('jose'), [1, 3])
+        self.assertEqual(self.indice.buscar('ram'), [1, 2])
+        self.assertEqual(self.indice.buscar('jose paz'), [3])
+
+    def test_terminos_cortos_como_subcadena(self):
+        # 1 o 2 caracteres coinciden en cualquier parte, como la búsqueda lineal
+        for criterio in ('78', '22', '4', 'ri', 'z', 'ña', '99'):
+            self.assertEqual(set(self.indice.buscar(criterio)), self.lineal(criterio), criterio)
+        self.assertEqual(self.indice.buscar('12'), [4, 1])
+
+    def test_agregar_y_quitar(self):
+        self.indice.agregar(Paciente(2, '1104455667', 'María', 'Loja'))
+        self.assertEqual(self.indice.buscar('jimenez'), [])
+        self.assertEqual(self.indice.buscar('loja'), [2])
+        self.indice.quitar(1)
+        self.assertEqual(self.indice.buscar('ez'), [])
+        self.assertEqual((len(self.indice.palabras), len(self.indice.cedulas)), (6, 3))
+
+
+class PruebaInventario(unittest.TestCase):
+    """InventarioCitas sobre una base SQLite temporal con los datos de prueba"""
+
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.anterior = os.getcwd()
+        os.chdir(self.directorio.name)
+        database.crear_base_datos()
+        database.insertar_datos_prueba()
+        self.inventario = InventarioCitas()
+
+    def tearDown(self):
+        self.inventario.cerrar()
+        os.chdir(self.anterior)
+        self.directorio.cleanup()
+
+    def agregar_citas(self, n, semilla=7):
+        filas = [{'paciente_id': str(c.paciente_id), 'medico_id': str(c.medico_id),
+                  'fecha': c.fecha, 'hora': c.hora, 'motivo': c.motivo, 'estado': c.estado}
+                 for c in citas_aleatorias(n, semilla)]
+        return self.inventario.importar_citas(filas)
+
+    def estado_indices(self, inventario):
+        """Resumen comparable de todas las colecciones de citas"""
+        ids = lambda citas: [c.id for c in citas]
+        return {
+            'ordenadas': ids(inventario.citas_ordenadas),
+            'pendientes': ids(inventario.citas_pendientes),
+            'por_medico': {m: ids(l) for m, l in inventario.indice_medico.items() if len(l)},
+            'por_paciente': {p: sorted(d) for p, d in inventario.indice_paciente.items() if d},
+            'por_fecha': {d: ids(l) for d, l in inventario.indice_fecha.dias.items()},
+            'fechas': sorted(inventario.fechas_con_citas),
+            'estados': +inventario.conteo_estados,
+            'estado_medico': +inventario.conteo_estado_medico,
+        }
+
+    def test_importacion_igual_a_recarga(self):
+        resultado = self.agregar_citas(300)
+        self.assertEqual((resultado['insertados'], resultado['rechazados'], resultado['error']),
+                         (300, [], None))
+        self.inventario.actualizar_estado_cita(3, 'Cancelada')
+
+        recargado = InventarioCitas()
+        try:
+            self.assertEqual(self.estado_indices(self.inventario), self.estado_indices(recargado))
+        finally:
+            recargado.cerrar()
+
+    def test_importacion_rechaza_filas_invalidas(self):
+        filas = [
+            {'paciente_id': '1', 'medico_id': '1', 'fecha': '2030-01-15', 'hora': '09:00'},
+            {'paciente_id': '99', 'medico_id': '1', 'fecha': '2030-01-15', 'hora': '09:00'},
+            {'paciente_cedula': '1101122334', 'medico_id': '1', 'fecha': '20300115', 'hora': '09:00'},
+            {'paciente_id': '1', 'medico_id': '1', 'fecha': '2030-01-15', 'hora': '9:00'},
+        ]
+        resultado = self.inventario.importar_citas(filas)
+        self.assertEqual(resultado['insertados'], 1)
+        self.assertEqual([numero for numero, _ in resultado['rechazados']], [2, 3, 4])
+
+        resultado = self.inventario.importar_pacientes([
+            {'cedula': '1199999999', 'nombre': 'Ana', 'apellido': 'Paz', 'fecha_nacimiento': '1990-01-31'},
+            {'cedula': '1101122334', 'nombre': 'Repetida', 'apellido': 'X'},
+            {'cedula': '123', 'nombre': 'Corta', 'apellido': 'X'},
+        ])
+        self.assertEqual(resultado['insertados'], 1)
+        self.assertEqual(len(resultado['rechazados']), 2)
+        self.assertEqual([p.id for p in self.inventario.buscar_paciente('ana paz')],
+                         [max(self.inventario.pacientes)])
+
+    def test_recarga_incremental_igual_a_recarga(self):
+        self.agregar_citas(50)
+        conexion = sqlite3.connect('citas.db')
+        conexion.execute("UPDATE citas SET estado='Completada' WHERE id % 4 = 0")
+        conexion.execute("UPDATE citas SET fecha='2024-06-01', medico_id=2 WHERE id % 7 = 0")
+        conexion.execute("INSERT INTO citas (paciente_id, medico_id, fecha, hora) VALUES (1, 1, '2024-07-01', '10:00')")
+        conexion.commit()
+        conexion.close()
+
+        self.inventario.cargar_datos(incremental=True)
+        recargado = InventarioCitas()
+        try:
+            self.assertEqual(self.estado_indices(self.inventario), self.estado_indices(recargado))
+        finally:
+            recargado.cerrar()
+
+    def test_transaccion_anidada_se_revierte_completa(self):
+        pacientes = len(self.inventario.pacientes)
+        repetida = next(iter(self.inventario.pacientes.values())).cedula
+        with self.assertRaises(sqlite3.Error):
+            with self.inventario.transaccion():
+                self.inventario.agregar_paciente(Paciente(cedula='1199999998', nombre='A', apellido='B'))
+                self.inventario.agregar_paciente(Paciente(cedula=repetida, nombre='C', apellido='D'))
+        total = self.inventario.db.execute("SELECT COUNT(*) FROM pacientes").fetchone()[0]
+        self.assertEqual(total, pacientes)
+
+
+    @unittest.skipIf(models_backup.np is None, "numpy no está instalado")
+    def test_columnas_igual_que_sin_numpy(self):
+        self.agregar_citas(400)
+        self.inventario.actualizar_estado_cita(2, 'Cancelada')
+        con_columnas = self.inventario.columnas
+        self.assertIsNotNone(con_columnas)
+
+        def reportes():
+            inv = self.inventario
+            return (
+                inv.reporte_mensual(),
+                inv.reporte_mensual('2024-02-01', '2024-03-15'),
+                inv.reporte_mensual(medico_id=2),
+                [c.id for c in inv.reporte_citas_por_estado('Programada', '2024-01-15', '2024-02-15')],
+                [c.id for c in inv.reporte_citas_por_estado('Cancelada')],
+                inv.conteo_citas('Confirmada', desde='2024-01-01', hasta='2024-01-31'),
+                inv.conteo_citas('Programada', medico_id=3, desde='2024-02-01', hasta='2024-04-30'),
+            )
+
+        vectorizados = reportes()
+        self.inventario.columnas = None
+        try:
+            self.assertEqual(vectorizados, reportes())
+        finally:
+            self.inventario.columnas = con_columnas
+
+
+if __name__ == '__main__':
+    unittest.main()
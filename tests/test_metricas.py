@@ -0,0 +1,109 @@
+﻿# tests/test_metricas.py
+# Métricas por ruta (services/metricas.py) sobre una aplicación Flask mínima
+
+import logging
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from flask import Flask, g, request
+    from services.metricas import Histograma, RegistroMetricas
+except ImportError:  # Flask no instalado
+    Flask = None
+
+
+def crear_app(metricas):
+    """Los mismos ganchos que app.py alrededor de dos rutas"""
+    app = Flask(__name__)
+
+    @app.before_request
+    def iniciar():
+        metricas.iniciar_peticion()
+
+    @app.after_request
+    def registrar(response):
+        metricas.respuesta(response.status_code)
+        return response
+
+    @app.teardown_request
+    def finalizar(exc=None):
+        ruta = request.url_rule.rule if request.url_rule else 'desconocida'
+        metricas.finalizar_peticion(ruta, request.method, exc)
+
+    @app.route('/turnos')
+    def turnos():
+        metricas.conexion()
+        metricas.consulta('SELECT *\n  FROM turnos', (), 0.002)
+        metricas.filas(3)
+        metricas.render(0.001)
+        return 'ok'
+
+    @app.route('/falla')
+    def falla():
+        raise RuntimeError('falla')
+
+    return app
+
+
+@unittest.skipIf(Flask is None, "Flask no está instalado")
+class PruebaMetricas(unittest.TestCase):
+
+    def test_histograma_acumulativo(self):
+        histograma = Histograma((0.1, 1.0))
+        for valor in (0.05, 0.1, 0.5, 3.0):
+            histograma.observar(valor)
+        lineas = list(histograma.lineas('x', 'a="b"'))
+        self.assertEqual(lineas[:3], ['x_bucket{a="b",le="0.1"} 2', 'x_bucket{a="b",le="1.0"} 3',
+                                      'x_bucket{a="b",le="+Inf"} 4'])
+        self.assertEqual(lineas[-1], 'x_count{a="b"} 4')
+
+    def test_peticion_medida(self):
+        metricas = RegistroMetricas()
+        crear_app(metricas).test_client().get('/turnos')
+        texto = metricas.exportar()
+        self.assertIn('turnos_http_requests_total{route="/turnos",method="GET",status="200"} 1', texto)
+        self.assertIn('turnos_db_queries_total{route="/turnos",method="GET"} 1', texto)
+        self.assertIn('turnos_db_rows_fetched_total{route="/turnos",method="GET"} 3', texto)
+        self.assertIn('turnos_render_duration_seconds_count{route="/turnos",method="GET"} 1', texto)
+
+    def test_excepcion_cuenta_como_500(self):
+        metricas = RegistroMetricas()
+        app = crear_app(metricas)
+        app.testing = False  # que Flask responda el 500 en vez de propagar
+        respuesta = app.test_client().get('/falla')
+        self.assertEqual(respuesta.status_code, 500)
+        texto = metricas.exportar()
+        self.assertIn('turnos_http_requests_total{route="/falla",method="GET",status="500"} 1', texto)
+        self.assertIn('turnos_http_request_duration_seconds_count{route="/falla",method="GET"} 1', texto)
+
+    def test_peticiones_lentas_con_su_sql(self):
+        logger = logging.getLogger('prueba.metricas')
+        metricas = RegistroMetricas(umbral_lento=0, logger=logger)
+        with self.assertLogs(logger, 'WARNING') as registro:
+            crear_app(metricas).test_client().get('/turnos')
+        self.assertIn('Petición lenta GET /turnos -> 200', registro.output[0])
+        self.assertIn('SELECT * FROM turnos', registro.output[0])
+        self.assertIn('turnos_slow_requests_total 1', metricas.exportar())
+
+    def test_sin_umbral_no_guarda_sql(self):
+        metricas = RegistroMetricas()
+        app = crear_app(metricas)
+        with app.test_request_context('/turnos'):
+            metricas.iniciar_peticion()
+            metricas.consulta('SELECT 1', (), 0.001)
+            self.assertEqual((g.medicion.consultas, g.medicion.sql), (1, []))
+
+    def test_tipos_de_los_indicadores(self):
+        texto = RegistroMetricas().exportar({
+            'pool_in_use': (2, 'Conexiones en uso'),
+            'pool_checkouts_total': (40, 'Préstamos acumulados', 'counter'),
+        })
+        self.assertIn('# TYPE turnos_pool_in_use gauge\nturnos_pool_in_use 2', texto)
+        self.assertIn('# TYPE turnos_pool_checkouts_total counter\nturnos_pool_checkouts_total 40', texto)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+﻿# tests/test_paginacion.py
+# Paginación por clave (fecha, hora, id) de los turnos de un usuario (app.py)
+#
+# Las consultas se ejecutan sobre SQLite en memoria: el cursor de prueba
+# traduce los parámetros %s de MySQL a ? y devuelve diccionarios.
+
+import os
+import random
+import sqlite3
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import app
+except ImportError:  # Flask y el resto de requirements.txt no instalados
+    app = None
+
+
+class CursorSQLite:
+    """Lo mínimo de un cursor MySQL dictionary=True sobre sqlite3"""
+
+    def __init__(self, conexion):
+        self.cursor = conexion.cursor()
+
+    def execute(self, sql, params=()):
+        self.cursor.execute(sql.replace('%s', '?'), params)
+
+    def fetchall(self):
+        columnas = [d[0] for d in self.cursor.description]
+        return [dict(zip(columnas, fila)) for fila in self.cursor.fetchall()]
+
+
+@unittest.skipIf(app is None, "las dependencias de la aplicación web no están instaladas")
+class PruebaPaginacion(unittest.TestCase):
+
+    def setUp(self):
+        azar = random.Random(2024)
+        self.conexion = sqlite3.connect(':memory:')
+        self.conexion.execute('''
+            CREATE TABLE turnos (id INTEGER PRIMARY KEY, usuario_id INTEGER, servicio_id INTEGER,
+                                 fecha TEXT, hora TEXT, motivo TEXT, estado TEXT)
+        ''')
+        # Fechas y horas repetidas para que el id tenga que desempatar
+        self.conexion.executemany('INSERT INTO turnos VALUES (?, ?, ?, ?, ?, ?, ?)', (
+            (i, azar.choice((1, 2)), 1, f'2024-03-{azar.randint(1, 5):02d}',
+             f'{azar.choice((8, 9, 10)):02d}:00:00', '', azar.choice(app.ESTADOS_TURNO))
+            for i in range(1, 201)))
+        self.cursor = CursorSQLite(self.conexion)
+
+    def tearDown(self):
+        self.conexion.close()
+
+    def recorrer(self, por_pagina, **filtros):
+        """Todas las páginas siguiendo el cursor de cada una"""
+        vistos, despues = [], None
+        while True:
+            turnos, siguiente = app.buscar_turnos_usuario(self.cursor, 1, por_pagina, despues, **filtros)
+            self.assertLessEqual(len(turnos), por_pagina)
+            vistos += [t['id'] for t in turnos]
+            if siguiente is None:
+                return vistos
+            despues = app.decodificar_cursor(siguiente)
+            self.assertIsNotNone(despues)
+
+    def esperado(self, estado=None):
+        sql = "SELECT id FROM turnos WHERE usuario_id = 1"
+        if estado:
+            sql += f" AND estado = '{estado}'"
+        return [fila[0] for fila in self.conexion.execute(sql + " ORDER BY fecha DESC, hora DESC, id DESC")]
+
+    def test_paginas_sin_repetir_ni_saltar(self):
+        for por_pagina in (1, 7, 25, 500):
+            self.assertEqual(self.recorrer(por_pagina), self.esperado())
+
+    def test_paginas_filtradas_por_estado(self):
+        self.assertEqual(self.recorrer(6, estado='Cancelado'), self.esperado('Cancelado'))
+
+    def test_cursor_invalido(self):
+        self.assertEqual(app.decodificar_cursor(app.codificar_cursor(
+            {'fecha': '2024-03-01', 'hora': '09:00:00', 'id': 42})), ('2024-03-01', '09:00:00', 42))
+        for valor in (None, '', '2024-03-01_09:00:00', '2024-02-30_09:00:00_1', '2024-03-01_09:00:00_x'):
+            self.assertIsNone(app.decodificar_cursor(valor))
+
+
+if __name__ == '__main__':
+    unittest.main()
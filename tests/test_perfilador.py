@@ -0,0 +1,60 @@
+﻿# tests/test_perfilador.py
+# Huellas de consultas SQL y consultas lentas (Conexion/perfilador.py)
+
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Conexion.perfilador import PerfiladorConsultas, huella
+
+
+class PruebaHuella(unittest.TestCase):
+
+    def test_literales_y_parametros(self):
+        self.assertEqual(huella("SELECT * FROM turnos WHERE id = 42 AND estado = 'Cancelado'"),
+                         "SELECT * FROM turnos WHERE id = ? AND estado = ?")
+        self.assertEqual(huella("SELECT * FROM turnos WHERE usuario_id = %s AND fecha < %(hasta)s"),
+                         "SELECT * FROM turnos WHERE usuario_id = ? AND fecha < ?")
+        self.assertEqual(huella("UPDATE t SET precio = 12.50 WHERE nombre = 'O\\'Brien' OR nombre = 'a''b'"),
+                         "UPDATE t SET precio = ? WHERE nombre = ? OR nombre = ?")
+
+    def test_listas_y_espacios(self):
+        una = huella("SELECT id\n  FROM turnos\tWHERE id IN (1, 2, 3)")
+        otra = huella("SELECT id FROM turnos WHERE id IN (%s,%s)")
+        self.assertEqual(una, "SELECT id FROM turnos WHERE id IN (?+)")
+        self.assertEqual(una, otra)
+
+    def test_identificadores_con_digitos(self):
+        self.assertEqual(huella("SELECT t1.id FROM tabla2 t1 LIMIT 10"),
+                         "SELECT t1.id FROM tabla2 t1 LIMIT ?")
+
+
+class PruebaPerfilador(unittest.TestCase):
+
+    def test_agrupa_por_huella(self):
+        perfilador = PerfiladorConsultas(umbral=10)
+        perfilador.consulta("SELECT * FROM turnos WHERE id = %s", (1,), 0.002)
+        perfilador.consulta("SELECT * FROM turnos WHERE id = %s", (2,), 0.004)
+        perfilador.consulta("SELECT COUNT(*) FROM usuarios", (), 0.001)
+        top = perfilador.top()
+        self.assertEqual([f['huella'] for f in top],
+                         ["SELECT * FROM turnos WHERE id = ?", "SELECT COUNT(*) FROM usuarios"])
+        self.assertEqual((top[0]['llamadas'], top[0]['tiempo_total_ms'], top[0]['tiempo_max_ms']),
+                         (2, 6.0, 4.0))
+        self.assertEqual(perfilador.top(orden='llamadas', limite=1)[0]['llamadas'], 2)
+
+    def test_consulta_lenta_sin_parametros_en_el_log(self):
+        perfilador = PerfiladorConsultas(umbral=0.1)
+        with self.assertLogs(perfilador.logger, 'INFO') as registro:
+            perfilador.consulta("SELECT * FROM usuarios WHERE email = %s", ('ana@mail.com',), 0.25)
+        entrada = json.loads(registro.records[0].getMessage())
+        self.assertEqual((entrada['huella'], entrada['ms']), ("SELECT * FROM usuarios WHERE email = ?", 250.0))
+        self.assertNotIn('ana@mail.com', registro.output[0])
+        self.assertEqual(perfilador.top()[0]['lentas'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
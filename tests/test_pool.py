@@ -0,0 +1,123 @@
+﻿# tests/test_pool.py
+# Pool de conexiones MySQL (Conexion/pool.py) con conexiones simuladas
+#
+# Uso:
+#   python -m unittest discover -s tests
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from Conexion.pool import PoolAgotado, PoolConexiones
+except ImportError:  # mysql-connector-python no instalado
+    PoolConexiones = None
+
+
+class ConexionFalsa:
+    """Lo que el pool usa de una conexión de mysql.connector"""
+
+    def __init__(self):
+        self.conectada = True
+        self.in_transaction = False
+        self.cerrada = False
+        self.rollbacks = 0
+
+    def is_connected(self):
+        return self.conectada
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def close(self):
+        self.cerrada = True
+
+
+@unittest.skipIf(PoolConexiones is None, "mysql-connector-python no está instalado")
+class PruebaPool(unittest.TestCase):
+
+    def setUp(self):
+        self.abiertas = []
+
+        def conectar(**config):
+            conexion = ConexionFalsa()
+            self.abiertas.append(conexion)
+            return conexion
+
+        parche = mock.patch('Conexion.pool.mysql.connector.connect', side_effect=conectar)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def test_reutiliza_la_conexion_devuelta(self):
+        pool = PoolConexiones({}, tamano=2, max_desborde=0)
+        conn = pool.obtener()
+        original = conn._conexion
+        conn.close()
+        conn.close()  # devolver dos veces no la duplica en el pool
+        self.assertIs(pool.obtener()._conexion, original)
+        self.assertEqual(len(self.abiertas), 1)
+        self.assertEqual(pool.estadisticas()['libres'], 0)
+
+    def test_rollback_al_devolver(self):
+        pool = PoolConexiones({}, tamano=1, max_desborde=0)
+        conn = pool.obtener()
+        conn._conexion.in_transaction = True
+        conn.close()
+        self.assertEqual(self.abiertas[0].rollbacks, 1)
+        self.assertIs(pool.obtener()._conexion, self.abiertas[0])
+
+    def test_verificacion_descarta_conexiones_caidas(self):
+        pool = PoolConexiones({}, tamano=1, max_desborde=0, verificar=True)
+        pool.obtener().close()
+        self.abiertas[0].conectada = False
+
+        conn = pool.obtener()
+        self.assertIs(conn._conexion, self.abiertas[1])
+        self.assertTrue(self.abiertas[0].cerrada)
+        self.assertEqual(pool.estadisticas()['descartadas'], 1)
+
+    def test_recicla_conexiones_viejas(self):
+        pool = PoolConexiones({}, tamano=1, max_desborde=0, reciclar=60, verificar=False)
+        with mock.patch('Conexion.pool.time.monotonic', return_value=1000.0):
+            pool.obtener().close()
+        with mock.patch('Conexion.pool.time.monotonic', return_value=1061.0):
+            conn = pool.obtener()
+        self.assertIs(conn._conexion, self.abiertas[1])
+        self.assertTrue(self.abiertas[0].cerrada)
+
+    def test_desborde_y_agotado(self):
+        pool = PoolConexiones({}, tamano=1, max_desborde=1, timeout=0.05)
+        primera, segunda = pool.obtener(), pool.obtener()
+        self.assertEqual(pool.estadisticas()['desborde'], 1)
+        with self.assertRaises(PoolAgotado):
+            pool.obtener()
+        self.assertEqual(pool.estadisticas()['agotado'], 1)
+
+        # La de desborde se cierra al devolverse; la otra queda libre
+        primera.close()
+        segunda.close()
+        self.assertEqual(pool.estadisticas()['libres'], 1)
+        self.assertEqual(sum(c.cerrada for c in self.abiertas), 1)
+
+    def test_tras_un_fork_no_comparte_conexiones(self):
+        pool = PoolConexiones({}, tamano=2, max_desborde=0)
+        prestada = pool.obtener()
+        pool.obtener().close()
+
+        # Simula el proceso hijo: otro pid
+        with mock.patch('Conexion.pool.os.getpid', return_value=os.getpid() + 1):
+            conn = pool.obtener()
+            self.assertIs(conn._conexion, self.abiertas[-1])
+            self.assertEqual(len(self.abiertas), 3)
+            # Una conexión prestada antes del fork no vuelve al pool del hijo
+            prestada.close()
+            self.assertTrue(self.abiertas[0].cerrada)
+            self.assertEqual(pool.estadisticas()['libres'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()